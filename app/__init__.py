@@ -3,13 +3,19 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from config import Config
 from sqlalchemy import event
-import threading
 import logging
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 
+_auto_backup_registered = False
+
 def setup_auto_backup():
+    global _auto_backup_registered
+    if _auto_backup_registered:
+        return
+    _auto_backup_registered = True
+    
     watched_tables = {
         'users', 'students', 'teachers',
         'courses', 'enrollments', 'lessons', 'sections', 'class_grades',
@@ -18,69 +24,42 @@ def setup_auto_backup():
         'contacts', 'site_settings'
     }
     
-    modified_tables = set()
+    def _modified_tables(session):
+        return session.info.setdefault('backup_modified_tables', set())
     
-    @event.listens_for(db.session, 'before_commit')
-    def receive_before_commit(session):
-        for obj in session.new:
-            table_name = obj.__tablename__
-            if table_name in watched_tables:
-                modified_tables.add(table_name)
-        
-        for obj in session.dirty:
-            table_name = obj.__tablename__
-            if table_name in watched_tables:
-                modified_tables.add(table_name)
-        
-        for obj in session.deleted:
+    @event.listens_for(db.session, 'after_flush')
+    def receive_after_flush(session, flush_context):
+        modified_tables = _modified_tables(session)
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
             table_name = obj.__tablename__
             if table_name in watched_tables:
                 modified_tables.add(table_name)
     
-    app_instance = None
-    
     @event.listens_for(db.session, 'after_commit')
     def receive_after_commit(session):
-        nonlocal modified_tables, app_instance
+        modified_tables = session.info.pop('backup_modified_tables', None)
+        if not modified_tables:
+            return
+        
+        logging.info(f'🔄 تم تعديل الجداول التالية: {", ".join(modified_tables)}')
         
-        if modified_tables:
-            logging.info(f'🔄 تم تعديل الجداول التالية: {", ".join(modified_tables)}')
-            tables_copy = modified_tables.copy()
-            modified_tables.clear()
-            
-            if app_instance is None:
-                try:
-                    from flask import current_app
-                    app_instance = current_app._get_current_object()
-                    logging.info(f'✅ تم الحصول على سياق التطبيق')
-                except Exception as e:
-                    logging.error(f'❌ خطأ في الحصول على سياق التطبيق: {e}')
-                    return
-            
-            def auto_backup():
-                try:
-                    logging.info('📦 بدء عملية النسخ الاحتياطي التلقائي...')
-                    with app_instance.app_context():
-                        from app.utils.backup import BackupManager
-                        result = BackupManager.create_and_send_telegram_backup()
-                        if result:
-                            logging.info('✅ تم إرسال النسخة الاحتياطية إلى تيليجرام بنجاح')
-                        else:
-                            logging.warning('⚠️ فشل إرسال النسخة الاحتياطية إلى تيليجرام')
-                except Exception as e:
-                    logging.error(f'❌ خطأ في النسخ الاحتياطي التلقائي: {str(e)}')
-                    import traceback
-                    traceback.print_exc()
-            
-            thread = threading.Thread(target=auto_backup)
-            thread.daemon = True
-            thread.start()
-            logging.info('🚀 تم تشغيل thread النسخ الاحتياطي')
+        try:
+            from flask import current_app
+            from app.utils.backup_coordinator import get_backup_coordinator
+            get_backup_coordinator(current_app.config).trigger(modified_tables)
+        except Exception as e:
+            logging.error(f'❌ خطأ في جدولة النسخ الاحتياطي: {e}')
+    
+    @event.listens_for(db.session, 'after_rollback')
+    def receive_after_rollback(session):
+        session.info.pop('backup_modified_tables', None)
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    from app.utils import db_engine
+    db_engine.configure_app(app)
     db.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
@@ -101,13 +80,14 @@ def create_app(config_class=Config):
             pass
         return None
     
-    from app.routes import auth, admin, public, teacher, student
+    from app.routes import auth, admin, public, teacher, student, telegram
     
     app.register_blueprint(auth.bp)
     app.register_blueprint(admin.bp)
     app.register_blueprint(public.bp)
     app.register_blueprint(teacher.bp)
     app.register_blueprint(student.bp)
+    app.register_blueprint(telegram.bp)
     
     @app.context_processor
     def utility_processor():
@@ -119,13 +99,23 @@ def create_app(config_class=Config):
         return dict(check_permission=check_permission)
     
     with app.app_context():
+        db_engine.setup_engine(db.engine)
         db.create_all()
         from app.utils import init_db
         init_db.initialize_database()
     
     setup_auto_backup()
     
-    from app.utils.scheduler import init_scheduler
-    init_scheduler(app)
+    from app.utils.cache import setup_cache_invalidation
+    # تسجيل ذواكر قوائم البوت حتى تُبطلها تعديلات لوحة التحكم أيضاً
+    from app.utils import bot_catalog  # noqa: F401
+    setup_cache_invalidation()
+    
+    if app.config.get('SCHEDULER_ENABLED', True):
+        from app.utils.scheduler import init_scheduler
+        init_scheduler(app)
+    
+    from app.utils.worker_context import register_app
+    register_app(app)
     
     return app
@@ -12,14 +12,18 @@ from app.models.contact import Contact
 from app.models.settings import SiteSettings
 from app.models.class_grade import ClassGrade, Section
 from app.models.bot_session import BotSession, BotStatistics
-from app.models.notification import Notification, NotificationRecipient
+from app.models.notification import Notification, NotificationRecipient, NotificationUnreadCount
 from app.models.payment import Payment, InstallmentPayment
 from app.models.attendance import Attendance
+from app.models.outbox import OutboxMessage
+from app.models.cache_version import CacheVersion
+from app.models.schema_migration import SchemaMigration
 
 __all__ = [
     'User', 'Course', 'Teacher', 'Student', 'Enrollment',
     'Lesson', 'Grade', 'News', 'Testimonial', 'Certificate',
     'Contact', 'SiteSettings', 'ClassGrade', 'Section',
-    'BotSession', 'BotStatistics', 'Notification', 'NotificationRecipient',
-    'Payment', 'InstallmentPayment', 'Attendance'
+    'BotSession', 'BotStatistics', 'Notification', 'NotificationRecipient', 'NotificationUnreadCount',
+    'Payment', 'InstallmentPayment', 'Attendance', 'OutboxMessage',
+    'CacheVersion', 'SchemaMigration'
 ]
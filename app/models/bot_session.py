@@ -25,6 +25,10 @@ class BotSession(db.Model):
     created_at = db.Column(db.DateTime, default=damascus_now)
     last_activity = db.Column(db.DateTime, default=damascus_now, onupdate=damascus_now)
     
+    __table_args__ = (
+        db.Index('idx_bot_sessions_user_auth', 'user_id', 'is_authenticated'),
+    )
+    
     def __repr__(self):
         return f'<BotSession {self.telegram_id} - {self.username}>'
     
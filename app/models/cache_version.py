@@ -0,0 +1,12 @@
+from app import db
+from app.utils.helpers import damascus_now
+
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_versions'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=damascus_now, onupdate=damascus_now)
+    
+    def __repr__(self):
+        return f'<CacheVersion {self.name} - {self.version}>'
@@ -12,7 +12,12 @@ class Enrollment(db.Model):
     enrollment_date = db.Column(db.DateTime, default=damascus_now)
     status = db.Column(db.String(20), default='active')
     
-    __table_args__ = (db.UniqueConstraint('student_id', 'course_id', name='unique_student_course'),)
+    # القيد الفريد يغطي البحث بـ student_id
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'course_id', name='unique_student_course'),
+        db.Index('idx_enrollments_course', 'course_id'),
+        db.Index('idx_enrollments_teacher_course', 'teacher_id', 'course_id'),
+    )
     
     def __repr__(self):
         return f'<Enrollment Student:{self.student_id} Course:{self.course_id}>'
@@ -19,5 +19,11 @@ class Grade(db.Model):
     course = db.relationship('Course', backref='grades')
     teacher = db.relationship('Teacher', backref='grades')
     
+    __table_args__ = (
+        db.Index('idx_grades_student_created', 'student_id', 'created_at'),
+        db.Index('idx_grades_teacher_student', 'teacher_id', 'student_id'),
+        db.Index('idx_grades_course', 'course_id'),
+    )
+    
     def __repr__(self):
         return f'<Grade {self.exam_name}>'
@@ -17,5 +17,10 @@ class Lesson(db.Model):
     
     teacher = db.relationship('Teacher', backref='lessons')
     
+    __table_args__ = (
+        db.Index('idx_lessons_course_published', 'course_id', 'is_published'),
+        db.Index('idx_lessons_teacher_upload', 'teacher_id', 'upload_date'),
+    )
+    
     def __repr__(self):
         return f'<Lesson {self.title}>'
@@ -16,10 +16,16 @@ class Notification(db.Model):
     send_telegram = db.Column(db.Boolean, default=True)
     send_web = db.Column(db.Boolean, default=True)
     is_active = db.Column(db.Boolean, default=True)
+    # مفتاح منع التكرار للإشعارات التي تنشئها مهام قابلة لإعادة التشغيل (مثل absence_alert:2024-01-31)
+    idempotency_key = db.Column(db.String(100), nullable=True)
     
     creator = db.relationship('User', backref='created_notifications')
     recipients = db.relationship('NotificationRecipient', backref='notification', cascade='all, delete-orphan')
     
+    __table_args__ = (
+        db.Index('idx_notifications_idempotency_key', 'idempotency_key'),
+    )
+    
     def __repr__(self):
         return f'<Notification {self.title}>'
     
@@ -73,15 +79,31 @@ class NotificationRecipient(db.Model):
     
     user = db.relationship('User', backref='notification_recipients')
     
+    __table_args__ = (
+        db.Index('idx_recipients_user_read', 'user_id', 'is_read'),
+        # فهرس جزئي صغير لعدّ الإشعارات غير المقروءة، فمعظم الصفوف مقروءة
+        db.Index('idx_recipients_user_unread', 'user_id',
+                 sqlite_where=is_read == False, postgresql_where=is_read == False),
+        db.Index('idx_recipients_notification_delivered', 'notification_id', 'telegram_delivered'),
+    )
+    
     def __repr__(self):
         return f'<NotificationRecipient {self.id}>'
     
     def mark_as_read(self, source='web'):
-        if not self.is_read:
-            self.is_read = True
-            self.read_at = damascus_now()
-            self.read_source = source
-            db.session.commit()
+        if self.is_read:
+            return
+        from app.utils.unread_counters import recipient_read
+        
+        # التحديث مشروط بـ is_read حتى لا يُنقص طلبان متزامنان العداد مرتين للمستلم نفسه
+        result = db.session.execute(
+            db.update(NotificationRecipient)
+            .where(NotificationRecipient.id == self.id, NotificationRecipient.is_read == False)
+            .values(is_read=True, read_at=damascus_now(), read_source=source)
+        )
+        if result.rowcount:
+            recipient_read(self.user_id, self.notification_id)
+        db.session.commit()
     
     def mark_telegram_delivered(self, message_id=None):
         self.telegram_delivered = True
@@ -94,3 +116,15 @@ class NotificationRecipient(db.Model):
         self.web_delivered = True
         self.web_delivered_at = damascus_now()
         db.session.commit()
+
+
+class NotificationUnreadCount(db.Model):
+    """عدد إشعارات المستخدم غير المقروءة (النشطة فقط)، يُحدَّث مع كل تغيير بدل العدّ عند كل طلب"""
+    __tablename__ = 'notification_unread_counts'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True, autoincrement=False)
+    unread = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=damascus_now, onupdate=damascus_now)
+    
+    def __repr__(self):
+        return f'<NotificationUnreadCount {self.user_id} - {self.unread}>'
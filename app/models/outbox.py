@@ -0,0 +1,26 @@
+from app import db
+from app.utils.helpers import damascus_now
+
+class OutboxMessage(db.Model):
+    __tablename__ = 'notification_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False, default='telegram_delivery')
+    notification_id = db.Column(db.Integer, db.ForeignKey('notifications.id', ondelete='CASCADE'), nullable=True)
+    payload = db.Column(db.JSON)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=8)
+    available_at = db.Column(db.DateTime, nullable=False, default=damascus_now)
+    locked_by = db.Column(db.String(64))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=damascus_now)
+    processed_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('idx_outbox_status_available', 'status', 'available_at'),
+    )
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.kind} - {self.status}>'
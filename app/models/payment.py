@@ -21,6 +21,12 @@ class Payment(db.Model):
     created_by = db.relationship('User', foreign_keys=[created_by_id])
     installments = db.relationship('InstallmentPayment', backref='payment', lazy='dynamic', cascade='all, delete-orphan')
     
+    # (status, due_date) يخدم تذكير الأقساط المستحقة وفلترة لوحة التحكم حسب الحالة والتاريخ
+    __table_args__ = (
+        db.Index('idx_payments_student', 'student_id'),
+        db.Index('idx_payments_status_due', 'status', 'due_date'),
+    )
+    
     @property
     def remaining_amount(self):
         return self.total_amount - self.paid_amount
@@ -61,5 +67,10 @@ class InstallmentPayment(db.Model):
     
     created_by = db.relationship('User', foreign_keys=[created_by_id])
     
+    __table_args__ = (
+        db.Index('idx_installments_payment_date', 'payment_id', 'payment_date'),
+        db.Index('idx_installments_created', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<InstallmentPayment {self.amount} - Payment {self.payment_id}>'
@@ -0,0 +1,12 @@
+from app import db
+from app.utils.helpers import damascus_now
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=damascus_now)
+    
+    def __repr__(self):
+        return f'<SchemaMigration {self.version} - {self.description}>'
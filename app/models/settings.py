@@ -24,6 +24,7 @@ class SiteSettings(db.Model):
     telegram_bot_enabled = db.Column(db.Boolean, default=False)
     telegram_bot_webhook_enabled = db.Column(db.Boolean, default=False)
     telegram_bot_webhook_url = db.Column(db.String(500))
+    telegram_bot_webhook_secret = db.Column(db.String(64))
     telegram_bot_notifications_enabled = db.Column(db.Boolean, default=True)
     
     courses_slider_items = db.Column(db.Integer, default=3)
@@ -35,11 +35,8 @@ class User(UserMixin, db.Model):
         return self.role == 'admin' and self.phone_number == '0938074766'
     
     def get_unread_notifications_count(self):
-        from app.models.notification import NotificationRecipient, Notification
-        return NotificationRecipient.query.filter_by(
-            user_id=self.id,
-            is_read=False
-        ).join(Notification).filter(Notification.is_active == True).count()
+        from app.utils.unread_counters import get_unread_count
+        return get_unread_count(self.id)
     
     def invalidate_sessions(self):
         self.session_version = secrets.token_hex(32)
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import login_required, current_user
 from app import db
 from app.models import *
+from app.utils import queries
 from app.utils.decorators import role_required, role_or_permission_required
 from app.utils.backup import BackupManager
 from werkzeug.utils import secure_filename
@@ -13,27 +14,12 @@ bp = Blueprint('admin', __name__, url_prefix='/admin')
 @bp.route('/dashboard')
 @role_or_permission_required(roles=['admin', 'assistant'], permissions=['reports.dashboard'])
 def dashboard():
-    stats = {
-        'students': Student.query.count(),
-        'teachers': Teacher.query.count(),
-        'courses': Course.query.count(),
-        'enrollments': Enrollment.query.count()
-    }
+    from app.utils.stats import get_dashboard_stats
     
-    notification_stats = {
-        'total': Notification.query.count(),
-        'active': Notification.query.filter_by(is_active=True).count(),
-        'total_unread': NotificationRecipient.query.filter_by(is_read=False).count()
-    }
-    
-    payment_stats = {
-        'total_payments': Payment.query.count(),
-        'paid_count': Payment.query.filter_by(status='paid').count(),
-        'pending_count': Payment.query.filter_by(status='pending').count() + Payment.query.filter_by(status='partial').count(),
-        'total_collected': sum(p.paid_amount for p in Payment.query.all()),
-        'total_expected': sum(p.total_amount for p in Payment.query.all())
-    }
-    payment_stats['total_remaining'] = payment_stats['total_expected'] - payment_stats['total_collected']
+    dashboard_stats = get_dashboard_stats()
+    stats = dashboard_stats['stats']
+    notification_stats = dashboard_stats['notification_stats']
+    payment_stats = dashboard_stats['payment_stats']
     
     recent_contacts = Contact.query.order_by(Contact.created_at.desc()).limit(5).all()
     recent_notifications = Notification.query.order_by(Notification.created_at.desc()).limit(5).all()
@@ -89,6 +75,14 @@ def backup():
     backups = BackupManager.list_backups()
     return render_template('admin/backup.html', backups=backups)
 
+@bp.route('/backup/metrics')
+@role_or_permission_required(roles=['admin'], permissions=['backup.view'])
+def backup_metrics():
+    from flask import jsonify
+    from app.utils.backup_coordinator import get_backup_coordinator
+    
+    return jsonify(get_backup_coordinator(current_app.config).metrics())
+
 @bp.route('/backup/download/<path:filename>')
 @role_or_permission_required(roles=['admin'], permissions=['backup.download'])
 def download_backup(filename):
@@ -509,6 +503,14 @@ def settings():
     
     return render_template('admin/settings.html', settings=site_settings)
 
+@bp.route('/bot/send-metrics')
+@role_or_permission_required(roles=['admin'], permissions=['settings.bot'])
+def bot_send_metrics():
+    from flask import jsonify
+    from app.utils.telegram_scheduler import get_outbound_scheduler
+    
+    return jsonify(get_outbound_scheduler().metrics())
+
 @bp.route('/bot', methods=['GET', 'POST'])
 @role_or_permission_required(roles=['admin'], permissions=['settings.bot'])
 def bot_management():
@@ -655,8 +657,8 @@ def teachers():
 @role_or_permission_required(roles=['admin', 'assistant'], permissions=['teachers.view_profile'])
 def view_teacher(teacher_id):
     teacher = Teacher.query.get_or_404(teacher_id)
-    enrollments = Enrollment.query.filter_by(teacher_id=teacher_id).all()
-    lessons = Lesson.query.filter_by(teacher_id=teacher_id).order_by(Lesson.upload_date.desc()).limit(10).all()
+    enrollments = queries.teacher_enrollments(teacher_id).all()
+    lessons = queries.teacher_lessons(teacher_id).limit(10).all()
     attendance_records = Attendance.query.filter_by(user_id=teacher.user_id).order_by(Attendance.date.desc()).limit(10).all()
     stats = Attendance.get_user_stats(teacher.user_id)
     return render_template('admin/view_teacher.html', teacher=teacher, enrollments=enrollments, lessons=lessons,
@@ -854,7 +856,7 @@ def edit_student(student_id):
 def view_student(student_id):
     student = Student.query.get_or_404(student_id)
     enrollments = student.enrollments.all()
-    grades = Grade.query.filter_by(student_id=student_id).order_by(Grade.created_at.desc()).all()
+    grades = queries.student_grades(student_id).all()
     attendance_records = Attendance.query.filter_by(user_id=student.user_id).order_by(Attendance.date.desc()).limit(10).all()
     stats = Attendance.get_user_stats(student.user_id)
     return render_template('admin/view_student.html', student=student, enrollments=enrollments, grades=grades, 
@@ -986,7 +988,7 @@ def enroll_student(student_id):
         
         course = Course.query.get_or_404(course_id)
         
-        existing = Enrollment.query.filter_by(student_id=student_id, course_id=course_id).first()
+        existing = queries.student_course_enrollment(student_id, course_id).first()
         if existing:
             flash('الطالب مسجل بالفعل في هذه الدورة', 'warning')
             return redirect(url_for('admin.students'))
@@ -1398,7 +1400,7 @@ def notifications():
     
     if target_type != 'all':
         if target_type == 'individual':
-            query = query.filter(Notification.target_type.in_(['student', 'teacher', 'user']))
+            query = query.filter(Notification.target_type.in_(['student', 'teacher', 'user', 'users']))
         elif target_type == 'group':
             query = query.filter(Notification.target_type.in_(['all', 'all_students', 'all_teachers', 'course']))
         else:
@@ -1475,7 +1477,8 @@ def create_notification():
                 send_web=send_web
             )
             
-            flash(f'تم إرسال الإشعار بنجاح إلى {len(notification.recipients)} مستخدم', 'success')
+            recipients_count = NotificationRecipient.query.filter_by(notification_id=notification.id).count()
+            flash(f'تم إرسال الإشعار بنجاح إلى {recipients_count} مستخدم', 'success')
             return redirect(url_for('admin.notifications'))
         except Exception as e:
             flash(f'حدث خطأ: {str(e)}', 'danger')
@@ -1500,8 +1503,14 @@ def view_notification(notification_id):
 @bp.route('/notifications/toggle/<int:notification_id>', methods=['POST'])
 @role_or_permission_required(roles=['admin', 'assistant'], permissions=['notifications.edit'])
 def toggle_notification(notification_id):
+    from app.utils import unread_counters
+    
     notification = Notification.query.get_or_404(notification_id)
     notification.is_active = not notification.is_active
+    if notification.is_active:
+        unread_counters.notification_activated(notification.id)
+    else:
+        unread_counters.notification_deactivated(notification.id)
     db.session.commit()
     status = 'تم تفعيل الإشعار بنجاح' if notification.is_active else 'تم تعطيل الإشعار بنجاح'
     flash(status, 'success')
@@ -1510,7 +1519,11 @@ def toggle_notification(notification_id):
 @bp.route('/notifications/delete/<int:notification_id>', methods=['POST'])
 @role_or_permission_required(roles=['admin'], permissions=['notifications.delete'])
 def delete_notification(notification_id):
+    from app.utils import unread_counters
+    
     notification = Notification.query.get_or_404(notification_id)
+    if notification.is_active:
+        unread_counters.notification_deactivated(notification.id)
     db.session.delete(notification)
     db.session.commit()
     flash('تم حذف الإشعار بنجاح', 'success')
@@ -1529,9 +1542,13 @@ def bulk_notification_action():
     notification_ids = [int(nid) for nid in notification_ids]
     notifications = Notification.query.filter(Notification.id.in_(notification_ids)).all()
     
+    from app.utils import unread_counters
+    
     if action == 'delete':
         count = len(notifications)
         for notif in notifications:
+            if notif.is_active:
+                unread_counters.notification_deactivated(notif.id)
             db.session.delete(notif)
         db.session.commit()
         flash(f'تم حذف {count} إشعار بنجاح', 'success')
@@ -1541,6 +1558,7 @@ def bulk_notification_action():
         for notif in notifications:
             if not notif.is_active:
                 notif.is_active = True
+                unread_counters.notification_activated(notif.id)
                 count += 1
         db.session.commit()
         flash(f'تم تفعيل {count} إشعار', 'success')
@@ -1550,6 +1568,7 @@ def bulk_notification_action():
         for notif in notifications:
             if notif.is_active:
                 notif.is_active = False
+                unread_counters.notification_deactivated(notif.id)
                 count += 1
         db.session.commit()
         flash(f'تم تعطيل {count} إشعار', 'success')
@@ -1590,7 +1609,7 @@ def notifications_stats():
 @role_or_permission_required(roles=['admin', 'assistant'], permissions=['payments.view_all'])
 def student_payments(student_id):
     student = Student.query.get_or_404(student_id)
-    payments = Payment.query.filter_by(student_id=student_id).order_by(Payment.created_at.desc()).all()
+    payments = queries.student_payments(student_id).all()
     return render_template('admin/student_payments.html', student=student, payments=payments)
 
 @bp.route('/students/<int:student_id>/payments/add', methods=['GET', 'POST'])
@@ -1681,7 +1700,7 @@ def add_installment(payment_id):
 @role_or_permission_required(roles=['admin', 'assistant'], permissions=['payments.view_all'])
 def view_payment(payment_id):
     payment = Payment.query.get_or_404(payment_id)
-    installments = InstallmentPayment.query.filter_by(payment_id=payment_id).order_by(InstallmentPayment.payment_date.desc()).all()
+    installments = queries.payment_installments(payment_id).all()
     return render_template('admin/view_payment.html', payment=payment, installments=installments)
 
 @bp.route('/payments/<int:payment_id>/edit', methods=['GET', 'POST'])
@@ -1812,10 +1831,7 @@ def all_payments():
     date_to = request.args.get('date_to', '')
     sort_by = request.args.get('sort_by', 'date')
     
-    query = Payment.query.join(Student).join(User)
-    
-    if status_filter:
-        query = query.filter(Payment.status == status_filter)
+    query = queries.payments_list(status_filter)
     
     if search:
         query = query.filter(
@@ -1854,25 +1870,11 @@ def payment_reports():
     from sqlalchemy import func
     from datetime import datetime, timedelta
     
-    all_payments = Payment.query.all()
-    total_expected = sum(p.total_amount for p in all_payments)
-    total_collected = sum(p.paid_amount for p in all_payments)
-    total_remaining = total_expected - total_collected
-    
-    paid_count = Payment.query.filter_by(status='paid').count()
-    partial_count = Payment.query.filter_by(status='partial').count()
-    pending_count = Payment.query.filter_by(status='pending').count()
-    total_count = Payment.query.count()
+    from app.utils.stats import get_payment_report_stats
     
-    students_with_payments = db.session.query(Student).join(Payment).distinct().count()
-    students_with_pending = db.session.query(Student).join(Payment).filter(Payment.status.in_(['pending', 'partial'])).distinct().count()
+    stats = get_payment_report_stats()
     
-    overdue_payments = Payment.query.filter(
-        Payment.status.in_(['pending', 'partial']),
-        Payment.due_date < datetime.now().date()
-    ).all() if datetime.now().date() else []
-    
-    recent_payments = InstallmentPayment.query.order_by(InstallmentPayment.created_at.desc()).limit(10).all()
+    recent_payments = queries.recent_installments(10).all()
     
     payment_methods_stats = db.session.query(
         InstallmentPayment.payment_method,
@@ -1896,28 +1898,12 @@ def payment_reports():
     
     top_payments = Payment.query.order_by(Payment.total_amount.desc()).limit(5).all()
     
-    stats = {
-        'total_expected': total_expected,
-        'total_collected': total_collected,
-        'total_remaining': total_remaining,
-        'collection_rate': (total_collected / total_expected * 100) if total_expected > 0 else 0,
-        'paid_count': paid_count,
-        'partial_count': partial_count,
-        'pending_count': pending_count,
-        'total_count': total_count,
-        'students_with_payments': students_with_payments,
-        'students_with_pending': students_with_pending,
-        'overdue_count': len(overdue_payments),
-        'overdue_amount': sum(p.remaining_amount for p in overdue_payments)
-    }
-    
     return render_template('admin/payment_reports.html',
                          stats=stats,
                          recent_payments=recent_payments,
                          payment_methods_stats=payment_methods_stats,
                          monthly_collections=monthly_collections,
-                         top_payments=top_payments,
-                         overdue_payments=overdue_payments)
+                         top_payments=top_payments)
 
 @bp.route('/attendance')
 @role_or_permission_required(roles=['admin', 'assistant'], permissions=['attendance.view'])
@@ -1987,8 +1973,7 @@ def attendance_list():
 @role_or_permission_required(roles=['admin', 'assistant'], permissions=['attendance.add', 'attendance.bulk_add'])
 def add_attendance():
     from datetime import date
-    from app.utils.notifications import send_notification
-    from sqlalchemy.exc import IntegrityError
+    from app.utils.attendance import record_attendance_bulk
     
     if request.method == 'POST':
         from datetime import datetime
@@ -2005,56 +1990,14 @@ def add_attendance():
         
         attendance_date = datetime.strptime(attendance_date_str, '%Y-%m-%d').date()
         
-        added_count = 0
-        skipped_count = 0
-        
-        for user_id in user_ids:
-            existing = Attendance.query.filter_by(
-                user_id=user_id,
-                date=attendance_date
-            ).first()
-            
-            if existing:
-                skipped_count += 1
-                continue
-            
-            new_record = Attendance(
-                user_id=user_id,
-                user_type=user_type,
-                date=attendance_date,
-                status=status,
-                notes=notes if notes else None
-            )
-            
-            try:
-                db.session.add(new_record)
-                db.session.commit()
-                added_count += 1
-                
-                if status == 'absent':
-                    user = User.query.get(user_id)
-                    if user:
-                        absent_count = Attendance.query.filter_by(
-                            user_id=user_id,
-                            status='absent'
-                        ).count()
-                        
-                        title = "⚠️ تنبيه غياب"
-                        message = f"تم تسجيل غيابك بتاريخ {attendance_date}\nعدد أيام الغياب: {absent_count} يوم"
-                        if notes:
-                            message += f"\nملاحظات: {notes}"
-                        
-                        send_notification(
-                            title=title,
-                            message=message,
-                            user_ids=[user_id],
-                            notification_type='absence_alert',
-                            send_telegram=True,
-                            send_web=True
-                        )
-            except IntegrityError:
-                db.session.rollback()
-                skipped_count += 1
+        added_count, skipped_count = record_attendance_bulk(
+            user_ids,
+            user_type,
+            attendance_date,
+            status,
+            notes=notes,
+            created_by_id=current_user.id
+        )
         
         if added_count > 0:
             flash(f'تم إضافة {added_count} سجل حضور بنجاح', 'success')
@@ -2078,7 +2021,7 @@ def add_attendance():
 @bp.route('/attendance/edit/<int:id>', methods=['GET', 'POST'])
 @role_or_permission_required(roles=['admin', 'assistant'], permissions=['attendance.edit'])
 def edit_attendance(id):
-    from app.utils.notifications import send_notification
+    from app.utils.attendance import get_absence_counts, enqueue_absence_alerts
     from sqlalchemy.exc import IntegrityError
     
     record = Attendance.query.get_or_404(id)
@@ -2109,26 +2052,13 @@ def edit_attendance(id):
             return redirect(url_for('admin.edit_attendance', id=id))
         
         if old_status != 'absent' and status == 'absent':
-            user = User.query.get(record.user_id)
-            if user:
-                absent_count = Attendance.query.filter_by(
-                    user_id=record.user_id,
-                    status='absent'
-                ).count()
-                
-                title = "⚠️ تنبيه غياب"
-                message = f"تم تسجيل غيابك بتاريخ {attendance_date}\nعدد أيام الغياب: {absent_count} يوم"
-                if notes:
-                    message += f"\nملاحظات: {notes}"
-                
-                send_notification(
-                    title=title,
-                    message=message,
-                    user_ids=[record.user_id],
-                    notification_type='absence_alert',
-                    send_telegram=True,
-                    send_web=True
-                )
+            enqueue_absence_alerts(
+                get_absence_counts([record.user_id]),
+                attendance_date,
+                notes,
+                created_by_id=current_user.id
+            )
+            db.session.commit()
         
         flash('تم تحديث سجل الحضور بنجاح', 'success')
         return redirect(url_for('admin.attendance_list'))
@@ -2149,7 +2079,8 @@ def delete_attendance(id):
 @bp.route('/export/attendance')
 @role_or_permission_required(roles=['admin', 'assistant'], permissions=['reports.export'])
 def export_attendance():
-    from app.utils.excel_export import export_attendance_to_excel
+    from app.utils.excel_export import export_attendance_to_excel, excel_download_response, EXPORT_YIELD_PER
+    from sqlalchemy.orm import joinedload
     from datetime import datetime
     
     user_type = request.args.get('user_type', '')
@@ -2174,24 +2105,22 @@ def export_attendance():
     if date_to:
         query = query.filter(Attendance.date <= date_to)
     
-    attendance_records = query.order_by(Attendance.date.desc()).all()
+    attendance_records = query.options(
+        joinedload(Attendance.user)
+    ).order_by(Attendance.date.desc()).yield_per(EXPORT_YIELD_PER)
     
-    excel_file = export_attendance_to_excel(attendance_records)
+    excel_path = export_attendance_to_excel(attendance_records, streaming=True)
     
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f'attendance_report_{timestamp}.xlsx'
     
-    return send_file(
-        excel_file,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=filename
-    )
+    return excel_download_response(excel_path, filename)
 
 @bp.route('/export/students')
 @role_or_permission_required(roles=['admin', 'assistant'], permissions=['reports.export'])
 def export_students():
-    from app.utils.excel_export import export_students_to_excel
+    from app.utils.excel_export import export_students_to_excel, excel_download_response, EXPORT_YIELD_PER
+    from sqlalchemy.orm import joinedload, contains_eager
     from datetime import datetime
     
     search = request.args.get('search', '')
@@ -2227,24 +2156,24 @@ def export_students():
     elif sort_by == 'student_number':
         query = query.order_by(Student.student_number)
     
-    students = query.all()
+    students = query.options(
+        contains_eager(Student.user),
+        joinedload(Student.class_grade),
+        joinedload(Student.section)
+    ).yield_per(EXPORT_YIELD_PER)
     
-    excel_file = export_students_to_excel(students)
+    excel_path = export_students_to_excel(students, streaming=True)
     
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f'students_report_{timestamp}.xlsx'
     
-    return send_file(
-        excel_file,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=filename
-    )
+    return excel_download_response(excel_path, filename)
 
 @bp.route('/export/teachers')
 @role_or_permission_required(roles=['admin', 'assistant'], permissions=['reports.export'])
 def export_teachers():
-    from app.utils.excel_export import export_teachers_to_excel
+    from app.utils.excel_export import export_teachers_to_excel, excel_download_response, EXPORT_YIELD_PER
+    from sqlalchemy.orm import contains_eager
     from datetime import datetime
     
     search = request.args.get('search', '')
@@ -2264,24 +2193,20 @@ def export_teachers():
     elif sort_by == 'experience':
         query = query.order_by(Teacher.experience_years.desc())
     
-    teachers = query.all()
+    teachers = query.options(contains_eager(Teacher.user)).yield_per(EXPORT_YIELD_PER)
     
-    excel_file = export_teachers_to_excel(teachers)
+    excel_path = export_teachers_to_excel(teachers, streaming=True)
     
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f'teachers_report_{timestamp}.xlsx'
     
-    return send_file(
-        excel_file,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=filename
-    )
+    return excel_download_response(excel_path, filename)
 
 @bp.route('/export/payments')
 @role_or_permission_required(roles=['admin', 'assistant'], permissions=['reports.export'])
 def export_payments():
-    from app.utils.excel_export import export_payments_to_excel
+    from app.utils.excel_export import export_payments_to_excel, excel_download_response, EXPORT_YIELD_PER
+    from sqlalchemy.orm import contains_eager
     from datetime import datetime
     
     status_filter = request.args.get('status', '')
@@ -2290,10 +2215,7 @@ def export_payments():
     date_to = request.args.get('date_to', '')
     sort_by = request.args.get('sort_by', 'date')
     
-    query = Payment.query.join(Student).join(User)
-    
-    if status_filter:
-        query = query.filter(Payment.status == status_filter)
+    query = queries.payments_list(status_filter)
     
     if search:
         query = query.filter(
@@ -2316,19 +2238,16 @@ def export_payments():
     elif sort_by == 'student':
         query = query.order_by(User.full_name)
     
-    payments = query.all()
+    payments = query.options(
+        contains_eager(Payment.student).contains_eager(Student.user)
+    ).yield_per(EXPORT_YIELD_PER)
     
-    excel_file = export_payments_to_excel(payments)
+    excel_path = export_payments_to_excel(payments, streaming=True)
     
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f'payments_report_{timestamp}.xlsx'
     
-    return send_file(
-        excel_file,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=filename
-    )
+    return excel_download_response(excel_path, filename)
 
 @bp.route('/data-reset', methods=['GET', 'POST'])
 @role_or_permission_required(roles=['admin'], permissions=['settings.data_reset'])
@@ -2386,7 +2305,9 @@ def data_reset():
                 deleted_items.append(f'سجلات الحضور والغياب ({count})')
             
             if reset_notifications:
+                from app.utils.unread_counters import reset_unread_counters
                 NotificationRecipient.query.delete()
+                reset_unread_counters()
                 count = Notification.query.delete()
                 deleted_items.append(f'الإشعارات ({count})')
             
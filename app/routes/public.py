@@ -1,4 +1,6 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+import os
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from sqlalchemy import text
 from app import db
 from app.models import SiteSettings, Course, Teacher, News, Testimonial, Certificate, Contact
 
@@ -73,15 +75,9 @@ def contact():
         db.session.commit()
         
         if settings and settings.telegram_bot_token and settings.telegram_chat_id:
-            import threading
-            import asyncio
-            from telegram import Bot
+            from app.utils.telegram_client import TelegramClientRegistry
             
-            def send_contact_notification_async():
-                async def send_notification():
-                    try:
-                        bot = Bot(token=settings.telegram_bot_token)
-                        message_text = f"""
+            message_text = f"""
 📧 رسالة جديدة من موقع المعهد
 
 👤 الاسم: {contact_msg.name}
@@ -93,19 +89,31 @@ def contact():
 
 ⏰ التاريخ: {contact_msg.created_at.strftime('%Y-%m-%d %H:%M:%S')}
 """
-                        await bot.send_message(
-                            chat_id=settings.telegram_chat_id,
-                            text=message_text
-                        )
-                    except Exception as e:
-                        print(f'خطأ في إرسال الإشعار إلى Telegram: {str(e)}')
-                
-                asyncio.run(send_notification())
             
-            thread = threading.Thread(target=send_contact_notification_async)
-            thread.start()
+            async def send_notification(bot):
+                await bot.send_message(
+                    chat_id=settings.telegram_chat_id,
+                    text=message_text
+                )
+            
+            def report_error(future):
+                if future.exception():
+                    print(f'خطأ في إرسال الإشعار إلى Telegram: {str(future.exception())}')
+            
+            # الإرسال يتم في خيط عميل تيليجرام المشترك دون انتظار
+            TelegramClientRegistry.submit(settings.telegram_bot_token, send_notification).add_done_callback(report_error)
         
         flash('تم إرسال رسالتك بنجاح. سنتواصل معك قريباً', 'success')
         return redirect(url_for('public.contact'))
     
     return render_template('public/contact.html', settings=settings)
+
+@bp.route('/healthz')
+def healthz():
+    """فحص صحة عملية الويب: تعمل وتستطيع الوصول إلى قاعدة البيانات"""
+    try:
+        db.session.execute(text('SELECT 1'))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'database': str(e), 'pid': os.getpid()}), 503
+    return jsonify({'status': 'ok', 'database': 'ok', 'pid': os.getpid()})
@@ -1,8 +1,11 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app
 from flask_login import login_required, current_user, logout_user
 from app import db
-from app.models import Student, Enrollment, Lesson, Grade, Course, NotificationRecipient, Notification, Payment, InstallmentPayment, Attendance, User
+from app.models import Student, Enrollment, Lesson, Grade, Course, NotificationRecipient, Notification, Payment, Attendance, User
+from app.utils import queries
 from app.utils.decorators import role_required
+from app.utils.notification_stream import stream_response
+from app.utils.query_profiles import ENROLLMENT_WITH_COURSE, GRADE_WITH_COURSE
 from app.utils.notifications import get_user_notifications, get_unread_count, mark_notification_as_read
 from werkzeug.utils import secure_filename
 import os
@@ -38,17 +41,17 @@ def dashboard():
 @role_required('student')
 def courses():
     student = Student.query.filter_by(user_id=current_user.id).first()
-    enrollments = Enrollment.query.filter_by(student_id=student.id).all()
+    enrollments = queries.student_enrollments(student.id).options(*ENROLLMENT_WITH_COURSE).all()
     return render_template('student/courses.html', enrollments=enrollments)
 
 @bp.route('/lessons/<int:course_id>')
 @role_required('student')
 def lessons(course_id):
     student = Student.query.filter_by(user_id=current_user.id).first()
-    enrollment = Enrollment.query.filter_by(student_id=student.id, course_id=course_id).first_or_404()
+    enrollment = queries.student_course_enrollment(student.id, course_id).first_or_404()
     
     course = Course.query.get_or_404(course_id)
-    lessons = Lesson.query.filter_by(course_id=course_id, is_published=True).all()
+    lessons = queries.course_lessons(course_id).all()
     
     return render_template('student/lessons.html', course=course, lessons=lessons)
 
@@ -56,7 +59,7 @@ def lessons(course_id):
 @role_required('student')
 def grades():
     student = Student.query.filter_by(user_id=current_user.id).first()
-    my_grades = Grade.query.filter_by(student_id=student.id).order_by(Grade.created_at.desc()).all()
+    my_grades = queries.student_grades(student.id).options(*GRADE_WITH_COURSE).all()
     return render_template('student/grades.html', grades=my_grades)
 
 @bp.route('/lesson/download/<int:lesson_id>')
@@ -72,7 +75,7 @@ def download_lesson(lesson_id):
     
     lesson = Lesson.query.get_or_404(lesson_id)
     
-    enrollment = Enrollment.query.filter_by(student_id=student.id, course_id=lesson.course_id).first()
+    enrollment = queries.student_course_enrollment(student.id, lesson.course_id).first()
     if not enrollment:
         flash('ليس لديك صلاحية لتحميل هذا الدرس', 'danger')
         return redirect(url_for('student.courses'))
@@ -116,12 +119,19 @@ def mark_notification_read(recipient_id):
     flash('تم تحديد الإشعار كمقروء', 'success')
     return redirect(url_for('student.notifications'))
 
+@bp.route('/api/notifications/stream', methods=['GET'])
+@role_required('student')
+def api_notifications_stream():
+    # اتصال SSE يدفع عدد غير المقروء عند تغيّره بدل الاستطلاع كل 30 ثانية
+    return stream_response(current_user.id)
+
 @bp.route('/api/notifications/unread', methods=['GET'])
 @role_required('student')
 def api_get_unread_notifications():
     try:
-        unread_notifications = get_user_notifications(current_user.id, unread_only=True, limit=10)
+        # العداد المحفوظ يكفي للاستطلاع المعتاد، والقائمة تُجلب فقط عند وجود غير مقروء
         unread_count = get_unread_count(current_user.id)
+        unread_notifications = get_user_notifications(current_user.id, unread_only=True, limit=10) if unread_count else []
         
         notifications_data = []
         for recipient in unread_notifications:
@@ -186,7 +196,7 @@ def payments():
         flash('الملف الشخصي للطالب غير موجود', 'danger')
         return redirect(url_for('public.index'))
     
-    my_payments = Payment.query.filter_by(student_id=student.id).order_by(Payment.created_at.desc()).all()
+    my_payments = queries.student_payments(student.id).all()
     
     return render_template('student/payments.html', payments=my_payments, student=student)
 
@@ -206,7 +216,7 @@ def view_payment(payment_id):
         flash('ليس لديك صلاحية لعرض هذا القسط', 'danger')
         return redirect(url_for('student.payments'))
     
-    installments = InstallmentPayment.query.filter_by(payment_id=payment_id).order_by(InstallmentPayment.payment_date.desc()).all()
+    installments = queries.payment_installments(payment_id).all()
     
     return render_template('student/view_payment.html', payment=payment, installments=installments, today=date.today())
 
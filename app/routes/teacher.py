@@ -2,7 +2,10 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import login_required, current_user, logout_user
 from app import db
 from app.models import Teacher, Student, Course, Enrollment, Lesson, Grade, NotificationRecipient, Notification, Attendance, User
+from app.utils import queries
 from app.utils.decorators import role_required
+from app.utils.notification_stream import stream_response
+from app.utils.query_profiles import LESSON_WITH_COURSE, GRADE_WITH_COURSE, STUDENT_PROFILE
 from app.utils.notifications import get_user_notifications, get_unread_count, mark_notification_as_read
 from werkzeug.utils import secure_filename
 import os
@@ -44,7 +47,7 @@ def lessons():
         flash('الملف الشخصي للمعلم غير موجود', 'danger')
         return redirect(url_for('public.index'))
     
-    all_lessons = Lesson.query.filter_by(teacher_id=teacher.id).all()
+    all_lessons = Lesson.query.filter_by(teacher_id=teacher.id).options(*LESSON_WITH_COURSE).all()
     return render_template('teacher/lessons.html', lessons=all_lessons)
 
 @bp.route('/lessons/add', methods=['GET', 'POST'])
@@ -60,7 +63,7 @@ def add_lesson():
         title = request.form.get('title')
         description = request.form.get('description')
         
-        enrollment = Enrollment.query.filter_by(teacher_id=teacher.id, course_id=course_id).first()
+        enrollment = queries.teacher_course_enrollment(teacher.id, course_id).first()
         if not enrollment:
             flash('ليس لديك صلاحية لإضافة دروس لهذه الدورة', 'danger')
             return redirect(url_for('teacher.lessons'))
@@ -108,8 +111,13 @@ def students():
         flash('الملف الشخصي للمعلم غير موجود', 'danger')
         return redirect(url_for('public.index'))
     
-    my_students = Student.query.join(Enrollment).filter(Enrollment.teacher_id == teacher.id).all()
-    return render_template('teacher/students.html', students=my_students)
+    my_students = Student.query.join(Enrollment).filter(Enrollment.teacher_id == teacher.id).options(*STUDENT_PROFILE).all()
+    # عدد الدرجات لكل الطلاب باستعلام مجمّع واحد بدل student.grades.count() لكل صف
+    student_ids = list({student.id for student in my_students})
+    grade_counts = dict(db.session.query(Grade.student_id, db.func.count(Grade.id)).filter(
+        Grade.student_id.in_(student_ids)
+    ).group_by(Grade.student_id).all()) if student_ids else {}
+    return render_template('teacher/students.html', students=my_students, grade_counts=grade_counts)
 
 @bp.route('/lessons/edit/<int:lesson_id>', methods=['GET', 'POST'])
 @role_required('teacher')
@@ -129,7 +137,7 @@ def edit_lesson(lesson_id):
         new_course_id = request.form.get('course_id')
         
         if new_course_id != str(lesson.course_id):
-            enrollment = Enrollment.query.filter_by(teacher_id=teacher.id, course_id=new_course_id).first()
+            enrollment = queries.teacher_course_enrollment(teacher.id, new_course_id).first()
             if not enrollment:
                 flash('ليس لديك صلاحية لنقل الدرس لهذه الدورة', 'danger')
                 return redirect(url_for('teacher.edit_lesson', lesson_id=lesson_id))
@@ -189,7 +197,7 @@ def view_course_lessons(course_id):
     
     course = Course.query.get_or_404(course_id)
     
-    teacher_enrollment = Enrollment.query.filter_by(teacher_id=teacher.id, course_id=course_id).first()
+    teacher_enrollment = queries.teacher_course_enrollment(teacher.id, course_id).first()
     has_lessons_in_course = Lesson.query.filter_by(teacher_id=teacher.id, course_id=course_id).first()
     
     if not teacher_enrollment and not has_lessons_in_course:
@@ -212,7 +220,7 @@ def download_lesson(lesson_id):
     lesson = Lesson.query.get_or_404(lesson_id)
     
     if lesson.teacher_id != teacher.id:
-        teacher_enrollment = Enrollment.query.filter_by(teacher_id=teacher.id, course_id=lesson.course_id).first()
+        teacher_enrollment = queries.teacher_course_enrollment(teacher.id, lesson.course_id).first()
         if not teacher_enrollment:
             flash('ليس لديك صلاحية لتحميل هذا الدرس', 'danger')
             return redirect(url_for('teacher.lessons'))
@@ -241,7 +249,7 @@ def add_grade(student_id):
     if request.method == 'POST':
         course_id = request.form.get('course_id')
         
-        enrollment = Enrollment.query.filter_by(teacher_id=teacher.id, course_id=course_id).first()
+        enrollment = queries.teacher_course_enrollment(teacher.id, course_id).first()
         if not enrollment:
             flash('ليس لديك صلاحية لإضافة درجات لهذه الدورة', 'danger')
             return redirect(url_for('teacher.students'))
@@ -292,7 +300,7 @@ def view_student_grades(student_id):
         flash('ليس لديك صلاحية لعرض درجات هذا الطالب', 'danger')
         return redirect(url_for('teacher.students'))
     
-    grades = Grade.query.filter_by(student_id=student_id, teacher_id=teacher.id).order_by(Grade.created_at.desc()).all()
+    grades = queries.teacher_student_grades(teacher.id, student_id).options(*GRADE_WITH_COURSE).all()
     
     return render_template('teacher/view_student_grades.html', student=student, grades=grades)
 
@@ -313,7 +321,7 @@ def edit_grade(grade_id):
     if request.method == 'POST':
         course_id = request.form.get('course_id')
         
-        enrollment = Enrollment.query.filter_by(teacher_id=teacher.id, course_id=course_id).first()
+        enrollment = queries.teacher_course_enrollment(teacher.id, course_id).first()
         if not enrollment:
             flash('ليس لديك صلاحية لتعديل درجات لهذه الدورة', 'danger')
             return redirect(url_for('teacher.view_student_grades', student_id=grade.student_id))
@@ -393,12 +401,19 @@ def mark_notification_read(recipient_id):
     flash('تم تحديد الإشعار كمقروء', 'success')
     return redirect(url_for('teacher.notifications'))
 
+@bp.route('/api/notifications/stream', methods=['GET'])
+@role_required('teacher')
+def api_notifications_stream():
+    # اتصال SSE يدفع عدد غير المقروء عند تغيّره بدل الاستطلاع كل 30 ثانية
+    return stream_response(current_user.id)
+
 @bp.route('/api/notifications/unread', methods=['GET'])
 @role_required('teacher')
 def api_get_unread_notifications():
     try:
-        unread_notifications = get_user_notifications(current_user.id, unread_only=True, limit=10)
+        # العداد المحفوظ يكفي للاستطلاع المعتاد، والقائمة تُجلب فقط عند وجود غير مقروء
         unread_count = get_unread_count(current_user.id)
+        unread_notifications = get_user_notifications(current_user.id, unread_only=True, limit=10) if unread_count else []
         
         notifications_data = []
         for recipient in unread_notifications:
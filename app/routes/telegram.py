@@ -0,0 +1,26 @@
+from flask import Blueprint, request, abort, jsonify
+from app.models import SiteSettings
+from app.utils.bot_webhook import SECRET_HEADER, verify_webhook_secret, deliver_update
+
+bp = Blueprint('telegram', __name__, url_prefix='/telegram')
+
+@bp.route('/webhook', methods=['POST'])
+def webhook():
+    """استقبال تحديثات تيليجرام في وضع Webhook وتسليمها لتطبيق البوت"""
+    settings = SiteSettings.query.first()
+    if (not settings or not settings.telegram_bot_token or not settings.telegram_bot_enabled
+            or not settings.telegram_bot_webhook_enabled):
+        abort(404)
+    
+    token = settings.telegram_bot_token
+    if not verify_webhook_secret(request.headers.get(SECRET_HEADER)):
+        abort(403)
+    
+    data = request.get_json(silent=True)
+    if not data:
+        abort(400)
+    
+    # عند تعذر التسليم يعيد تيليجرام إرسال التحديث لاحقاً
+    if not deliver_update(token, data):
+        abort(503)
+    return jsonify({'ok': True})
@@ -0,0 +1,149 @@
+import logging
+from datetime import date
+from sqlalchemy import select, insert, func, literal
+from app import db
+from app.models import Attendance, Notification, NotificationRecipient, User
+from app.utils import unread_counters
+from app.utils.helpers import damascus_now
+from app.utils.notification_stream import get_notification_broker
+from app.utils.outbox import enqueue, enqueue_notification_delivery
+
+logger = logging.getLogger(__name__)
+
+ABSENCE_ALERT_TITLE = "⚠️ تنبيه غياب"
+
+
+def record_attendance_bulk(user_ids, user_type, attendance_date, status, notes=None, created_by_id=1):
+    """
+    تسجيل الحضور لمجموعة مستخدمين بعبارة INSERT واحدة
+    السجلات الموجودة لنفس المستخدم والتاريخ (uq_user_date) تُتخطى كما هي
+    تُرجع (عدد السجلات المضافة، عدد السجلات المتخطاة)
+    """
+    user_ids = sorted({int(user_id) for user_id in user_ids})
+    if not user_ids:
+        return 0, 0
+
+    from app.utils.upsert import upsert
+
+    now = damascus_now()
+    rows = [
+        {
+            'user_id': user_id,
+            'user_type': user_type,
+            'date': attendance_date,
+            'status': status,
+            'notes': notes or None,
+            'created_at': now,
+            'updated_at': now
+        }
+        for user_id in user_ids
+    ]
+
+    result = upsert(Attendance, rows, index_elements=['user_id', 'date'], returning=[Attendance.user_id])
+    added_ids = [user_id for (user_id,) in result]
+
+    if status == 'absent' and added_ids:
+        enqueue_absence_alerts(get_absence_counts(added_ids), attendance_date, notes, created_by_id)
+
+    db.session.commit()
+
+    return len(added_ids), len(user_ids) - len(added_ids)
+
+
+def get_absence_counts(user_ids):
+    """عدد أيام الغياب لكل مستخدم باستعلام مجمّع واحد"""
+    rows = db.session.execute(
+        select(Attendance.user_id, func.count(Attendance.id))
+        .where(Attendance.user_id.in_(user_ids), Attendance.status == 'absent')
+        .group_by(Attendance.user_id)
+    ).all()
+    return {user_id: count for user_id, count in rows}
+
+
+def enqueue_absence_alerts(absence_counts, attendance_date, notes=None, created_by_id=1):
+    """إضافة مهمة واحدة إلى صندوق الصادر لإرسال تنبيهات الغياب لكل المستخدمين"""
+    if not absence_counts:
+        return None
+
+    return enqueue('absence_alerts', payload={
+        'date': attendance_date.isoformat(),
+        'notes': notes or None,
+        'created_by_id': created_by_id,
+        'absence_counts': {str(user_id): count for user_id, count in absence_counts.items()}
+    })
+
+
+def absence_alert_message(attendance_date, absent_count, notes=None):
+    message = f"تم تسجيل غيابك بتاريخ {attendance_date}\nعدد أيام الغياب: {absent_count} يوم"
+    if notes:
+        message += f"\nملاحظات: {notes}"
+    return message
+
+
+def create_absence_notifications(payload):
+    """
+    إنشاء إشعارات الغياب دفعة واحدة من حمولة مهمة صندوق الصادر
+    المستخدمون الذين لهم نفس عدد أيام الغياب يتشاركون إشعاراً واحداً لأن نصه واحد
+    كل مستخدم يُنبَّه مرة واحدة لكل تاريخ (مفتاح absence_alert:<التاريخ>)، فإعادة تشغيل المهمة
+    بعد حفظ نتيجتها أو وصول مهمة مكررة لا تنشئ إشعارات مكررة
+    """
+    attendance_date = date.fromisoformat(payload['date'])
+    notes = payload.get('notes')
+
+    users_by_count = {}
+    for user_id, count in payload['absence_counts'].items():
+        users_by_count.setdefault(count, []).append(int(user_id))
+
+    idempotency_key = f'absence_alert:{attendance_date.isoformat()}'
+    already_alerted = select(NotificationRecipient.user_id).join(Notification).where(
+        Notification.idempotency_key == idempotency_key
+    )
+    eligible_users = select(User.id).where(
+        User.is_active == True,
+        User.role.notin_(['admin', 'assistant']),
+        User.id.notin_(already_alerted)
+    )
+
+    notification_ids = []
+    for absent_count, user_ids in sorted(users_by_count.items()):
+        user_ids = db.session.scalars(eligible_users.where(User.id.in_(user_ids)).order_by(User.id)).all()
+        if not user_ids:
+            continue
+
+        notification = Notification(
+            title=ABSENCE_ALERT_TITLE,
+            message=absence_alert_message(attendance_date, absent_count, notes),
+            notification_type='absence_alert',
+            target_type='user' if len(user_ids) == 1 else 'users',
+            target_id=user_ids[0] if len(user_ids) == 1 else None,
+            created_by=payload.get('created_by_id') or 1,
+            send_telegram=True,
+            send_web=True,
+            idempotency_key=idempotency_key
+        )
+        db.session.add(notification)
+        db.session.flush()
+
+        recipients = eligible_users.where(User.id.in_(user_ids)).subquery()
+        db.session.execute(
+            insert(NotificationRecipient).from_select(
+                ['notification_id', 'user_id'],
+                select(literal(notification.id), recipients.c.id)
+            )
+        )
+        unread_counters.notification_added(notification.id)
+        enqueue_notification_delivery(notification.id)
+        notification_ids.append(notification.id)
+
+    db.session.commit()
+
+    # العدد الجديد يصل فوراً لمن هو متصل بهذه العملية، والعمليات الأخرى تلتقطه من جدول العدادات
+    broker = get_notification_broker()
+    for notification_id in notification_ids:
+        try:
+            broker.publish_notification(notification_id)
+        except Exception as e:
+            logger.error(f"Error publishing notification {notification_id} to streams: {e}")
+
+    logger.info(f"Created {len(notification_ids)} absence notifications for {len(payload['absence_counts'])} users")
+    return len(notification_ids)
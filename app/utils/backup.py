@@ -1,12 +1,62 @@
 import os
 import shutil
-import subprocess
+import sqlite3
+import logging
 from datetime import datetime
 from flask import current_app
 import asyncio
 from app.utils.helpers import damascus_now
 import threading
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASE_FILE = 'alqasim_institute.db'
+
+# عدد الصفحات المنسوخة في كل خطوة، والتوقف بين الخطوات يسمح للكتابة بالاستمرار
+SNAPSHOT_PAGES_PER_STEP = 1024
+SNAPSHOT_STEP_SLEEP = 0.005
+SNAPSHOT_MAX_RESTARTS = 5
+
+
+class SnapshotRestarted(Exception):
+    pass
+
+
+def database_path():
+    """مسار ملف SQLite الحالي، أو الملف الافتراضي خارج سياق التطبيق"""
+    try:
+        from app import db
+        url = db.engine.url
+        if url.get_backend_name() == 'sqlite' and url.database:
+            return url.database
+    except Exception:
+        pass
+    return DEFAULT_DATABASE_FILE
+
+
+def is_sqlite_database():
+    """هل قاعدة التطبيق الحالية ملف SQLite (خارج سياق التطبيق يُفترض الملف الافتراضي)"""
+    try:
+        from app import db
+        return db.engine.url.get_backend_name() == 'sqlite'
+    except Exception:
+        return True
+
+
+class SnapshotProgressLogger:
+    """تسجيل تقدم النسخ كل ربع تقريباً بدلاً من كل خطوة"""
+
+    def __init__(self, label):
+        self.label = label
+        self.last_quarter = -1
+
+    def __call__(self, copied, total):
+        quarter = copied * 4 // total if total else 4
+        if quarter != self.last_quarter:
+            self.last_quarter = quarter
+            logger.info(f'{self.label}: {copied}/{total} pages')
+
+
 class BackupManager:
     
     @staticmethod
@@ -33,10 +83,11 @@ class BackupManager:
                 print('بيانات تيلجرام غير مكتملة')
                 return False
             
-            backup_file = BackupManager.create_full_backup()
+            from app.utils.incremental_backup import create_incremental_backup, build_delta_archive, mark_uploaded
+            manifest_path = create_incremental_backup()
+            backup_file = build_delta_archive(manifest_path)
             print(f'تم إنشاء النسخة الاحتياطية: {backup_file}')
             
-            import asyncio
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             
@@ -51,6 +102,7 @@ class BackupManager:
             
             if success:
                 print(f'تم إرسال النسخة الاحتياطية إلى تيلجرام بنجاح')
+                mark_uploaded(manifest_path)
                 try:
                     import os
                     os.remove(backup_file)
@@ -68,13 +120,95 @@ class BackupManager:
             traceback.print_exc()
             return False
     
+    @staticmethod
+    def snapshot_database(dest_path, source_path=None, pages=SNAPSHOT_PAGES_PER_STEP,
+                          step_sleep=SNAPSHOT_STEP_SLEEP, progress=None, verify=True):
+        """
+        نسخة متسقة من قاعدة البيانات أثناء عملها عبر sqlite3.Connection.backup
+        النسخ يتم على خطوات من الصفحات مع توقف قصير بينها حتى لا تتعطل عمليات الكتابة
+        في وضع WAL تُثبَّت لقطة القراءة طوال النسخ فلا يعيد SQLite النسخ عند كل كتابة
+        في الوضع العادي إذا تكررت إعادة النسخ بسبب الكتابة المستمرة يُنسخ الباقي في خطوة واحدة
+        progress: دالة (الصفحات المنسوخة، إجمالي الصفحات)
+        على قاعدة خادم تُصدَّر البيانات إلى ملف SQLite بالتنسيق نفسه عبر db_copy
+        """
+        if source_path is None and not is_sqlite_database():
+            return BackupManager.export_database(dest_path)
+        
+        source_path = source_path or database_path()
+        progress = progress or SnapshotProgressLogger(f'Snapshot {os.path.basename(dest_path)}')
+        temp_path = f'{dest_path}.partial'
+        restarts = 0
+        last_remaining = None
+
+        def on_step(status, remaining, total):
+            nonlocal restarts, last_remaining
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if restarts > SNAPSHOT_MAX_RESTARTS:
+                    raise SnapshotRestarted()
+            last_remaining = remaining
+            progress(total - remaining, total)
+
+        source = sqlite3.connect(source_path, timeout=30, isolation_level=None)
+        try:
+            wal_mode = source.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal'
+            if wal_mode:
+                source.execute('BEGIN')
+                source.execute('SELECT count(*) FROM sqlite_master').fetchone()
+
+            dest = sqlite3.connect(temp_path)
+            try:
+                try:
+                    source.backup(dest, pages=pages, progress=on_step, sleep=step_sleep)
+                except SnapshotRestarted:
+                    logger.warning(f'Snapshot restarted {restarts} times under write load, copying in a single step')
+                    source.backup(dest, pages=-1, progress=on_step)
+                finally:
+                    if wal_mode:
+                        source.execute('COMMIT')
+
+                if verify:
+                    result = dest.execute('PRAGMA integrity_check').fetchone()[0]
+                    if result != 'ok':
+                        raise sqlite3.DatabaseError(f'Integrity check failed for snapshot: {result}')
+            finally:
+                dest.close()
+
+            os.replace(temp_path, dest_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            source.close()
+
+        return dest_path
+    
+    @staticmethod
+    def export_database(dest_path):
+        """نسخ بيانات قاعدة الخادم إلى ملف SQLite، فتبقى النسخ الاحتياطية بالتنسيق نفسه أياً كان المحرك"""
+        from app import db
+        from app.utils.db_copy import copy_database
+        
+        temp_path = f'{dest_path}.partial'
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        try:
+            copy_database(db.engine, f'sqlite:///{os.path.abspath(temp_path)}')
+            os.replace(temp_path, dest_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return dest_path
+    
     @staticmethod
     def create_full_backup():
         timestamp = damascus_now().strftime('%Y%m%d_%H%M%S')
         backup_dir = f'backups/full_{timestamp}'
         os.makedirs(backup_dir, exist_ok=True)
         
-        shutil.copy('alqasim_institute.db', f'{backup_dir}/database.db')
+        BackupManager.snapshot_database(f'{backup_dir}/database.db')
         
         if os.path.exists('app/static/uploads'):
             shutil.copytree('app/static/uploads', f'{backup_dir}/uploads', dirs_exist_ok=True)
@@ -118,11 +252,7 @@ class BackupManager:
         
         schema_file = f'{backup_dir}/schema.sql'
         with open(schema_file, 'w') as f:
-            subprocess.run(
-                ['sqlite3', 'alqasim_institute.db', '.schema'],
-                stdout=f,
-                stderr=subprocess.PIPE
-            )
+            f.write(BackupManager.schema_sql())
         
         if os.path.exists('app/templates'):
             shutil.copytree('app/templates', f'{backup_dir}/templates')
@@ -136,20 +266,34 @@ class BackupManager:
         
         return f'backups/structure_{timestamp}.zip'
     
+    @staticmethod
+    def schema_sql():
+        """DDL الجداول بلهجة المحرك الحالي، مولَّداً من النماذج دون الحاجة إلى أداة سطر أوامر"""
+        from app import db
+        from sqlalchemy.schema import CreateTable, CreateIndex
+        
+        dialect = db.engine.dialect
+        statements = []
+        for table in db.metadata.sorted_tables:
+            statements.append(str(CreateTable(table).compile(dialect=dialect)).strip() + ';')
+            for index in sorted(table.indexes, key=lambda index: index.name or ''):
+                statements.append(str(CreateIndex(index).compile(dialect=dialect)).strip() + ';')
+        return '\n\n'.join(statements) + '\n'
+    
     @staticmethod
     def create_data_backup():
         timestamp = damascus_now().strftime('%Y%m%d_%H%M%S')
         backup_file = f'backups/data_{timestamp}.db'
         os.makedirs('backups', exist_ok=True)
         
-        shutil.copy('alqasim_institute.db', backup_file)
+        BackupManager.snapshot_database(backup_file)
         
         return backup_file
     
     @staticmethod
     async def send_to_telegram(file_path, bot_token, chat_id):
         try:
-            from telegram import Bot
+            from app.utils.telegram_client import TelegramClientRegistry
             
             if not bot_token or not chat_id:
                 return False
@@ -165,18 +309,20 @@ class BackupManager:
                 print(f'حجم الملف ({file_size / 1024 / 1024:.2f} MB) أكبر من الحد المسموح (50 MB)')
                 return False
             
-            bot = Bot(token=bot_token)
+            caption = f'📦 نسخة احتياطية - {os.path.basename(file_path)}\n📊 الحجم: {file_size / 1024 / 1024:.2f} MB\n⏰ التاريخ: {damascus_now().strftime("%Y-%m-%d %H:%M:%S")}'
             
-            with open(file_path, 'rb') as file:
-                await bot.send_document(
-                    chat_id=chat_id,
-                    document=file,
-                    caption=f'📦 نسخة احتياطية - {os.path.basename(file_path)}\n📊 الحجم: {file_size / 1024 / 1024:.2f} MB\n⏰ التاريخ: {damascus_now().strftime("%Y-%m-%d %H:%M:%S")}',
-                    read_timeout=120,
-                    write_timeout=120,
-                    connect_timeout=60
-                )
+            async def send_document(bot):
+                with open(file_path, 'rb') as file:
+                    await bot.send_document(
+                        chat_id=chat_id,
+                        document=file,
+                        caption=caption,
+                        read_timeout=120,
+                        write_timeout=120,
+                        connect_timeout=60
+                    )
             
+            await TelegramClientRegistry.call(bot_token, send_document)
             return True
         except Exception as e:
             print(f'خطأ في إرسال النسخة الاحتياطية إلى Telegram: {str(e)}')
@@ -191,7 +337,7 @@ class BackupManager:
             zip_ref.extractall(temp_dir)
         
         if os.path.exists(f'{temp_dir}/database.db'):
-            shutil.copy(f'{temp_dir}/database.db', 'alqasim_institute.db')
+            BackupManager.restore_data_backup(f'{temp_dir}/database.db')
         
         if os.path.exists(f'{temp_dir}/uploads'):
             if os.path.exists('app/static/uploads'):
@@ -243,7 +389,31 @@ class BackupManager:
     
     @staticmethod
     def restore_data_backup(backup_file):
-        shutil.copy(backup_file, 'alqasim_institute.db')
+        if not is_sqlite_database():
+            from app import db
+            from app.utils.db_copy import copy_database
+            db.session.remove()
+            copy_database(f'sqlite:///{os.path.abspath(backup_file)}', db.engine, replace=True)
+            return True
+        
+        # الكتابة عبر sqlite3.Connection.backup تمر بقفل الكتابة وملف WAL مثل أي معاملة،
+        # بينما نسخ الملف فوق القاعدة الحية يترك -wal/-shm القديمين هما المرجع فتعود البيانات السابقة
+        from app import db
+        from app.utils import migrations
+        db.session.remove()
+        db.engine.dispose()
+        
+        source = sqlite3.connect(backup_file)
+        dest = sqlite3.connect(database_path(), timeout=30)
+        try:
+            source.backup(dest)
+        finally:
+            dest.close()
+            source.close()
+        
+        # نسخة من مخطط أقدم تُرقّى فوراً بدل انتظار إعادة تشغيل العمليات
+        db.create_all()
+        migrations.upgrade(db.engine)
         return True
     
     @staticmethod
@@ -298,6 +468,8 @@ class BackupManager:
             return 'بنية'
         elif filename.startswith('data_'):
             return 'بيانات'
+        elif filename.startswith('incremental_'):
+            return 'تزايدي'
         else:
             return 'غير معروف'
     
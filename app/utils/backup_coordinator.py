@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+import traceback
+from app.utils.helpers import damascus_now
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUIET_PERIOD = 60
+DEFAULT_MAX_DELAY = 600
+
+_coordinator = None
+_coordinator_lock = threading.Lock()
+
+
+class BackupCoordinator:
+    """
+    منسق النسخ الاحتياطي التلقائي:
+    - نسخة واحدة فقط قيد التنفيذ في أي وقت (خيط عامل واحد)
+    - الطلبات المتتالية تُدمج حتى تمر فترة هدوء بدون تعديلات، مع حد أقصى للانتظار
+    - مجموعة الجداول المعدلة محمية بقفل وتُسلَّم كاملة لعملية النسخ
+    """
+
+    def __init__(self, run_backup, quiet_period=DEFAULT_QUIET_PERIOD, max_delay=DEFAULT_MAX_DELAY):
+        self.run_backup = run_backup
+        self.quiet_period = quiet_period
+        self.max_delay = max(max_delay, quiet_period)
+
+        self._condition = threading.Condition()
+        self._thread = None
+        self._pending_tables = set()
+        self._pending_triggers = 0
+        self._first_trigger_at = None
+        self._last_trigger_at = None
+        self._running = False
+
+        self._triggers_total = 0
+        self._completed = 0
+        self._failed = 0
+        self._last_started_at = None
+        self._last_finished_at = None
+        self._last_duration = None
+        self._last_tables = []
+        self._last_error = None
+
+    def trigger(self, tables):
+        """تسجيل تعديل على الجداول المحددة وجدولة نسخة احتياطية"""
+        if not tables:
+            return
+
+        with self._condition:
+            now = time.monotonic()
+            self._pending_tables.update(tables)
+            self._pending_triggers += 1
+            self._triggers_total += 1
+            if self._first_trigger_at is None:
+                self._first_trigger_at = now
+            self._last_trigger_at = now
+
+            self._ensure_thread()
+            self._condition.notify()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run_loop, name='backup-coordinator', daemon=True)
+            self._thread.start()
+
+    def _due_at(self):
+        return min(self._last_trigger_at + self.quiet_period, self._first_trigger_at + self.max_delay)
+
+    def _run_loop(self):
+        while True:
+            with self._condition:
+                while self._first_trigger_at is None:
+                    self._condition.wait()
+
+                while True:
+                    remaining = self._due_at() - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                tables = self._pending_tables
+                coalesced = self._pending_triggers
+                self._pending_tables = set()
+                self._pending_triggers = 0
+                self._first_trigger_at = None
+                self._last_trigger_at = None
+                self._running = True
+                self._last_started_at = damascus_now()
+
+            started = time.monotonic()
+            error = None
+            logger.info(f'📦 بدء النسخ الاحتياطي التلقائي ({coalesced} طلب مدمج): {", ".join(sorted(tables))}')
+            try:
+                success = self.run_backup(tables)
+            except Exception as e:
+                success = False
+                error = str(e)
+                traceback.print_exc()
+
+            with self._condition:
+                self._running = False
+                self._last_finished_at = damascus_now()
+                self._last_duration = round(time.monotonic() - started, 3)
+                self._last_tables = sorted(tables)
+                self._last_error = error
+                if success:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+    def metrics(self):
+        with self._condition:
+            return {
+                'queued': 1 if self._first_trigger_at is not None else 0,
+                'pending_triggers': self._pending_triggers,
+                'pending_tables': sorted(self._pending_tables),
+                'running': self._running,
+                'completed': self._completed,
+                'failed': self._failed,
+                'triggers_total': self._triggers_total,
+                'quiet_period': self.quiet_period,
+                'max_delay': self.max_delay,
+                'last_started_at': self._last_started_at.isoformat() if self._last_started_at else None,
+                'last_finished_at': self._last_finished_at.isoformat() if self._last_finished_at else None,
+                'last_duration': self._last_duration,
+                'last_tables': self._last_tables,
+                'last_error': self._last_error
+            }
+
+
+def _run_telegram_backup(tables):
+    from app.utils.backup import BackupManager
+    from app.utils.worker_context import worker_app_context
+
+    with worker_app_context():
+        result = BackupManager.create_and_send_telegram_backup()
+    if result:
+        logger.info('✅ تم إرسال النسخة الاحتياطية إلى تيليجرام بنجاح')
+    else:
+        logger.warning('⚠️ فشل إرسال النسخة الاحتياطية إلى تيليجرام')
+    return result
+
+
+def get_backup_coordinator(config=None):
+    """المنسق المشترك للعملية الحالية، يُنشأ عند أول استخدام"""
+    global _coordinator
+    with _coordinator_lock:
+        if _coordinator is None:
+            config = config or {}
+            _coordinator = BackupCoordinator(
+                _run_telegram_backup,
+                quiet_period=config.get('AUTO_BACKUP_DEBOUNCE_SECONDS', DEFAULT_QUIET_PERIOD),
+                max_delay=config.get('AUTO_BACKUP_MAX_DELAY_SECONDS', DEFAULT_MAX_DELAY)
+            )
+        return _coordinator
@@ -0,0 +1,97 @@
+"""
+قوائم البوت العامة (الدورات، الأخبار، المعلمون) مجهّزة مسبقاً على شكل صفحات
+الصفحات تُبنى مرة واحدة وتُحفظ في ذاكرة مؤقتة بإصدار يُبطَل عند تعديل جداولها
+"""
+import os
+from sqlalchemy import func
+from app import db
+from app.models import Course, News, Teacher, Enrollment
+from app.utils.cache import VersionedCache
+from app.utils.query_profiles import TEACHER_WITH_USER
+
+PAGE_SIZE = int(os.environ.get('BOT_CATALOG_PAGE_SIZE', 5))
+
+courses_catalog_cache = VersionedCache('bot_catalog_courses', {'courses', 'enrollments'})
+news_catalog_cache = VersionedCache('bot_catalog_news', {'news'})
+teachers_catalog_cache = VersionedCache('bot_catalog_teachers', {'teachers', 'users'})
+
+
+def _paginate(items, render_item, header, empty_text):
+    """تقسيم العناصر إلى صفحات، كل صفحة {'text', 'buttons'} والأزرار (العنوان، callback_data)"""
+    if not items:
+        return [{'text': empty_text, 'buttons': []}]
+
+    pages = []
+    for start in range(0, len(items), PAGE_SIZE):
+        chunk = items[start:start + PAGE_SIZE]
+        blocks = [render_item(item) for item, _ in chunk]
+        pages.append({
+            'text': f"*{header} ({len(items)})*\n" + "\n".join(blocks),
+            'buttons': [button for _, button in chunk]
+        })
+    return pages
+
+
+def _render_courses():
+    courses = Course.query.order_by(Course.id).all()
+    counts = dict(db.session.query(Enrollment.course_id, func.count(Enrollment.id)).group_by(
+        Enrollment.course_id
+    ).all())
+
+    def render(course):
+        enrolled = counts.get(course.id, 0)
+        seats = (course.max_students - enrolled) if course.max_students else "غير محدود"
+        description = course.description[:100] if course.description else 'لا يوجد وصف'
+        return f"""
+📖 *{course.title}*
+📝 الوصف: {description}...
+⏱️ المدة: {course.duration}
+👥 المقاعد المتاحة: {seats}
+"""
+
+    items = [(course, (f"📖 {course.title}", f"course_{course.id}")) for course in courses]
+    return _paginate(items, render, "📚 الدورات المتاحة", "لا توجد دورات متاحة حالياً")
+
+
+def _render_news():
+    news_items = News.query.filter_by(is_published=True).order_by(News.created_at.desc()).all()
+
+    def render(news):
+        return f"""
+📰 *{news.title}*
+📅 التاريخ: {news.created_at.strftime('%Y-%m-%d')}
+{news.content[:200]}...
+"""
+
+    items = [(news, (f"📰 {news.title}", f"news_{news.id}")) for news in news_items]
+    return _paginate(items, render, "📰 آخر الأخبار", "لا توجد أخبار متاحة حالياً")
+
+
+def _render_teachers():
+    teachers = Teacher.query.options(*TEACHER_WITH_USER).order_by(Teacher.id).all()
+
+    def render(teacher):
+        return f"""
+👨‍🏫 *{teacher.user.full_name}*
+📚 التخصص: {teacher.specialization or 'غير محدد'}
+📜 المؤهلات: {teacher.qualifications or 'غير محدد'}
+⏱️ الخبرة: {teacher.experience_years or 0} سنة
+"""
+
+    items = [(teacher, (f"👨‍🏫 {teacher.user.full_name}", f"teacher_{teacher.id}")) for teacher in teachers]
+    return _paginate(items, render, "👨‍🏫 قائمة المعلمين", "لا يوجد معلمون مسجلون حالياً")
+
+
+CATALOGS = {
+    'courses': (courses_catalog_cache, _render_courses),
+    'news': (news_catalog_cache, _render_news),
+    'teachers': (teachers_catalog_cache, _render_teachers),
+}
+
+
+def get_catalog_page(kind, page=0):
+    """تُرجع صفحة جاهزة {'text', 'buttons', 'page', 'pages'} من القائمة المطلوبة"""
+    cache, render = CATALOGS[kind]
+    pages = cache.get(kind, render)
+    page = min(max(page, 0), len(pages) - 1)
+    return dict(pages[page], page=page, pages=len(pages))
@@ -0,0 +1,608 @@
+"""
+طبقة الوصول إلى البيانات لبوت تيليجرام
+كل الاستعلامات تعمل في مجموعة خيوط محدودة خارج حلقة الأحداث، وتُرجع بيانات بسيطة
+(قواميس وقوائم) لا ترتبط بجلسة SQLAlchemy، فلا يلمس أي معالج كائنات ORM على الحلقة
+"""
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from sqlalchemy import func
+from app import db
+from app.models import (
+    User, Student, Teacher, Course, Lesson, Grade, News, Enrollment,
+    SiteSettings, BotSession, Attendance, NotificationRecipient
+)
+from app.utils import queries
+from app.utils.bot_sessions import get_session_cache, session_state
+from app.utils.helpers import damascus_now
+from app.utils.query_profiles import (
+    ENROLLMENT_WITH_COURSE, GRADE_WITH_COURSE, LESSON_WITH_COURSE, LESSON_DETAIL,
+    STUDENT_WITH_USER, TEACHER_WITH_USER
+)
+from app.utils.worker_context import worker_app_context
+
+logger = logging.getLogger(__name__)
+
+DB_WORKERS = int(os.environ.get('BOT_DB_WORKERS', 8))
+LIST_PAGE_SIZE = int(os.environ.get('BOT_LIST_PAGE_SIZE', 10))
+
+_executor = None
+
+
+def get_db_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix='bot-db')
+    return _executor
+
+
+def _call_in_app_context(func, *args, **kwargs):
+    with worker_app_context():
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+async def run_db(func, *args, **kwargs):
+    """تشغيل دالة قاعدة بيانات متزامنة في مجموعة الخيوط وانتظار نتيجتها دون حجب الحلقة"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_db_executor(),
+        functools.partial(_call_in_app_context, func, *args, **kwargs)
+    )
+
+
+def submit_db(func, *args, **kwargs):
+    """تشغيل دالة قاعدة بيانات في الخلفية دون انتظار (للعمليات التي لا يحتاج المعالج نتيجتها)"""
+    future = get_db_executor().submit(_call_in_app_context, func, *args, **kwargs)
+    future.add_done_callback(_log_background_error)
+    return future
+
+
+def _log_background_error(future):
+    error = future.exception()
+    if error:
+        logger.error(f"Error in background bot DB task: {error}")
+
+
+def shutdown_db_executor(wait=True):
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        _executor = None
+
+
+def _user_dict(user):
+    return {
+        'id': user.id,
+        'full_name': user.full_name,
+        'phone_number': user.phone_number,
+        'role': user.role,
+        'is_active': user.is_active
+    }
+
+
+def _page(result, total, page, page_size):
+    """حساب حدود الصفحة المطلوبة وإضافة total / page / pages إلى النتيجة؛ تُرجع (page, offset)"""
+    pages = max(1, -(-total // page_size))
+    page = min(max(page, 0), pages - 1)
+    result.update(total=total, page=page, pages=pages)
+    return page, page * page_size
+
+
+def _authenticated_user(telegram_id):
+    """
+    صلاحية الجلسة تُقرأ من قاعدة البيانات في كل طلب (استعلام واحد مع المستخدم) لا من ذاكرة الجلسات،
+    فتسجيل الخروج أو تعطيل الحساب في عملية أخرى يسري فوراً بدل انتظار انتهاء صلاحية الذاكرة
+    """
+    return queries.bot_session_user(telegram_id).first()
+
+
+# ---------- الجلسات والإعدادات ----------
+
+def get_or_create_session(telegram_id, username=None, first_name=None, last_name=None):
+    """
+    تسجيل نشاط المستخدم في جلسته؛ إذا كانت الجلسة في الذاكرة تُحدَّث هناك وتُكتب لاحقاً
+    ولا تُلمس قاعدة البيانات إلا عند أول ظهور للجلسة أو بعد انتهاء صلاحيتها في الذاكرة
+    """
+    cache = get_session_cache()
+    state = cache.touch(telegram_id, username=username, first_name=first_name, last_name=last_name)
+    if state is None:
+        # تعديلات جلسة أُزيحت من الذاكرة تُكتب قبل إعادة تحميلها حتى لا تطغى لاحقاً على الأحدث
+        cache.flush([telegram_id])
+        session = queries.bot_session(telegram_id).first()
+        if not session:
+            session = BotSession(
+                telegram_id=telegram_id,
+                username=username,
+                first_name=first_name,
+                last_name=last_name
+            )
+            db.session.add(session)
+        else:
+            session.last_activity = damascus_now()
+            session.username = username
+            session.first_name = first_name
+            session.last_name = last_name
+        db.session.commit()
+        state = session_state(session)
+        cache.put(telegram_id, state)
+    return {'is_authenticated': state['is_authenticated'], 'user_id': state['user_id']}
+
+
+def get_bot_settings():
+    settings = SiteSettings.query.first()
+    if not settings:
+        return None
+    return {
+        'institute_name': settings.institute_name,
+        'telegram_bot_token': settings.telegram_bot_token,
+        'telegram_bot_enabled': settings.telegram_bot_enabled,
+        'phone1': settings.phone1,
+        'phone2': settings.phone2,
+        'email': settings.email,
+        'address': settings.address,
+        'facebook_url': settings.facebook_url
+    }
+
+
+def get_session_user(telegram_id):
+    """المستخدم المرتبط بجلسة البوت إذا كان مسجلاً دخوله، وإلا None"""
+    user = _authenticated_user(telegram_id)
+    return _user_dict(user) if user else None
+
+
+def authenticate(telegram_id, phone, password):
+    """تُرجع (الحالة، بيانات المستخدم) والحالة واحدة من ok / inactive / invalid"""
+    user = User.query.filter_by(phone_number=phone).first()
+    if not user or not user.check_password(password):
+        return 'invalid', None
+    if not user.is_active:
+        return 'inactive', None
+
+    # تغييرات تسجيل الدخول تُحفظ فوراً مع ما ينتظر الكتابة من بيانات الجلسة
+    cache = get_session_cache()
+    cache.flush([telegram_id])
+    session = queries.bot_session(telegram_id).first()
+    if not session:
+        session = BotSession(telegram_id=telegram_id)
+        db.session.add(session)
+    session.authenticate(user)
+    cache.put(telegram_id, session_state(session))
+    return 'ok', _user_dict(user)
+
+
+def logout(telegram_id):
+    cache = get_session_cache()
+    cache.flush([telegram_id])
+    session = queries.bot_session(telegram_id).first()
+    if session and session.is_authenticated:
+        session.logout()
+        cache.put(telegram_id, session_state(session))
+        return True
+    return False
+
+
+# ---------- لوحة التحكم ----------
+
+def get_dashboard(telegram_id):
+    user = _authenticated_user(telegram_id)
+    if not user:
+        return None
+
+    data = {'user': _user_dict(user)}
+
+    if user.role == 'student':
+        student = Student.query.filter_by(user_id=user.id).first()
+        if student:
+            data['student'] = {
+                'courses': Enrollment.query.filter_by(student_id=student.id).count(),
+                'grades': Grade.query.filter_by(student_id=student.id).count()
+            }
+
+    elif user.role == 'teacher':
+        teacher = Teacher.query.filter_by(user_id=user.id).first()
+        if teacher:
+            data['teacher'] = {
+                'specialization': teacher.specialization,
+                'enrollments': Enrollment.query.filter_by(teacher_id=teacher.id).count(),
+                'students': Student.query.join(Enrollment).filter(
+                    Enrollment.teacher_id == teacher.id
+                ).distinct().count(),
+                'lessons': Lesson.query.filter_by(teacher_id=teacher.id).count()
+            }
+
+    elif user.role in ['admin', 'assistant']:
+        data['stats'] = {
+            'students': Student.query.count(),
+            'teachers': Teacher.query.count(),
+            'courses': Course.query.count(),
+            'enrollments': Enrollment.query.count()
+        }
+
+    return data
+
+
+# ---------- المحتوى العام ----------
+
+def _published_lesson_counts(course_ids):
+    if not course_ids:
+        return {}
+    rows = db.session.query(Lesson.course_id, func.count(Lesson.id)).filter(
+        Lesson.course_id.in_(course_ids),
+        Lesson.is_published == True
+    ).group_by(Lesson.course_id).all()
+    return dict(rows)
+
+
+def _teacher_names(teacher_ids):
+    teacher_ids = {teacher_id for teacher_id in teacher_ids if teacher_id}
+    if not teacher_ids:
+        return {}
+    rows = db.session.query(Teacher.id, User.full_name).join(
+        User, User.id == Teacher.user_id
+    ).filter(Teacher.id.in_(teacher_ids)).all()
+    return dict(rows)
+
+
+def _course_dict(course, enrolled_count=0):
+    return {
+        'id': course.id,
+        'title': course.title,
+        'description': course.description,
+        'duration': course.duration,
+        'is_featured': course.is_featured,
+        'available_seats': (course.max_students - enrolled_count) if course.max_students else "غير محدود"
+    }
+
+
+def get_course(course_id):
+    course = db.session.get(Course, course_id)
+    if not course:
+        return None
+    data = _course_dict(course, queries.course_enrollments(course.id).count())
+    data['lessons_count'] = queries.course_lessons(course.id).count()
+    return data
+
+
+def _news_dict(news):
+    return {
+        'id': news.id,
+        'title': news.title,
+        'content': news.content,
+        'created_at': news.created_at
+    }
+
+
+def get_news(news_id):
+    news = db.session.get(News, news_id)
+    return _news_dict(news) if news else None
+
+
+def _teacher_dict(teacher):
+    return {
+        'id': teacher.id,
+        'full_name': teacher.user.full_name,
+        'specialization': teacher.specialization,
+        'qualifications': teacher.qualifications,
+        'experience_years': teacher.experience_years,
+        'phone': teacher.phone,
+        'bio': teacher.bio
+    }
+
+
+def get_teacher(teacher_id):
+    teacher = db.session.get(Teacher, teacher_id, options=TEACHER_WITH_USER)
+    return _teacher_dict(teacher) if teacher else None
+
+
+# ---------- بيانات الطالب ----------
+
+def get_student_courses(telegram_id, page=0, page_size=LIST_PAGE_SIZE):
+    """
+    None إذا لم يكن المستخدم مسجلاً دخوله
+    وإلا {'role': ..., 'courses': [...] أو None إذا لم يكن طالباً} مع معلومات الصفحة
+    """
+    user = _authenticated_user(telegram_id)
+    if not user:
+        return None
+
+    result = {'role': user.role, 'courses': None}
+    if user.role != 'student':
+        return result
+
+    student = Student.query.filter_by(user_id=user.id).first()
+    if not student:
+        return result
+
+    query = queries.student_enrollments(student.id)
+    page, offset = _page(result, query.count(), page, page_size)
+    enrollments = query.options(*ENROLLMENT_WITH_COURSE).order_by(
+        Enrollment.id
+    ).limit(page_size).offset(offset).all()
+
+    lesson_counts = _published_lesson_counts([enrollment.course_id for enrollment in enrollments])
+    teacher_names = _teacher_names([enrollment.teacher_id for enrollment in enrollments])
+
+    result['courses'] = [
+        {
+            'id': enrollment.course.id,
+            'title': enrollment.course.title,
+            'duration': enrollment.course.duration,
+            'teacher_name': teacher_names.get(enrollment.teacher_id),
+            'lessons_count': lesson_counts.get(enrollment.course_id, 0)
+        }
+        for enrollment in enrollments
+    ]
+    return result
+
+
+def get_student_grades(telegram_id, limit=20):
+    user = _authenticated_user(telegram_id)
+    if not user:
+        return None
+
+    result = {'role': user.role, 'grades': None}
+    if user.role != 'student':
+        return result
+
+    student = Student.query.filter_by(user_id=user.id).first()
+    if not student:
+        return result
+
+    query = queries.student_grades(student.id)
+    result['total'] = query.count()
+    grades = query.options(*GRADE_WITH_COURSE).limit(limit).all()
+    result['grades'] = [
+        {
+            'course_title': grade.course.title,
+            'exam_name': grade.exam_name,
+            'grade': grade.grade,
+            'max_grade': grade.max_grade,
+            'created_at': grade.created_at
+        }
+        for grade in grades
+    ]
+    return result
+
+
+def get_course_lessons(telegram_id, course_id, page=0, page_size=LIST_PAGE_SIZE):
+    """تُرجع (الحالة، البيانات) والحالة واحدة من unauthenticated / no_student / not_enrolled / ok"""
+    user = _authenticated_user(telegram_id)
+    if not user:
+        return 'unauthenticated', None
+
+    student = Student.query.filter_by(user_id=user.id).first()
+    if not student:
+        return 'no_student', None
+
+    enrollment = queries.student_course_enrollment(student.id, course_id).first()
+    if not enrollment:
+        return 'not_enrolled', None
+
+    course = db.session.get(Course, course_id)
+    query = queries.course_lessons(course_id)
+    result = {'course_id': course_id, 'course_title': course.title}
+    page, offset = _page(result, query.count(), page, page_size)
+    lessons = query.order_by(Lesson.id).limit(page_size).offset(offset).all()
+    result['lessons'] = [
+        {'id': lesson.id, 'title': lesson.title, 'has_file': bool(lesson.file_path)}
+        for lesson in lessons
+    ]
+    return 'ok', result
+
+
+def get_lesson(telegram_id, lesson_id):
+    """تُرجع (الحالة، البيانات) والحالة واحدة من unauthenticated / not_found / ok"""
+    if not _authenticated_user(telegram_id):
+        return 'unauthenticated', None
+
+    lesson = db.session.get(Lesson, lesson_id, options=LESSON_DETAIL)
+    if not lesson:
+        return 'not_found', None
+
+    course = lesson.course
+    teacher = lesson.teacher
+    return 'ok', {
+        'id': lesson.id,
+        'title': lesson.title,
+        'description': lesson.description,
+        'upload_date': lesson.upload_date,
+        'has_file': bool(lesson.file_path),
+        'course_title': course.title if course else None,
+        'teacher_name': teacher.user.full_name if teacher else None
+    }
+
+
+def get_lesson_file(lesson_id):
+    lesson = db.session.get(Lesson, lesson_id)
+    if not lesson or not lesson.file_path:
+        return None
+    return {'title': lesson.title, 'file_path': lesson.file_path}
+
+
+# ---------- بيانات المعلم ----------
+
+def _teacher_for(telegram_id):
+    """تُرجع (المستخدم، المعلم) أو (None, None) إذا لم يكن مسجلاً دخوله"""
+    user = _authenticated_user(telegram_id)
+    if not user:
+        return None, None
+    teacher = Teacher.query.filter_by(user_id=user.id).first() if user.role == 'teacher' else None
+    return user, teacher
+
+
+def get_teacher_courses(telegram_id, page=0, page_size=LIST_PAGE_SIZE):
+    user, teacher = _teacher_for(telegram_id)
+    if not user:
+        return None
+
+    result = {'role': user.role, 'courses': None}
+    if not teacher:
+        return result
+
+    total = db.session.query(func.count(func.distinct(Enrollment.course_id))).filter(
+        Enrollment.teacher_id == teacher.id
+    ).scalar()
+    page, offset = _page(result, total, page, page_size)
+
+    rows = db.session.query(Course, func.count(Enrollment.id)).join(
+        Enrollment, Enrollment.course_id == Course.id
+    ).filter(
+        Enrollment.teacher_id == teacher.id
+    ).group_by(Course.id).order_by(Course.id).limit(page_size).offset(offset).all()
+
+    course_ids = [course.id for course, _ in rows]
+    lesson_counts = dict(db.session.query(Lesson.course_id, func.count(Lesson.id)).filter(
+        Lesson.teacher_id == teacher.id,
+        Lesson.course_id.in_(course_ids)
+    ).group_by(Lesson.course_id).all()) if course_ids else {}
+
+    result['courses'] = [
+        {
+            'id': course.id,
+            'title': course.title,
+            'duration': course.duration,
+            'students': students,
+            'lessons_count': lesson_counts.get(course.id, 0)
+        }
+        for course, students in rows
+    ]
+    return result
+
+
+def get_teacher_lessons(telegram_id, page=0, page_size=LIST_PAGE_SIZE):
+    user, teacher = _teacher_for(telegram_id)
+    if not user:
+        return None
+
+    result = {'role': user.role, 'lessons': None}
+    if not teacher:
+        return result
+
+    query = queries.teacher_lessons(teacher.id)
+    page, offset = _page(result, query.count(), page, page_size)
+    lessons = query.options(*LESSON_WITH_COURSE).limit(page_size).offset(offset).all()
+
+    result['lessons'] = [
+        {
+            'title': lesson.title,
+            'course_title': lesson.course.title if lesson.course else None,
+            'upload_date': lesson.upload_date,
+            'has_file': bool(lesson.file_path),
+            'is_published': lesson.is_published
+        }
+        for lesson in lessons
+    ]
+    return result
+
+
+def get_teacher_students(telegram_id, page=0, page_size=LIST_PAGE_SIZE):
+    user, teacher = _teacher_for(telegram_id)
+    if not user:
+        return None
+
+    result = {'role': user.role, 'students': None}
+    if not teacher:
+        return result
+
+    total = db.session.query(func.count(func.distinct(Enrollment.student_id))).filter(
+        Enrollment.teacher_id == teacher.id
+    ).scalar()
+    page, offset = _page(result, total, page, page_size)
+
+    students = queries.teacher_students(teacher.id).options(*STUDENT_WITH_USER).order_by(
+        Student.id
+    ).limit(page_size).offset(offset).all()
+
+    courses = {}
+    if students:
+        rows = db.session.query(Enrollment.student_id, Course.title).join(
+            Course, Course.id == Enrollment.course_id
+        ).filter(
+            Enrollment.teacher_id == teacher.id,
+            Enrollment.student_id.in_([student.id for student in students])
+        ).order_by(Enrollment.id).all()
+        for student_id, title in rows:
+            courses.setdefault(student_id, []).append(title)
+
+    result['students'] = [
+        {
+            'full_name': student.user.full_name,
+            'phone_number': student.user.phone_number,
+            'courses': courses.get(student.id, [])
+        }
+        for student in students
+    ]
+    return result
+
+
+# ---------- الحضور والإشعارات ----------
+
+def get_attendance_summary(telegram_id):
+    user = _authenticated_user(telegram_id)
+    if not user:
+        return None
+
+    recent_records = Attendance.query.filter_by(user_id=user.id).order_by(
+        Attendance.date.desc()
+    ).limit(10).all()
+
+    return {
+        'user': _user_dict(user),
+        'stats': Attendance.get_user_stats(user.id),
+        'recent_stats': Attendance.get_user_stats(user.id, start_date=date.today() - timedelta(days=365)),
+        'recent_records': [
+            {'date': record.date, 'status': record.status, 'notes': record.notes}
+            for record in recent_records
+        ]
+    }
+
+
+def get_notifications(telegram_id, limit=20):
+    from app.utils.notifications import get_user_notifications, get_unread_count
+
+    user = _authenticated_user(telegram_id)
+    if not user:
+        return None
+
+    notifications = []
+    for recipient in get_user_notifications(user.id, unread_only=False, limit=limit):
+        notification = recipient.notification
+        if not notification:
+            continue
+        notifications.append({
+            'recipient_id': recipient.id,
+            'is_read': recipient.is_read,
+            'title': notification.title,
+            'message': notification.message,
+            'created_at': notification.created_at
+        })
+
+    return {'unread_count': get_unread_count(user.id), 'notifications': notifications}
+
+
+def read_notification(telegram_id, recipient_id):
+    """تعليم الإشعار كمقروء وإرجاع محتواه إذا كان يخص صاحب الجلسة"""
+    recipient = db.session.get(NotificationRecipient, recipient_id)
+    if not recipient or not recipient.user.id:
+        return None
+
+    session = queries.bot_session(telegram_id).first()
+    if not session or session.user_id != recipient.user_id:
+        return None
+
+    if not recipient.is_read:
+        recipient.mark_as_read(source='telegram')
+
+    notification = recipient.notification
+    return {
+        'title': notification.title,
+        'message': notification.message,
+        'created_at': notification.created_at
+    }
@@ -0,0 +1,206 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import bindparam, update
+from app import db
+from app.models import BotSession
+from app.utils.helpers import damascus_now
+from app.utils.worker_context import worker_app_context
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = int(os.environ.get('BOT_SESSION_CACHE_SIZE', 5000))
+DEFAULT_TTL = int(os.environ.get('BOT_SESSION_TTL_SECONDS', 900))
+DEFAULT_FLUSH_INTERVAL = int(os.environ.get('BOT_SESSION_FLUSH_SECONDS', 30))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+class _Entry:
+    __slots__ = ('state', 'dirty', 'loaded_at')
+
+    def __init__(self, state):
+        self.state = state
+        self.dirty = {}
+        self.loaded_at = time.monotonic()
+
+
+class BotSessionCache:
+    """
+    ذاكرة مؤقتة لحالة جلسات البوت مفهرسة بـ telegram_id مع مدة صلاحية وإزاحة الأقدم استخداماً (LRU):
+    - كل تحديث يعدّل الحالة في الذاكرة ويسجّل الحقول التي تغيرت فعلاً فقط
+    - الحقول المعدلة تُكتب دفعة واحدة كل flush_interval ثانية، مجمّعة حسب مجموعة الحقول
+    - الجلسة التي تُزاح أو تنتهي صلاحيتها وفيها تعديلات تنتظر الدفعة التالية ولا تضيع
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._entries = OrderedDict()
+        self._evicted = {}
+
+    def get(self, telegram_id):
+        """حالة الجلسة من الذاكرة، أو None إذا لم تكن محمّلة أو انتهت صلاحيتها"""
+        with self._lock:
+            entry = self._entries.get(telegram_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.loaded_at >= self.ttl:
+                self._discard(telegram_id)
+                return None
+            self._entries.move_to_end(telegram_id)
+            return dict(entry.state)
+
+    def touch(self, telegram_id, **profile):
+        """تسجيل نشاط للجلسة وتحديث بياناتها في الذاكرة؛ تُرجع الحالة أو None عند عدم وجودها"""
+        with self._lock:
+            entry = self._entries.get(telegram_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.loaded_at >= self.ttl:
+                self._discard(telegram_id)
+                return None
+
+            for field, value in profile.items():
+                if entry.state.get(field) != value:
+                    entry.state[field] = value
+                    entry.dirty[field] = value
+            entry.dirty['last_activity'] = damascus_now()
+            self._entries.move_to_end(telegram_id)
+            state = dict(entry.state)
+
+        self._ensure_thread()
+        return state
+
+    def put(self, telegram_id, state):
+        """تخزين حالة جلسة قرئت للتو من قاعدة البيانات أو كُتبت فيها"""
+        with self._lock:
+            entry = self._entries.pop(telegram_id, None)
+            new_entry = _Entry(dict(state))
+            if entry is not None:
+                new_entry.dirty = entry.dirty
+            self._entries[telegram_id] = new_entry
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+
+    def _discard(self, telegram_id):
+        entry = self._entries.pop(telegram_id)
+        if entry.dirty:
+            self._evicted.setdefault(telegram_id, {}).update(entry.dirty)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run_loop, name='bot-sessions', daemon=True)
+                self._thread.start()
+
+    def _run_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing bot sessions: {e}")
+
+    def _take_dirty(self, telegram_ids=None):
+        with self._lock:
+            ids = list(self._evicted) + list(self._entries) if telegram_ids is None else telegram_ids
+            pending = {}
+            for telegram_id in ids:
+                changes = self._evicted.pop(telegram_id, {})
+                entry = self._entries.get(telegram_id)
+                if entry is not None and entry.dirty:
+                    changes.update(entry.dirty)
+                    entry.dirty = {}
+                if changes:
+                    pending[telegram_id] = changes
+            return pending
+
+    def _restore_dirty(self, pending):
+        with self._lock:
+            for telegram_id, changes in pending.items():
+                entry = self._entries.get(telegram_id)
+                target = entry.dirty if entry is not None else self._evicted.setdefault(telegram_id, {})
+                for field, value in changes.items():
+                    target.setdefault(field, value)
+
+    def flush(self, telegram_ids=None):
+        """كتابة الحقول المعدلة في قاعدة البيانات (لكل الجلسات أو للجلسات المحددة فقط)"""
+        with self._flush_lock:
+            pending = self._take_dirty(telegram_ids)
+            if not pending:
+                return 0
+
+            try:
+                with worker_app_context():
+                    _write_changes(pending)
+            except Exception:
+                self._restore_dirty(pending)
+                raise
+            return len(pending)
+
+    def stop(self, timeout=5):
+        """إيقاف خيط الكتابة وحفظ ما تبقى من تعديلات"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing bot sessions on shutdown: {e}")
+
+
+def _write_changes(pending):
+    """تحديث مجمّع: عبارة UPDATE واحدة (executemany) لكل مجموعة حقول متطابقة"""
+    table = BotSession.__table__
+    groups = {}
+    for telegram_id, changes in pending.items():
+        fields = tuple(sorted(changes))
+        row = {f'b_{field}': value for field, value in changes.items()}
+        row['b_telegram_id'] = telegram_id
+        groups.setdefault(fields, []).append(row)
+
+    try:
+        for fields, rows in groups.items():
+            stmt = update(table).where(
+                table.c.telegram_id == bindparam('b_telegram_id')
+            ).values({field: bindparam(f'b_{field}') for field in fields})
+            db.session.execute(stmt, rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def session_state(session):
+    return {
+        'id': session.id,
+        'is_authenticated': bool(session.is_authenticated),
+        'user_id': session.user_id,
+        'username': session.username,
+        'first_name': session.first_name,
+        'last_name': session.last_name
+    }
+
+
+def get_session_cache():
+    """ذاكرة الجلسات المشتركة للعملية الحالية، تُنشأ عند أول استخدام"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BotSessionCache()
+        return _cache
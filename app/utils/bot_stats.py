@@ -0,0 +1,157 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from app import db
+from app.models import BotSession, BotStatistics
+from app.utils.helpers import damascus_now
+from app.utils.upsert import upsert
+from app.utils.worker_context import worker_app_context
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = int(os.environ.get('BOT_STATS_FLUSH_SECONDS', 30))
+DEFAULT_TOTALS_INTERVAL = int(os.environ.get('BOT_STATS_TOTALS_SECONDS', 300))
+
+_accumulator = None
+_accumulator_lock = threading.Lock()
+
+
+class BotStatsAccumulator:
+    """
+    عداد رسائل البوت داخل الذاكرة:
+    - الزيادة تتم تحت قفل بدون أي استعلام
+    - العدادات تُضاف إلى جدول bot_statistics بعبارة upsert واحدة كل flush_interval ثانية وعند الإيقاف
+    - عدد المستخدمين الكلي والنشطين اليوم يُعاد حسابه فقط كل totals_interval ثانية
+    """
+
+    def __init__(self, flush_interval=DEFAULT_FLUSH_INTERVAL, totals_interval=DEFAULT_TOTALS_INTERVAL):
+        self.flush_interval = flush_interval
+        self.totals_interval = totals_interval
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pending = {}
+        self._totals_at = None
+
+    def record(self, received=0, sent=0):
+        today = damascus_now().date()
+        with self._lock:
+            counts = self._pending.setdefault(today, [0, 0])
+            counts[0] += received
+            counts[1] += sent
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run_loop, name='bot-stats', daemon=True)
+                self._thread.start()
+
+    def _run_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing bot statistics: {e}")
+
+    def _totals_due(self):
+        return self._totals_at is None or time.monotonic() - self._totals_at >= self.totals_interval
+
+    def flush(self, force_totals=False):
+        """كتابة العدادات المتراكمة في قاعدة البيانات"""
+        with self._flush_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = {}
+
+            refresh_totals = force_totals or self._totals_due()
+            if not pending and not refresh_totals:
+                return
+
+            try:
+                with worker_app_context():
+                    self._write(pending, refresh_totals)
+            except Exception:
+                with self._lock:
+                    for day, (received, sent) in pending.items():
+                        counts = self._pending.setdefault(day, [0, 0])
+                        counts[0] += received
+                        counts[1] += sent
+                raise
+
+            if refresh_totals:
+                self._totals_at = time.monotonic()
+
+    def _write(self, pending, refresh_totals):
+        today = damascus_now().date()
+        if refresh_totals:
+            pending.setdefault(today, [0, 0])
+
+        table = BotStatistics.__table__
+        now = damascus_now()
+        rows = [
+            {
+                'date': day,
+                'messages_received': received,
+                'messages_sent': sent,
+                'total_users': 0,
+                'active_users_today': 0,
+                'updated_at': now
+            }
+            for day, (received, sent) in sorted(pending.items())
+        ]
+
+        try:
+            upsert(
+                table,
+                rows,
+                index_elements=['date'],
+                update_columns=lambda excluded: {
+                    'messages_received': table.c.messages_received + excluded.messages_received,
+                    'messages_sent': table.c.messages_sent + excluded.messages_sent,
+                    'updated_at': now
+                }
+            )
+
+            if refresh_totals:
+                total_users = BotSession.query.count()
+                active_today = BotSession.query.filter(
+                    BotSession.last_activity >= datetime.combine(today, datetime.min.time())
+                ).count()
+                BotStatistics.query.filter_by(date=today).update({
+                    'total_users': total_users,
+                    'active_users_today': active_today
+                })
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def stop(self, timeout=5):
+        """إيقاف خيط التفريغ وكتابة ما تبقى من عدادات"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self._thread = None
+        try:
+            self.flush(force_totals=True)
+        except Exception as e:
+            logger.error(f"Error flushing bot statistics on shutdown: {e}")
+
+
+def get_bot_stats():
+    """العداد المشترك للعملية الحالية، يُنشأ عند أول استخدام"""
+    global _accumulator
+    with _accumulator_lock:
+        if _accumulator is None:
+            _accumulator = BotStatsAccumulator()
+        return _accumulator
@@ -0,0 +1,63 @@
+"""
+معالج تحديثات البوت: تحديثات المحادثات المختلفة تُعالج بالتوازي، وتحديثات المحادثة الواحدة بالتتابع وبترتيب وصولها
+ConversationHandler (تسجيل الدخول) يحفظ حالة كل محادثة، ومعالجة تحديثين من المحادثة نفسها معاً
+قد تقرأ الحالة نفسها قبل أن يحدّثها أحدهما (رقم الهاتف وكلمة المرور مثلاً)
+"""
+import asyncio
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    حتى max_concurrent_updates تحديثاً في الوقت نفسه، مع قفل لكل محادثة
+    الأقفال تُحذف حين لا ينتظرها أي تحديث، فلا تكبر الذاكرة مع عدد المحادثات
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self._chats = {}
+
+    @staticmethod
+    def chat_key(update):
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return update.effective_user.id
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        key = self.chat_key(update)
+        if key is None:
+            await coroutine
+            return
+
+        entry = self._chats.get(key)
+        if entry is None:
+            entry = self._chats[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            try:
+                await entry[0].acquire()
+            except asyncio.CancelledError:
+                # التحديث أُلغي قبل دوره، فلا يبقى coroutine معلقاً دون تنفيذ
+                close = getattr(coroutine, 'close', None)
+                if close:
+                    close()
+                raise
+            try:
+                await coroutine
+            finally:
+                entry[0].release()
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chats[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,245 @@
+import asyncio
+import atexit
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from telegram import Update
+from app.utils.db_engine import PROCESS_ROLE
+from app.utils.telegram_client import TelegramClientRegistry
+
+logger = logging.getLogger(__name__)
+
+# تحت serve.py يعمل تطبيق البوت في عملية البوت وحدها، فحالة المحادثات (مثل خطوات /login)
+# تبقى في مكان واحد؛ عمّال الويب يمررون التحديثات إليه عبر منفذ محلي
+BOT_UPDATE_PORT = int(os.environ.get('BOT_UPDATE_PORT', 5002))
+FORWARD_TIMEOUT = 5
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def webhook_secret():
+    """
+    القيمة التي يرسلها تيليجرام في ترويسة X-Telegram-Bot-Api-Secret-Token
+    TELEGRAM_WEBHOOK_SECRET إن وُجد، وإلا قيمة عشوائية تُولَّد مرة واحدة وتُحفظ في site_settings
+    فتشترك فيها كل العمليات، ولا يمكن اشتقاقها من التوكن
+    """
+    secret = os.environ.get('TELEGRAM_WEBHOOK_SECRET')
+    if secret:
+        return secret
+
+    from app import db
+    from app.models import SiteSettings
+    from app.utils.worker_context import worker_app_context
+
+    with worker_app_context():
+        stored = db.session.query(SiteSettings.telegram_bot_webhook_secret).order_by(SiteSettings.id).limit(1).scalar()
+        if stored:
+            return stored
+        # تحديث مشروط: إذا ولّدت عمليتان القيمة معاً تبقى قيمة واحدة هي التي تُقرأ بعده
+        settings_id = db.session.query(SiteSettings.id).order_by(SiteSettings.id).limit(1).scalar()
+        if settings_id is None:
+            raise RuntimeError("site_settings row is required to store the webhook secret")
+        db.session.query(SiteSettings).filter(
+            SiteSettings.id == settings_id,
+            SiteSettings.telegram_bot_webhook_secret.is_(None)
+        ).update({'telegram_bot_webhook_secret': secrets.token_hex(32)}, synchronize_session=False)
+        db.session.commit()
+        return db.session.query(SiteSettings.telegram_bot_webhook_secret).filter_by(id=settings_id).scalar()
+
+
+def verify_webhook_secret(value):
+    """مقارنة ثابتة الزمن بين ترويسة الطلب والقيمة السرية"""
+    return hmac.compare_digest((value or '').encode(), webhook_secret().encode())
+
+
+def register_webhook(token, url):
+    """تسجيل عنوان Webhook لدى تيليجرام (يوقف تلقائياً أي Long Polling سابق)"""
+    async def set_webhook(bot):
+        return await bot.set_webhook(
+            url=url,
+            secret_token=webhook_secret(),
+            allowed_updates=Update.ALL_TYPES
+        )
+
+    return TelegramClientRegistry.run(token, set_webhook, timeout=30)
+
+
+class BotWebhookRunner:
+    """
+    تطبيق البوت بدون Updater (في عملية البوت، أو في عملية الويب عند التشغيل بعملية واحدة):
+    يعمل في حلقة أحداث بخيط خاص، والتحديثات الواصلة إلى نقطة Webhook توضع في update_queue الخاصة به
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self.application = None
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def start(self, timeout=30):
+        self._thread = threading.Thread(target=self._run_loop, name='bot-webhook', daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("Timed out starting the bot application")
+        if self._error:
+            raise self._error
+
+    def _run_loop(self):
+        import bot
+
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self.application = bot.build_application(self.token, polling=False)
+            self._loop.run_until_complete(self.application.initialize())
+            self._loop.run_until_complete(self.application.start())
+        except Exception as e:
+            logger.error(f"Error starting bot application for webhook: {e}")
+            self._error = e
+            self._ready.set()
+            self._loop.close()
+            return
+
+        logger.info("Bot application started in webhook mode")
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    def dispatch(self, data):
+        """تحويل JSON التحديث إلى Update ووضعه في طابور التطبيق دون انتظار معالجته"""
+        update = Update.de_json(data, self.application.bot)
+        asyncio.run_coroutine_threadsafe(self.application.update_queue.put(update), self._loop)
+
+    def stop(self, timeout=10):
+        if self._loop is None or self._loop.is_closed() or self.application is None:
+            return
+
+        async def shutdown():
+            await self.application.stop()
+            await self.application.shutdown()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout)
+        except Exception as e:
+            logger.error(f"Error stopping bot webhook application: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+        import bot
+        bot.shutdown_services()
+
+
+def forward_update(token, data):
+    """تمرير تحديث تحقق منه عامل الويب إلى عملية البوت؛ تُرجع False إذا تعذر التسليم"""
+    request = urllib.request.Request(
+        f'http://127.0.0.1:{BOT_UPDATE_PORT}/update',
+        data=json.dumps(data).encode(),
+        headers={'Content-Type': 'application/json', SECRET_HEADER: webhook_secret()},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=FORWARD_TIMEOUT) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError) as e:
+        logger.error(f"Error forwarding update to the bot process: {e}")
+        return False
+
+
+def deliver_update(token, data):
+    """
+    عمّال الويب تحت serve.py يمررون التحديث إلى عملية البوت، وفي التشغيل بعملية واحدة
+    (runner.py أو خادم التطوير) يُعالج داخل العملية نفسها
+    """
+    if PROCESS_ROLE == 'web':
+        return forward_update(token, data)
+    get_webhook_runner(token).dispatch(data)
+    return True
+
+
+def _current_token():
+    from app.models import SiteSettings
+    from app.utils.worker_context import worker_app_context
+
+    with worker_app_context():
+        settings = SiteSettings.query.first()
+        if (not settings or not settings.telegram_bot_token or not settings.telegram_bot_enabled
+                or not settings.telegram_bot_webhook_enabled):
+            return None
+        return settings.telegram_bot_token
+
+
+def start_update_server(port=BOT_UPDATE_PORT):
+    """
+    مستقبل التحديثات المحلي في عملية البوت (127.0.0.1 فقط)، يضعها في تطبيق البوت الوحيد
+    الترويسة السرية تُتحقق مرة أخرى حتى لا تقبل العملية تحديثات من غير عمّال الويب
+    """
+
+    class UpdateHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/update':
+                self.send_error(404)
+                return
+
+            token = _current_token()
+            if not token:
+                self.send_error(404)
+                return
+            if not verify_webhook_secret(self.headers.get(SECRET_HEADER)):
+                self.send_error(403)
+                return
+
+            try:
+                data = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                get_webhook_runner(token).dispatch(data)
+            except Exception as e:
+                logger.error(f"Error dispatching forwarded update: {e}")
+                self.send_error(503)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), UpdateHandler)
+    threading.Thread(target=server.serve_forever, name='bot-updates', daemon=True).start()
+    logger.info(f"Receiving forwarded webhook updates on 127.0.0.1:{port}")
+    return server
+
+
+def get_webhook_runner(token):
+    """تطبيق البوت المشترك للعملية الحالية، يبدأ عند أول تحديث يصل"""
+    global _runner
+    with _runner_lock:
+        if _runner is not None and _runner.token != token:
+            _runner.stop()
+            _runner = None
+        if _runner is None:
+            runner = BotWebhookRunner(token)
+            runner.start()
+            _runner = runner
+        return _runner
+
+
+def stop_webhook_runner():
+    global _runner
+    with _runner_lock:
+        if _runner is not None:
+            _runner.stop()
+            _runner = None
+
+
+atexit.register(stop_webhook_runner)
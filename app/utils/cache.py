@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+from sqlalchemy import event, select
+from app import db
+from app.models import CacheVersion
+from app.utils.helpers import damascus_now
+
+logger = logging.getLogger(__name__)
+
+_caches = []
+_listeners_registered = False
+
+
+class VersionedCache:
+    """
+    ذاكرة مؤقتة داخل العملية تُبطَل عند حفظ تعديلات على الجداول المراقبة
+    رقم الإصدار يُحفظ في جدول cache_versions ليصل الإبطال إلى بقية العمليات
+    """
+
+    def __init__(self, name, tables, ttl=300, version_check_interval=2.0):
+        self.name = name
+        self.tables = frozenset(tables)
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self._entries = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def get(self, key, loader):
+        version = self.current_version()
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] == version and now - entry[2] < self.ttl:
+                return entry[0]
+
+        value = loader()
+
+        with self._lock:
+            self._entries[key] = (value, version, now)
+        return value
+
+    def current_version(self):
+        now = time.monotonic()
+        if self._version is None or now - self._checked_at >= self.version_check_interval:
+            try:
+                version = db.session.execute(
+                    select(CacheVersion.version).where(CacheVersion.name == self.name)
+                ).scalar()
+            except Exception as e:
+                logger.error(f"Error reading cache version for {self.name}: {e}")
+                version = None
+            self._version = version or 0
+            self._checked_at = now
+        return self._version
+
+    def invalidate_local(self):
+        with self._lock:
+            self._entries.clear()
+            self._checked_at = 0.0
+
+
+def bump_versions(names, bind):
+    """زيادة رقم إصدار الذواكر المحددة في قاعدة البيانات"""
+    from app.utils.upsert import upsert
+
+    table = CacheVersion.__table__
+    upsert(
+        table,
+        [{'name': name, 'version': 1, 'updated_at': damascus_now()} for name in sorted(names)],
+        index_elements=['name'],
+        update_columns={'version': table.c.version + 1, 'updated_at': damascus_now()},
+        bind=bind
+    )
+
+
+def _changed_tables(session):
+    return session.info.setdefault('changed_tables', set())
+
+
+def setup_cache_invalidation():
+    """ربط أحداث الجلسة بإبطال الذواكر المؤقتة بعد كل commit يمس جداولها"""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    _listeners_registered = True
+
+    @event.listens_for(db.session, 'after_flush')
+    def receive_after_flush(session, flush_context):
+        changed = _changed_tables(session)
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            table_name = getattr(obj, '__tablename__', None)
+            if table_name:
+                changed.add(table_name)
+
+    @event.listens_for(db.session, 'do_orm_execute')
+    def receive_do_orm_execute(orm_execute_state):
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            table = getattr(orm_execute_state.statement, 'table', None)
+            if table is not None:
+                _changed_tables(orm_execute_state.session).add(table.name)
+
+    @event.listens_for(db.session, 'after_commit')
+    def receive_after_commit(session):
+        changed = session.info.pop('changed_tables', None)
+        if not changed:
+            return
+
+        stale = [cache for cache in _caches if cache.tables & changed]
+        if not stale:
+            return
+
+        for cache in stale:
+            cache.invalidate_local()
+
+        try:
+            bump_versions({cache.name for cache in stale}, session.get_bind())
+        except Exception as e:
+            logger.error(f"Error bumping cache versions: {e}")
+
+    @event.listens_for(db.session, 'after_rollback')
+    def receive_after_rollback(session):
+        session.info.pop('changed_tables', None)
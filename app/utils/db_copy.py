@@ -0,0 +1,98 @@
+"""
+نسخ البيانات بين قاعدتين بأي محرك (مثلاً من ملف SQLite الحالي إلى PostgreSQL)
+- مخطط الهدف يُنشأ من النماذج، ثم تُنسخ الجداول بترتيب المفاتيح الأجنبية على دفعات
+- الأعمدة تُقرأ عبر أنواع النماذج فتتحول قيم SQLite (0/1، التواريخ النصية) إلى أنواع المحرك الهدف
+- الأعمدة غير الموجودة في قاعدة مصدر قديمة تأخذ القيمة الافتراضية في الهدف
+"""
+import logging
+import sqlalchemy as sa
+from sqlalchemy import inspect, text
+from app import db
+from app.utils import migrations
+from app.utils.unread_counters import rebuild_unread_counters
+
+logger = logging.getLogger(__name__)
+
+COPY_BATCH_SIZE = 1000
+
+
+def _engine(url_or_engine):
+    if isinstance(url_or_engine, sa.engine.Engine):
+        return url_or_engine, False
+    return sa.create_engine(url_or_engine), True
+
+
+def _reset_sequences(connection, tables):
+    """بعد إدراج المفاتيح الأساسية صراحةً يجب تقديم تسلسلات PostgreSQL إلى أكبر قيمة"""
+    for table in tables:
+        primary_key = list(table.primary_key.columns)
+        if len(primary_key) != 1 or not isinstance(primary_key[0].type, sa.Integer):
+            continue
+        if primary_key[0].autoincrement is False:
+            continue
+        column = primary_key[0].name
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence(:table, :column), "
+            f"COALESCE(MAX({column}), 1), MAX({column}) IS NOT NULL) FROM {table.name}"
+        ), {'table': table.name, 'column': column})
+
+
+def copy_database(source, target, batch_size=COPY_BATCH_SIZE, replace=False, progress=None):
+    """
+    نسخ كل جداول النماذج من source إلى target (رابط قاعدة أو Engine)
+    replace: حذف بيانات الهدف الموجودة أولاً، وإلا يُرفض النسخ إلى جدول غير فارغ
+    progress: دالة (اسم الجدول، عدد الصفوف المنسوخة)
+    تُرجع {اسم الجدول: عدد الصفوف}
+    """
+    source_engine, dispose_source = _engine(source)
+    target_engine, dispose_target = _engine(target)
+    tables = db.metadata.sorted_tables
+    counts = {}
+
+    try:
+        db.metadata.create_all(target_engine)
+        source_tables = set(inspect(source_engine).get_table_names())
+
+        with source_engine.connect() as source_connection, target_engine.begin() as target_connection:
+            if replace:
+                for table in reversed(tables):
+                    target_connection.execute(table.delete())
+            else:
+                for table in tables:
+                    if target_connection.execute(sa.select(sa.func.count()).select_from(table)).scalar():
+                        raise RuntimeError(f'Target table {table.name} is not empty (use replace=True)')
+
+            for table in tables:
+                if table.name not in source_tables:
+                    counts[table.name] = 0
+                    continue
+
+                existing = {column['name'] for column in inspect(source_connection).get_columns(table.name)}
+                columns = [column for column in table.columns if column.name in existing]
+                query = sa.select(*columns).order_by(*table.primary_key.columns)
+
+                copied = 0
+                result = source_connection.execution_options(yield_per=batch_size).execute(query)
+                for rows in result.partitions():
+                    target_connection.execute(table.insert(), [row._asdict() for row in rows])
+                    copied += len(rows)
+                    if progress:
+                        progress(table.name, copied)
+                counts[table.name] = copied
+                logger.info(f'Copied {copied} rows from {table.name}')
+
+            if target_connection.dialect.name == 'postgresql':
+                _reset_sequences(target_connection, tables)
+
+            # العدادات بيانات مشتقة، فتُبنى من جديد حتى لو كان المصدر أقدم منها
+            rebuild_unread_counters(target_connection)
+
+            # مخطط الهدف أُنشئ من النماذج الحالية، فكل الترحيلات مطبّقة عليه فعلاً
+            migrations.stamp(target_connection)
+    finally:
+        if dispose_source:
+            source_engine.dispose()
+        if dispose_target:
+            target_engine.dispose()
+
+    return counts
@@ -0,0 +1,114 @@
+"""
+إعداد محرك قاعدة البيانات لكل عملية:
+- على SQLite: وضع WAL حتى لا يحجب القراء الكاتب، وbusy_timeout بدل فشل "database is locked" فوراً،
+  وsynchronous=NORMAL (آمن مع WAL)، وذاكرة mmap وcache أكبر للقراءة
+- حجم مجمع الاتصالات حسب دور العملية (PROCESS_ROLE: web أو bot أو scheduler أو all)
+- checkpoint دوري يعيد صفحات WAL إلى ملف القاعدة ويبقي حجم ملف WAL محدوداً
+"""
+import logging
+import os
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+PROCESS_ROLE = os.environ.get('PROCESS_ROLE', 'all')
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+# القيمة السالبة بالكيلوبايت لكل اتصال
+SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -32000))
+SQLITE_JOURNAL_SIZE_LIMIT = int(os.environ.get('SQLITE_JOURNAL_SIZE_LIMIT', 64 * 1024 * 1024))
+CHECKPOINT_MINUTES = int(os.environ.get('DB_CHECKPOINT_MINUTES', 5))
+
+# (pool_size, max_overflow) لكل دور
+POOL_SIZES = {
+    'web': (5, 5),
+    'bot': (int(os.environ.get('BOT_DB_WORKERS', 8)) + 2, 4),
+    'scheduler': (3, 2),
+    'supervisor': (1, 1),
+    'all': (20, 10),
+}
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def engine_options(uri, role=PROCESS_ROLE):
+    """خيارات SQLALCHEMY_ENGINE_OPTIONS المناسبة لدور العملية"""
+    pool_size, max_overflow = POOL_SIZES.get(role, POOL_SIZES['all'])
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', pool_size)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', max_overflow)),
+        'pool_timeout': 30,
+    }
+
+    if is_sqlite(uri):
+        if make_url(uri).database in (None, '', ':memory:'):
+            # قاعدة في الذاكرة تستخدم SingletonThreadPool الذي لا يقبل خيارات المجمع
+            return {}
+        # مهلة مكتبة sqlite3 بالثواني، وتطابق busy_timeout المضبوط عند الاتصال
+        options['connect_args'] = {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = 1800
+
+    return options
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+        cursor.execute(f'PRAGMA cache_size={SQLITE_CACHE_SIZE}')
+        cursor.execute(f'PRAGMA journal_size_limit={SQLITE_JOURNAL_SIZE_LIMIT}')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+    finally:
+        cursor.close()
+
+
+def configure_app(app):
+    """ضبط خيارات المحرك قبل db.init_app؛ الخيارات المحددة صراحةً في الإعدادات تبقى كما هي"""
+    options = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    configured = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    for key, value in options.items():
+        configured.setdefault(key, value)
+
+
+def setup_engine(engine):
+    """تسجيل إعدادات الاتصال على المحرك قبل فتح أي اتصال"""
+    if engine.dialect.name != 'sqlite':
+        return
+    if not event.contains(engine, 'connect', _apply_sqlite_pragmas):
+        event.listen(engine, 'connect', _apply_sqlite_pragmas)
+    logger.info(f"SQLite engine configured for role '{PROCESS_ROLE}' (WAL, busy_timeout={SQLITE_BUSY_TIMEOUT_MS}ms)")
+
+
+def checkpoint_wal(engine, mode='PASSIVE'):
+    """
+    نقل صفحات WAL إلى ملف القاعدة؛ PASSIVE لا ينتظر القراء ولا الكتّاب
+    تُرجع (busy, log_frames, checkpointed_frames) أو None لغير SQLite
+    """
+    if engine.dialect.name != 'sqlite':
+        return None
+    with engine.connect() as connection:
+        result = connection.execute(text(f'PRAGMA wal_checkpoint({mode})')).fetchone()
+    return tuple(result) if result else None
+
+
+def run_checkpoint():
+    """مهمة المجدول الدورية"""
+    from app import db
+    from app.utils.worker_context import worker_app_context
+
+    with worker_app_context():
+        try:
+            result = checkpoint_wal(db.engine)
+            if result and result[0]:
+                logger.info(f"WAL checkpoint incomplete (busy), {result[2]}/{result[1]} frames written")
+        except Exception as e:
+            logger.error(f"Error running WAL checkpoint: {e}")
@@ -1,9 +1,18 @@
+import os
+import tempfile
+from copy import copy
+from flask import Response
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
 from io import BytesIO
 from datetime import datetime
 
+EXCEL_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+STREAM_CHUNK_SIZE = 64 * 1024
+EXPORT_YIELD_PER = 500
+
 
 def create_styled_workbook(title, headers, data, column_widths=None):
     wb = Workbook()
@@ -65,7 +74,121 @@ def create_styled_workbook(title, headers, data, column_widths=None):
     return output
 
 
-def export_attendance_to_excel(attendance_records, filter_info=None):
+def _thin_border():
+    return Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+
+
+def _register_named_styles(wb):
+    """
+    أنماط مسماة مشتركة بين كل الخلايا بدل إنشاء Font/Border/Fill لكل خلية
+    تُرجع أسماء الأنماط (العنوان، الصف الفردي، الصف الزوجي)
+    """
+    header = NamedStyle(
+        name='export_header',
+        font=Font(name='Arial', size=12, bold=True, color="FFFFFF"),
+        fill=PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+        alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+        border=_thin_border()
+    )
+    rows = []
+    for name, color in (('export_row_odd', "FFFFFF"), ('export_row_even', "F2F2F2")):
+        rows.append(NamedStyle(
+            name=name,
+            font=Font(name='Arial', size=11),
+            fill=PatternFill(start_color=color, end_color=color, fill_type="solid"),
+            alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+            border=_thin_border()
+        ))
+
+    for style in [header] + rows:
+        wb.add_named_style(style)
+
+    return header.name, [style.name for style in rows]
+
+
+def write_streaming_workbook(title, headers, rows, column_widths=None):
+    """
+    كتابة ملف Excel في وضع write-only صفاً بصف إلى ملف مؤقت
+    rows يمكن أن يكون مولّداً، فلا يُحمّل أي جزء من البيانات بالكامل في الذاكرة
+    تُرجع مسار الملف المؤقت
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    header_style, row_styles = _register_named_styles(wb)
+
+    ws.sheet_view.rightToLeft = True
+    ws.freeze_panes = 'A2'
+
+    widths = column_widths or [20] * len(headers)
+    for col_num, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = width
+
+    # حل اسم النمط مرة واحدة ثم نسخ مصفوفة النمط الجاهزة لكل خلية
+    templates = {}
+    for style in [header_style] + row_styles:
+        template = WriteOnlyCell(ws)
+        template.style = style
+        templates[style] = template._style
+
+    def styled_row(values, style):
+        template = templates[style]
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell._style = copy(template)
+            cells.append(cell)
+        return cells
+
+    ws.append(styled_row(headers, header_style))
+    for index, row_data in enumerate(rows):
+        ws.append(styled_row(row_data, row_styles[index % 2]))
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx', prefix='export_')
+    os.close(fd)
+    try:
+        wb.save(path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def iter_file_chunks(path, chunk_size=STREAM_CHUNK_SIZE):
+    """قراءة الملف على دفعات ثم حذفه بعد انتهاء الإرسال"""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def excel_download_response(path, filename):
+    """استجابة HTTP ترسل ملف Excel على دفعات"""
+    response = Response(iter_file_chunks(path), mimetype=EXCEL_MIMETYPE, direct_passthrough=True)
+    response.headers['Content-Length'] = str(os.path.getsize(path))
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def build_excel_export(title, headers, rows, column_widths=None, streaming=False):
+    if streaming:
+        return write_streaming_workbook(title, headers, rows, column_widths)
+    return create_styled_workbook(title, headers, rows, column_widths)
+
+
+def export_attendance_to_excel(attendance_records, filter_info=None, streaming=False):
     title = "سجل الحضور والغياب"
     
     headers = [
@@ -76,27 +199,27 @@ def export_attendance_to_excel(attendance_records, filter_info=None):
         "ملاحظات"
     ]
     
-    data = []
-    for record in attendance_records:
-        user = record.user
-        full_name = user.full_name if user else "غير محدد"
-        user_type_display = "طالب" if record.user_type == "student" else "أستاذ" if record.user_type == "teacher" else record.user_type
-        status_display = "حاضر" if record.status == "present" else "غائب" if record.status == "absent" else record.status
+    def rows():
+        for record in attendance_records:
+            user = record.user
+            full_name = user.full_name if user else "غير محدد"
+            user_type_display = "طالب" if record.user_type == "student" else "أستاذ" if record.user_type == "teacher" else record.user_type
+            status_display = "حاضر" if record.status == "present" else "غائب" if record.status == "absent" else record.status
         
-        data.append([
-            record.date.strftime('%Y-%m-%d') if record.date else "",
-            full_name,
-            user_type_display,
-            status_display,
-            record.notes or ""
-        ])
+            yield [
+                record.date.strftime('%Y-%m-%d') if record.date else "",
+                full_name,
+                user_type_display,
+                status_display,
+                record.notes or ""
+            ]
     
     column_widths = [15, 25, 15, 15, 30]
     
-    return create_styled_workbook(title, headers, data, column_widths)
+    return build_excel_export(title, headers, rows(), column_widths, streaming)
 
 
-def export_students_to_excel(students):
+def export_students_to_excel(students, streaming=False):
     title = "قائمة الطلاب"
     
     headers = [
@@ -111,31 +234,31 @@ def export_students_to_excel(students):
         "تاريخ التسجيل"
     ]
     
-    data = []
-    for student in students:
-        user = student.user
-        status_display = "نشط" if user.is_active else "معطل"
-        class_grade_name = student.class_grade.name if student.class_grade else "غير محدد"
-        section_name = student.section.name if student.section else "غير محدد"
+    def rows():
+        for student in students:
+            user = student.user
+            status_display = "نشط" if user.is_active else "معطل"
+            class_grade_name = student.class_grade.name if student.class_grade else "غير محدد"
+            section_name = student.section.name if student.section else "غير محدد"
         
-        data.append([
-            student.student_number or "",
-            user.full_name,
-            student.phone or "",
-            class_grade_name,
-            section_name,
-            student.guardian_name or "",
-            student.guardian_phone or "",
-            status_display,
-            student.created_at.strftime('%Y-%m-%d') if student.created_at else ""
-        ])
+            yield [
+                student.student_number or "",
+                user.full_name,
+                student.phone or "",
+                class_grade_name,
+                section_name,
+                student.guardian_name or "",
+                student.guardian_phone or "",
+                status_display,
+                student.created_at.strftime('%Y-%m-%d') if student.created_at else ""
+            ]
     
     column_widths = [15, 25, 15, 15, 15, 20, 15, 12, 15]
     
-    return create_styled_workbook(title, headers, data, column_widths)
+    return build_excel_export(title, headers, rows(), column_widths, streaming)
 
 
-def export_teachers_to_excel(teachers):
+def export_teachers_to_excel(teachers, streaming=False):
     title = "قائمة الأساتذة"
     
     headers = [
@@ -148,27 +271,27 @@ def export_teachers_to_excel(teachers):
         "تاريخ التسجيل"
     ]
     
-    data = []
-    for teacher in teachers:
-        user = teacher.user
-        status_display = "نشط" if user.is_active else "معطل"
+    def rows():
+        for teacher in teachers:
+            user = teacher.user
+            status_display = "نشط" if user.is_active else "معطل"
         
-        data.append([
-            user.full_name,
-            teacher.phone or "",
-            teacher.specialization or "",
-            teacher.experience_years or 0,
-            teacher.qualifications or "",
-            status_display,
-            teacher.created_at.strftime('%Y-%m-%d') if teacher.created_at else ""
-        ])
+            yield [
+                user.full_name,
+                teacher.phone or "",
+                teacher.specialization or "",
+                teacher.experience_years or 0,
+                teacher.qualifications or "",
+                status_display,
+                teacher.created_at.strftime('%Y-%m-%d') if teacher.created_at else ""
+            ]
     
     column_widths = [25, 15, 20, 15, 30, 12, 15]
     
-    return create_styled_workbook(title, headers, data, column_widths)
+    return build_excel_export(title, headers, rows(), column_widths, streaming)
 
 
-def export_payments_to_excel(payments):
+def export_payments_to_excel(payments, streaming=False):
     title = "قائمة الأقساط والدفعات"
     
     headers = [
@@ -182,28 +305,28 @@ def export_payments_to_excel(payments):
         "تاريخ الإنشاء"
     ]
     
-    data = []
-    for payment in payments:
-        student = payment.student
-        student_name = student.user.full_name if student and student.user else "غير محدد"
+    def rows():
+        for payment in payments:
+            student = payment.student
+            student_name = student.user.full_name if student and student.user else "غير محدد"
         
-        status_display = {
-            'paid': 'مدفوع',
-            'partial': 'مدفوع جزئياً',
-            'pending': 'معلق'
-        }.get(payment.status, payment.status)
+            status_display = {
+                'paid': 'مدفوع',
+                'partial': 'مدفوع جزئياً',
+                'pending': 'معلق'
+            }.get(payment.status, payment.status)
         
-        data.append([
-            student_name,
-            payment.title,
-            f"{payment.total_amount:.2f}",
-            f"{payment.paid_amount:.2f}",
-            f"{payment.remaining_amount:.2f}",
-            status_display,
-            payment.due_date.strftime('%Y-%m-%d') if payment.due_date else "",
-            payment.created_at.strftime('%Y-%m-%d') if payment.created_at else ""
-        ])
+            yield [
+                student_name,
+                payment.title,
+                f"{payment.total_amount:.2f}",
+                f"{payment.paid_amount:.2f}",
+                f"{payment.remaining_amount:.2f}",
+                status_display,
+                payment.due_date.strftime('%Y-%m-%d') if payment.due_date else "",
+                payment.created_at.strftime('%Y-%m-%d') if payment.created_at else ""
+            ]
     
     column_widths = [25, 25, 15, 15, 15, 15, 15, 15]
     
-    return create_styled_workbook(title, headers, data, column_widths)
+    return build_excel_export(title, headers, rows(), column_widths, streaming)
@@ -0,0 +1,252 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from app.utils.backup import BackupManager
+from app.utils.helpers import damascus_now
+
+logger = logging.getLogger(__name__)
+
+BACKUP_ROOT = 'backups'
+OBJECTS_DIR = os.path.join(BACKUP_ROOT, 'objects')
+MANIFESTS_DIR = os.path.join(BACKUP_ROOT, 'manifests')
+LAST_UPLOADED_FILE = os.path.join(MANIFESTS_DIR, 'last_uploaded')
+LOCK_FILE = os.path.join(BACKUP_ROOT, '.store.lock')
+
+# نفس محتوى النسخة الشاملة: اسم المجلد داخل النسخة -> المسار في المشروع
+BACKUP_DIRECTORIES = {
+    'uploads': 'app/static/uploads',
+    'templates': 'app/templates',
+    'css': 'app/static/css',
+    'js': 'app/static/js',
+    'images': 'app/static/images',
+    'models': 'app/models',
+    'routes': 'app/routes',
+    'utils': 'app/utils',
+}
+BACKUP_FILES = ['run.py', 'requirements.txt', 'config.py', '.env']
+
+INCREMENTAL_KEEP = 14
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def object_path(digest):
+    return os.path.join(OBJECTS_DIR, digest[:2], digest)
+
+
+def store_object(path, digest):
+    """نسخ الملف إلى المخزن حسب بصمة محتواه؛ تُرجع True إذا كان كائناً جديداً"""
+    target = object_path(digest)
+    if os.path.exists(target):
+        return False
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.tmp_')
+    os.close(fd)
+    try:
+        shutil.copyfile(path, temp_path)
+        os.replace(temp_path, target)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return True
+
+
+@contextmanager
+def store_lock():
+    """
+    قفل ملف (flock) على مخزن النسخ يشمل كل العمليات، لا خيوط العملية الحالية فقط
+    عمليات الويب والبوت والمجدول قد تنشئ نسخاً في الوقت نفسه، والتنظيف قد يحذف كائنات
+    كتبتها عملية أخرى ولم تكتب الـ manifest الذي يشير إليها بعد
+    """
+    os.makedirs(BACKUP_ROOT, exist_ok=True)
+    with open(LOCK_FILE, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def list_manifests():
+    if not os.path.exists(MANIFESTS_DIR):
+        return []
+    return sorted(
+        os.path.join(MANIFESTS_DIR, name)
+        for name in os.listdir(MANIFESTS_DIR)
+        if name.endswith('.json')
+    )
+
+
+def load_manifest(manifest_path):
+    if not manifest_path or not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_latest_manifest():
+    manifests = list_manifests()
+    return load_manifest(manifests[-1]) if manifests else None
+
+
+def _iter_backup_sources():
+    for archive_dir, source_dir in BACKUP_DIRECTORIES.items():
+        if not os.path.isdir(source_dir):
+            continue
+        for root, dirs, files in os.walk(source_dir):
+            dirs[:] = [d for d in dirs if d != '__pycache__']
+            for name in files:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, source_dir).replace(os.sep, '/')
+                yield f'{archive_dir}/{relative}', path
+
+    for name in BACKUP_FILES:
+        if os.path.isfile(name):
+            yield name, name
+
+
+def create_incremental_backup():
+    """
+    نسخة تزايدية: لقطة من قاعدة البيانات + ملفات المشروع في مخزن حسب بصمة المحتوى
+    الملفات التي لم يتغير حجمها ووقت تعديلها منذ النسخة السابقة لا تُقرأ ولا تُنسخ
+    تُرجع مسار ملف الـ manifest
+    """
+    with store_lock():
+        return _create_incremental_backup()
+
+
+def _create_incremental_backup():
+    os.makedirs(MANIFESTS_DIR, exist_ok=True)
+    timestamp = damascus_now().strftime('%Y%m%d_%H%M%S')
+    previous_files = (load_latest_manifest() or {}).get('files', {})
+
+    files = {}
+    new_objects = 0
+    reused = 0
+
+    fd, snapshot_path = tempfile.mkstemp(suffix='.db', prefix='snapshot_')
+    os.close(fd)
+    try:
+        BackupManager.snapshot_database(snapshot_path)
+        digest = file_sha256(snapshot_path)
+        new_objects += store_object(snapshot_path, digest)
+        files['database.db'] = {'hash': digest, 'size': os.path.getsize(snapshot_path)}
+    finally:
+        os.remove(snapshot_path)
+
+    for archive_path, path in _iter_backup_sources():
+        stat_info = os.stat(path)
+        previous = previous_files.get(archive_path)
+
+        if previous and previous.get('size') == stat_info.st_size and previous.get('mtime_ns') == stat_info.st_mtime_ns \
+                and os.path.exists(object_path(previous['hash'])):
+            digest = previous['hash']
+            reused += 1
+        else:
+            digest = file_sha256(path)
+            new_objects += store_object(path, digest)
+
+        files[archive_path] = {'hash': digest, 'size': stat_info.st_size, 'mtime_ns': stat_info.st_mtime_ns}
+
+    manifest = {
+        'name': f'incremental_{timestamp}',
+        'created_at': damascus_now().isoformat(),
+        'files': files,
+        'stats': {'files': len(files), 'new_objects': new_objects, 'reused': reused}
+    }
+
+    manifest_path = os.path.join(MANIFESTS_DIR, f'{manifest["name"]}.json')
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    _prune(INCREMENTAL_KEEP)
+
+    logger.info(f"Incremental backup {manifest['name']}: {len(files)} files, {new_objects} new objects, {reused} unchanged")
+    return manifest_path
+
+
+def build_delta_archive(manifest_path):
+    """
+    أرشيف zip يحوي الـ manifest والكائنات غير الموجودة في آخر نسخة تم رفعها فقط
+    """
+    manifest = load_manifest(manifest_path)
+    uploaded = load_manifest(_last_uploaded_manifest()) or {}
+    uploaded_hashes = {entry['hash'] for entry in uploaded.get('files', {}).values()}
+
+    archive_path = os.path.join(BACKUP_ROOT, f'{manifest["name"]}.zip')
+    written = set()
+    with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.write(manifest_path, 'manifest.json')
+        for entry in manifest['files'].values():
+            digest = entry['hash']
+            if digest in uploaded_hashes or digest in written:
+                continue
+            archive.write(object_path(digest), f'objects/{digest[:2]}/{digest}')
+            written.add(digest)
+
+    return archive_path
+
+
+def mark_uploaded(manifest_path):
+    with open(LAST_UPLOADED_FILE, 'w', encoding='utf-8') as f:
+        f.write(os.path.basename(manifest_path))
+
+
+def _last_uploaded_manifest():
+    if not os.path.exists(LAST_UPLOADED_FILE):
+        return None
+    with open(LAST_UPLOADED_FILE, 'r', encoding='utf-8') as f:
+        name = f.read().strip()
+    return os.path.join(MANIFESTS_DIR, name) if name else None
+
+
+def build_full_archive(manifest_path):
+    """إعادة بناء نسخة شاملة بنفس تنسيق create_full_backup من نسخة تزايدية"""
+    manifest = load_manifest(manifest_path)
+    archive_path = os.path.join(BACKUP_ROOT, f'full_{manifest["name"].split("_", 1)[1]}.zip')
+    with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for archive_name, entry in manifest['files'].items():
+            archive.write(object_path(entry['hash']), archive_name)
+    return archive_path
+
+
+def prune_incremental_backups(keep=INCREMENTAL_KEEP):
+    """حذف النسخ التزايدية الأقدم والكائنات التي لم تعد مستخدمة في أي نسخة"""
+    with store_lock():
+        return _prune(keep)
+
+
+def _prune(keep):
+    manifests = list_manifests()
+    protected = _last_uploaded_manifest()
+    for manifest_path in manifests[:-keep] if keep else manifests:
+        if manifest_path != protected:
+            os.remove(manifest_path)
+
+    referenced = set()
+    for manifest_path in list_manifests():
+        referenced.update(entry['hash'] for entry in load_manifest(manifest_path)['files'].values())
+
+    removed = 0
+    if os.path.isdir(OBJECTS_DIR):
+        for root, _, names in os.walk(OBJECTS_DIR):
+            for name in names:
+                if name not in referenced:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+    return removed
@@ -0,0 +1,168 @@
+"""
+ترحيلات مخطط قاعدة البيانات المرقّمة
+- db.create_all ينشئ الجداول الناقصة، والترحيلات تعدّل الجداول الموجودة (أعمدة وفهارس جديدة)
+- كل ترحيل يُطبَّق مرة واحدة ويُسجَّل رقمه في جدول schema_migrations
+- DDL يُولَّد من أنواع SQLAlchemy فيعمل على SQLite وPostgreSQL دون كتابة SQL خاص بكل محرك
+- لإضافة ترحيل: دالة جديدة مزخرفة بـ @migration(رقم أكبر من الأخير، 'وصف')
+"""
+import logging
+import sqlalchemy as sa
+from sqlalchemy import inspect, text
+from app import db
+from app.models import SchemaMigration
+from app.utils.upsert import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# مفتاح قفل PostgreSQL الاستشاري حتى لا تطبّق عمليتان الترحيلات معاً
+ADVISORY_LOCK_KEY = 73021001
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return func
+    return decorator
+
+
+def _quote(connection, name):
+    return connection.dialect.identifier_preparer.quote(name)
+
+
+def column_names(connection, table_name):
+    return {column['name'] for column in inspect(connection).get_columns(table_name)}
+
+
+def add_column(connection, table_name, column, default=None):
+    """إضافة عمود إذا لم يكن موجوداً؛ default قيمة Python تُحوَّل إلى صيغة المحرك"""
+    if column.name in column_names(connection, table_name):
+        return False
+
+    dialect = connection.dialect
+    ddl = (
+        f"ALTER TABLE {_quote(connection, table_name)} "
+        f"ADD COLUMN {_quote(connection, column.name)} {column.type.compile(dialect=dialect)}"
+    )
+    if default is not None:
+        literal = sa.literal(default, type_=column.type).compile(
+            dialect=dialect, compile_kwargs={'literal_binds': True}
+        )
+        ddl += f" DEFAULT {literal}"
+
+    logger.info(f"Adding {column.name} column to {table_name}")
+    connection.execute(text(ddl))
+    return True
+
+
+def create_model_indexes(connection, *names):
+    """إنشاء فهارس معرّفة في النماذج (__table_args__) على قاعدة موجودة إذا لم تكن موجودة"""
+    indexes = {index.name: index for table in db.metadata.tables.values() for index in table.indexes}
+    created = []
+    for name in names:
+        index = indexes[name]
+        if connection.dialect.has_index(connection, index.table.name, name):
+            continue
+        logger.info(f"Creating index {name} on {index.table.name}")
+        index.create(connection)
+        created.append(name)
+    return created
+
+
+@migration(1, 'site_settings telegram bot columns')
+def add_site_settings_bot_columns(connection):
+    # قواعد قديمة أُنشئ فيها جدول site_settings قبل إضافة إعدادات البوت
+    add_column(connection, 'site_settings', sa.Column('telegram_bot_enabled', sa.Boolean()), default=False)
+    add_column(connection, 'site_settings', sa.Column('telegram_bot_webhook_enabled', sa.Boolean()), default=False)
+    add_column(connection, 'site_settings', sa.Column('telegram_bot_webhook_url', sa.String(500)))
+    add_column(connection, 'site_settings', sa.Column('telegram_bot_notifications_enabled', sa.Boolean()), default=True)
+
+
+@migration(2, 'indexes on hot foreign keys and filter columns')
+def add_hot_query_indexes(connection):
+    create_model_indexes(
+        connection,
+        'idx_recipients_user_read',
+        'idx_recipients_user_unread',
+        'idx_recipients_notification_delivered',
+        'idx_enrollments_course',
+        'idx_enrollments_teacher_course',
+        'idx_grades_student_created',
+        'idx_grades_teacher_student',
+        'idx_grades_course',
+        'idx_lessons_course_published',
+        'idx_lessons_teacher_upload',
+        'idx_payments_student',
+        'idx_payments_status_due',
+        'idx_installments_payment_date',
+        'idx_installments_created',
+        'idx_bot_sessions_user_auth',
+    )
+
+
+@migration(3, 'backfill per-user unread notification counters')
+def backfill_unread_counters(connection):
+    from app.utils.unread_counters import rebuild_unread_counters
+    rebuild_unread_counters(connection)
+
+
+@migration(4, 'notification idempotency keys')
+def add_notification_idempotency_key(connection):
+    add_column(connection, 'notifications', sa.Column('idempotency_key', sa.String(100)))
+    create_model_indexes(connection, 'idx_notifications_idempotency_key')
+
+
+@migration(5, 'stored telegram webhook secret')
+def add_webhook_secret_column(connection):
+    add_column(connection, 'site_settings', sa.Column('telegram_bot_webhook_secret', sa.String(64)))
+
+
+def applied_versions(connection):
+    return {row[0] for row in connection.execute(sa.select(SchemaMigration.version))}
+
+
+def pending_migrations(connection):
+    applied = applied_versions(connection)
+    return [item for item in MIGRATIONS if item[0] not in applied]
+
+
+def stamp(connection, versions=None):
+    """تسجيل ترحيلات كمطبّقة دون تشغيلها (مثلاً بعد نسخ البيانات إلى قاعدة أُنشئت من النماذج مباشرة)"""
+    rows = [
+        {'version': version, 'description': description}
+        for version, description, _ in MIGRATIONS
+        if versions is None or version in versions
+    ]
+    if rows:
+        stmt = dialect_insert(SchemaMigration, connection).on_conflict_do_nothing(index_elements=['version'])
+        connection.execute(stmt, rows)
+
+
+def upgrade(engine=None):
+    """تطبيق الترحيلات المعلّقة بالترتيب؛ تُرجع أرقام ما طُبِّق"""
+    engine = engine or db.engine
+    SchemaMigration.__table__.create(engine, checkfirst=True)
+
+    applied = []
+    with engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': ADVISORY_LOCK_KEY})
+
+        for version, description, func in pending_migrations(connection):
+            logger.info(f"Applying migration {version}: {description}")
+            func(connection)
+            stamp(connection, {version})
+            applied.append(version)
+
+    if applied:
+        logger.info(f"Applied migrations: {applied}")
+    return applied
+
+
+def current_version(engine=None):
+    engine = engine or db.engine
+    with engine.connect() as connection:
+        versions = applied_versions(connection)
+    return max(versions) if versions else 0
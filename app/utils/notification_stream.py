@@ -0,0 +1,209 @@
+"""
+دفع عدد الإشعارات غير المقروءة إلى المتصفح عبر Server-Sent Events بدل الاستطلاع الدوري
+- كل اتصال مفتوح اشتراك في وسيط (pub/sub) داخل العملية، ولا يلمس قاعدة البيانات وهو خامل
+- create_notification وإنشاء تنبيهات الغياب ينشران بعد الحفظ فيصل التحديث فوراً للمشتركين في العملية نفسها
+- خيط مراقبة واحد لكل عملية يلتقط ما تغيّر في عمليات أخرى (عمال الويب الآخرون، المجدول، البوت)
+  باستعلام واحد على جدول العدادات كل بضع ثوانٍ مهما كان عدد الاتصالات، ويتوقف حين يغادر آخر مشترك
+- قاعدة البيانات تُقرأ عند الاتصال أو إعادة الاتصال فقط (بحث بالمفتاح الأساسي)
+"""
+import logging
+import os
+import threading
+from datetime import timedelta
+from flask import Response
+from sqlalchemy import select, func
+from app import db
+from app.models import NotificationRecipient, NotificationUnreadCount
+from app.utils.unread_counters import get_unread_count
+
+logger = logging.getLogger(__name__)
+
+STREAM_POLL_SECONDS = float(os.environ.get('NOTIFICATION_STREAM_POLL_SECONDS', 2))
+STREAM_HEARTBEAT_SECONDS = 25
+STREAM_RETRY_MS = 10000
+STREAM_MAX_SUBSCRIBERS = int(os.environ.get('NOTIFICATION_STREAM_MAX_SUBSCRIBERS', 2000))
+# هامش لفروق الساعة بين العمليات وللمعاملات التي حُفظت بعد قراءة العلامة؛ التكرار يُتجاهل لاحقاً
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+counts = NotificationUnreadCount.__table__
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Subscription:
+    """اتصال مفتوح لمستخدم واحد؛ يحتفظ بآخر عدد أُرسل حتى لا يُرسل التحديث نفسه مرتين"""
+
+    def __init__(self, user_id, unread):
+        self.user_id = user_id
+        self.unread = unread
+        self._changed = False
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+
+    def push(self, unread):
+        with self._lock:
+            if unread == self.unread:
+                return
+            self.unread = unread
+            self._changed = True
+        self._event.set()
+
+    def wait(self, timeout):
+        """انتظار تغيّر العدد؛ تُرجع العدد الجديد أو None عند انتهاء المهلة"""
+        if not self._event.wait(timeout):
+            return None
+        with self._lock:
+            self._event.clear()
+            changed, self._changed = self._changed, False
+            return self.unread if changed else None
+
+
+class NotificationBroker:
+
+    def __init__(self, poll_seconds=STREAM_POLL_SECONDS, max_subscribers=STREAM_MAX_SUBSCRIBERS):
+        self.poll_seconds = poll_seconds
+        self.max_subscribers = max_subscribers
+        self._subscriptions = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._watcher_stop = None
+        self._watermark = None
+
+    def subscribe(self, user_id, unread):
+        """تُرجع اشتراكاً جديداً، أو None إذا امتلأت العملية (يعود المتصفح إلى الاستطلاع)"""
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            subscription = Subscription(user_id, unread)
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+            self._count += 1
+            self._ensure_watcher()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions and subscription in subscriptions:
+                subscriptions.discard(subscription)
+                self._count -= 1
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+                if not self._count:
+                    self._stop_watcher()
+
+    def subscribed_users(self):
+        with self._lock:
+            return list(self._subscriptions)
+
+    def publish(self, user_id, unread):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.push(unread)
+
+    def publish_notification(self, notification_id):
+        """نشر العدد الجديد لمستلمي إشعار المتصلين بهذه العملية (لا استعلام إذا لم يكن أحد متصلاً)"""
+        user_ids = self.subscribed_users()
+        if not user_ids:
+            return
+        recipients = select(NotificationRecipient.user_id).where(
+            NotificationRecipient.notification_id == notification_id
+        )
+        rows = db.session.execute(
+            select(counts.c.user_id, counts.c.unread)
+            .where(counts.c.user_id.in_(recipients), counts.c.user_id.in_(user_ids))
+        ).all()
+        for user_id, unread in rows:
+            self.publish(user_id, unread)
+
+    def _ensure_watcher(self):
+        if self._watcher is None or not self._watcher.is_alive():
+            self._watcher_stop = threading.Event()
+            self._watcher = threading.Thread(target=self._watch, args=(self._watcher_stop,),
+                                             name='notification-stream', daemon=True)
+            self._watcher.start()
+
+    def _stop_watcher(self):
+        """
+        لا مشتركين فلا حاجة للاستعلام؛ الاشتراك التالي يبدأ خيطاً جديداً
+        العلامة تُنسى لأن المشتركين الجدد يقرؤون عددهم من القاعدة عند الاتصال
+        """
+        if self._watcher_stop is not None:
+            self._watcher_stop.set()
+        self._watcher = None
+        self._watcher_stop = None
+        self._watermark = None
+
+    def _poll_changes(self):
+        user_ids = self.subscribed_users()
+        if not user_ids:
+            return
+
+        if self._watermark is None:
+            self._watermark = db.session.execute(select(func.max(counts.c.updated_at))).scalar()
+            if self._watermark is None:
+                return
+
+        rows = db.session.execute(
+            select(counts.c.user_id, counts.c.unread, counts.c.updated_at)
+            .where(counts.c.updated_at >= self._watermark - WATERMARK_OVERLAP, counts.c.user_id.in_(user_ids))
+        ).all()
+        for user_id, unread, updated_at in rows:
+            self.publish(user_id, unread)
+            if updated_at and updated_at > self._watermark:
+                self._watermark = updated_at
+
+    def _watch(self, stop):
+        from app.utils.worker_context import worker_app_context
+
+        while not stop.wait(self.poll_seconds):
+            with worker_app_context():
+                try:
+                    self._poll_changes()
+                except Exception as e:
+                    logger.error(f"Error polling notification counters: {e}")
+                finally:
+                    db.session.remove()
+
+
+def get_notification_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = NotificationBroker()
+        return _broker
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {data}\n\n"
+
+
+def stream_response(user_id):
+    """
+    استجابة text/event-stream لمستخدم: حدث unread بالعدد عند الاتصال ثم عند كل تغيّر،
+    وتعليق keep-alive دوري حتى لا يغلق الوسطاء الاتصال الخامل
+    """
+    broker = get_notification_broker()
+    unread = get_unread_count(user_id)
+    subscription = broker.subscribe(user_id, unread)
+    if subscription is None:
+        return Response('stream capacity reached', status=503, headers={'Retry-After': '60'})
+
+    def generate():
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n" + _event('unread', subscription.unread)
+            while True:
+                changed = subscription.wait(STREAM_HEARTBEAT_SECONDS)
+                if changed is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield _event('unread', changed)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
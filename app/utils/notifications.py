@@ -1,23 +1,24 @@
 import asyncio
 import logging
 from flask import current_app
+from sqlalchemy import select, insert, update, literal
 from telegram.constants import ParseMode
 from app import db
 from app.models import (Notification, NotificationRecipient, User, Student, Teacher, 
                        Enrollment, BotSession, SiteSettings)
 from app.utils.helpers import damascus_now
+from app.utils.worker_context import worker_app_context
+from app.utils.outbox import enqueue_notification_delivery
+from app.utils.telegram_client import send_message
+from app.utils.query_profiles import RECIPIENT_WITH_NOTIFICATION
+from app.utils import unread_counters, queries
+from app.utils.notification_stream import get_notification_broker
 
 logger = logging.getLogger(__name__)
 
 async def send_telegram_notification_async(telegram_id: int, message: str, bot_token: str):
     try:
-        from telegram import Bot
-        bot = Bot(token=bot_token)
-        result = await bot.send_message(
-            chat_id=telegram_id,
-            text=message,
-            parse_mode=ParseMode.MARKDOWN
-        )
+        result = await send_message(bot_token, telegram_id, message, parse_mode=ParseMode.MARKDOWN)
         return result.message_id
     except Exception as e:
         logger.error(f"Error sending notification to {telegram_id}: {e}")
@@ -37,107 +38,84 @@ def create_notification(title, message, notification_type, created_by_id,
         send_web=send_web
     )
     db.session.add(notification)
-    db.session.commit()
+    db.session.flush()
     
-    recipients = get_notification_recipients(target_type, target_id)
+    materialize_recipients(notification.id, target_type, target_id)
+    unread_counters.notification_added(notification.id)
     
-    for user in recipients:
-        recipient = NotificationRecipient(
-            notification_id=notification.id,
-            user_id=user.id
-        )
-        db.session.add(recipient)
+    if send_telegram:
+        enqueue_notification_delivery(notification.id)
     
     db.session.commit()
     
-    if send_telegram:
-        send_telegram_notifications(notification.id)
+    # send_notification يمر من هنا أيضاً، فيصل العدد الجديد فوراً للمتصلين بهذه العملية
+    try:
+        get_notification_broker().publish_notification(notification.id)
+    except Exception as e:
+        logger.error(f"Error publishing notification {notification.id} to streams: {e}")
     
     return notification
 
 
-def get_notification_recipients(target_type, target_id=None):
+def get_recipient_ids_query(target_type, target_id=None):
+    """بناء استعلام SELECT لمعرّفات المستخدمين المستهدفين دون تحميلهم في الذاكرة"""
     excluded_roles = ['admin', 'assistant']
     
+    query = select(User.id).where(User.is_active == True, User.role.notin_(excluded_roles))
+    
     if target_type == 'all':
-        return User.query.filter(User.is_active == True).filter(User.role.notin_(excluded_roles)).all()
+        return query
     
     elif target_type == 'all_students':
-        student_ids = db.session.query(Student.user_id).all()
-        user_ids = [sid[0] for sid in student_ids]
-        return User.query.filter(User.id.in_(user_ids)).filter(User.is_active == True).filter(User.role.notin_(excluded_roles)).all()
+        return query.join(Student, Student.user_id == User.id)
     
     elif target_type == 'all_teachers':
-        teacher_ids = db.session.query(Teacher.user_id).all()
-        user_ids = [tid[0] for tid in teacher_ids]
-        return User.query.filter(User.id.in_(user_ids)).filter(User.is_active == True).filter(User.role.notin_(excluded_roles)).all()
+        return query.join(Teacher, Teacher.user_id == User.id)
     
     elif target_type == 'student' and target_id:
-        student = Student.query.get(target_id)
-        if student and student.user.is_active and student.user.role not in excluded_roles:
-            return [student.user]
-        return []
+        return query.join(Student, Student.user_id == User.id).where(Student.id == target_id)
     
     elif target_type == 'teacher' and target_id:
-        teacher = Teacher.query.get(target_id)
-        if teacher and teacher.user.is_active and teacher.user.role not in excluded_roles:
-            return [teacher.user]
-        return []
+        return query.join(Teacher, Teacher.user_id == User.id).where(Teacher.id == target_id)
     
     elif target_type == 'course' and target_id:
-        enrollments = Enrollment.query.filter_by(course_id=target_id).all()
-        user_ids = [e.student.user_id for e in enrollments if e.student.user.is_active]
-        return User.query.filter(User.id.in_(user_ids)).filter(User.role.notin_(excluded_roles)).all()
+        return query.join(Student, Student.user_id == User.id).join(
+            Enrollment, Enrollment.student_id == Student.id
+        ).where(Enrollment.course_id == target_id).distinct()
     
     elif target_type == 'user' and target_id:
-        user = User.query.get(target_id)
-        if user and user.is_active and user.role not in excluded_roles:
-            return [user]
-        return []
+        return query.where(User.id == target_id)
     
-    return []
+    return None
+
+
+def materialize_recipients(notification_id, target_type, target_id=None):
+    """إنشاء سجلات المستلمين بعبارة INSERT ... SELECT واحدة وإرجاع عددها"""
+    user_ids = get_recipient_ids_query(target_type, target_id)
+    if user_ids is None:
+        return 0
+    
+    user_ids = user_ids.subquery()
+    result = db.session.execute(
+        insert(NotificationRecipient).from_select(
+            ['notification_id', 'user_id'],
+            select(literal(notification_id), user_ids.c.id)
+        )
+    )
+    return result.rowcount
+
+
+def get_notification_recipients(target_type, target_id=None):
+    user_ids = get_recipient_ids_query(target_type, target_id)
+    if user_ids is None:
+        return []
+    return User.query.filter(User.id.in_(user_ids)).all()
 
 
 def send_telegram_notifications(notification_id):
-    from app import create_app
-    app = create_app()
-    
-    with app.app_context():
-        notification = Notification.query.get(notification_id)
-        if not notification or not notification.send_telegram:
-            return
-        
-        settings = SiteSettings.query.first()
-        if not settings or not settings.telegram_bot_token:
-            return
-        
-        recipients = NotificationRecipient.query.filter_by(
-            notification_id=notification_id,
-            telegram_delivered=False
-        ).all()
-        
-        for recipient in recipients:
-            bot_session = BotSession.query.filter_by(
-                user_id=recipient.user_id,
-                is_authenticated=True
-            ).first()
-            
-            if not bot_session:
-                continue
-            
-            message = f"🔔 *{notification.title}*\n\n{notification.message}"
-            
-            try:
-                message_id = asyncio.run(send_telegram_notification_async(
-                    bot_session.telegram_id,
-                    message,
-                    settings.telegram_bot_token
-                ))
-                
-                if message_id:
-                    recipient.mark_telegram_delivered(message_id)
-            except Exception as e:
-                logger.error(f"Error sending telegram notification to user {recipient.user_id}: {e}")
+    from app.utils.telegram_fanout import deliver_notification
+    delivered, _, _ = deliver_notification(notification_id)
+    return delivered
 
 
 def send_new_lesson_notification(lesson_id):
@@ -232,22 +210,11 @@ def send_updated_grade_notification(grade_id):
 
 
 def get_user_notifications(user_id, unread_only=False, limit=50):
-    query = NotificationRecipient.query.filter_by(user_id=user_id)
-    
-    if unread_only:
-        query = query.filter_by(is_read=False)
-    
-    query = query.join(Notification).filter(Notification.is_active == True)
-    query = query.order_by(NotificationRecipient.id.desc()).limit(limit)
-    
-    return query.all()
+    return queries.user_notifications(user_id, unread_only, limit).options(*RECIPIENT_WITH_NOTIFICATION).all()
 
 
 def get_unread_count(user_id):
-    return NotificationRecipient.query.filter_by(
-        user_id=user_id,
-        is_read=False
-    ).join(Notification).filter(Notification.is_active == True).count()
+    return unread_counters.get_unread_count(user_id)
 
 
 def mark_notification_as_read(recipient_id):
@@ -259,15 +226,15 @@ def mark_notification_as_read(recipient_id):
 
 
 def mark_all_as_read(user_id):
-    recipients = NotificationRecipient.query.filter_by(
-        user_id=user_id,
-        is_read=False
-    ).all()
-    
-    for recipient in recipients:
-        recipient.mark_as_read(source='web')
+    result = db.session.execute(
+        update(NotificationRecipient)
+        .where(NotificationRecipient.user_id == user_id, NotificationRecipient.is_read == False)
+        .values(is_read=True, read_at=damascus_now(), read_source='web')
+    )
+    unread_counters.all_read(user_id)
+    db.session.commit()
     
-    return len(recipients)
+    return result.rowcount
 
 
 def send_new_payment_notification(payment_id):
@@ -447,10 +414,9 @@ def send_notification(title, message, user_ids, notification_type,
 
 
 def broadcast_message(message: str, role=None):
-    from app import create_app
-    app = create_app()
+    from app.utils.telegram_fanout import fan_out
     
-    with app.app_context():
+    with worker_app_context():
         settings = SiteSettings.query.first()
         
         if not settings or not settings.telegram_bot_enabled:
@@ -459,23 +425,17 @@ def broadcast_message(message: str, role=None):
         if not settings.telegram_bot_token:
             return 0
         
-        query = BotSession.query.filter_by(is_authenticated=True)
+        query = db.session.query(BotSession.telegram_id).filter(BotSession.is_authenticated == True)
         
         if role:
-            query = query.join(User).filter(User.role == role)
+            query = query.join(User, User.id == BotSession.user_id).filter(User.role == role)
         
-        sessions = query.all()
+        messages = [(telegram_id, telegram_id, message) for (telegram_id,) in query.all()]
         
-        success_count = 0
-        for session in sessions:
-            try:
-                asyncio.run(send_telegram_notification_async(
-                    session.telegram_id,
-                    message,
-                    settings.telegram_bot_token
-                ))
-                success_count += 1
-            except Exception as e:
-                logger.error(f"Error broadcasting to {session.telegram_id}: {e}")
+        try:
+            delivered = asyncio.run(fan_out(settings.telegram_bot_token, messages))
+        except Exception as e:
+            logger.error(f"Error broadcasting message: {e}")
+            return 0
         
-        return success_count
+        return len(delivered)
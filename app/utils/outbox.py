@@ -0,0 +1,186 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import timedelta
+from sqlalchemy import update, select, or_, and_
+from app import db
+from app.models import OutboxMessage
+from app.utils.helpers import damascus_now
+from app.utils.worker_context import worker_app_context
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+POLL_INTERVAL = 2.0
+LOCK_TIMEOUT = timedelta(minutes=15)
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 60 * 60
+PURGE_AFTER = timedelta(days=7)
+PURGE_INTERVAL_SECONDS = 60 * 60
+
+_handlers = {}
+
+
+def outbox_handler(kind):
+    """تسجيل دالة معالجة لنوع معين من رسائل صندوق الصادر"""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, notification_id=None, payload=None, delay_seconds=0):
+    """
+    إضافة مهمة إلى صندوق الصادر ضمن المعاملة الحالية
+    لا يتم الحفظ هنا؛ المهمة تُحفظ مع commit الخاص بالمستدعي
+    """
+    message = OutboxMessage(
+        kind=kind,
+        notification_id=notification_id,
+        payload=payload,
+        available_at=damascus_now() + timedelta(seconds=delay_seconds)
+    )
+    db.session.add(message)
+    return message
+
+
+def enqueue_notification_delivery(notification_id):
+    return enqueue('telegram_delivery', notification_id=notification_id)
+
+
+def backoff_delay(attempts):
+    return min(BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)), BACKOFF_MAX_SECONDS)
+
+
+def claim_batch(worker_id, batch_size=BATCH_SIZE):
+    """حجز دفعة من المهام الجاهزة لهذا العامل، مع استرجاع المهام العالقة من عامل متوقف"""
+    now = damascus_now()
+    claimable = or_(
+        and_(OutboxMessage.status == 'pending', OutboxMessage.available_at <= now),
+        and_(OutboxMessage.status == 'processing', OutboxMessage.locked_at < now - LOCK_TIMEOUT)
+    )
+
+    candidate_ids = select(OutboxMessage.id).where(claimable).order_by(
+        OutboxMessage.available_at, OutboxMessage.id
+    ).limit(batch_size)
+
+    db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(candidate_ids), claimable)
+        .values(status='processing', locked_by=worker_id, locked_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    return OutboxMessage.query.filter_by(
+        status='processing',
+        locked_by=worker_id
+    ).order_by(OutboxMessage.id).all()
+
+
+def process_message(message):
+    handler = _handlers.get(message.kind)
+
+    try:
+        if handler is None:
+            raise ValueError(f'No outbox handler registered for kind "{message.kind}"')
+        handler(message)
+    except Exception as e:
+        db.session.rollback()
+        message.attempts += 1
+        message.last_error = str(e)[:2000]
+        message.locked_by = None
+        message.locked_at = None
+
+        if message.attempts >= message.max_attempts:
+            message.status = 'failed'
+            logger.error(f"Outbox message {message.id} failed permanently: {e}")
+        else:
+            delay = backoff_delay(message.attempts)
+            message.status = 'pending'
+            message.available_at = damascus_now() + timedelta(seconds=delay)
+            logger.warning(f"Outbox message {message.id} failed (attempt {message.attempts}), retrying in {delay}s: {e}")
+
+        db.session.commit()
+        return False
+
+    message.status = 'sent'
+    message.processed_at = damascus_now()
+    message.locked_by = None
+    message.locked_at = None
+    message.last_error = None
+    db.session.commit()
+    return True
+
+
+def drain_outbox(worker_id=None, batch_size=BATCH_SIZE):
+    """معالجة دفعة واحدة من صندوق الصادر وإرجاع عدد المهام التي تمت معالجتها"""
+    worker_id = worker_id or _default_worker_id()
+
+    with worker_app_context():
+        messages = claim_batch(worker_id, batch_size)
+        for message in messages:
+            process_message(message)
+        return len(messages)
+
+
+def purge_outbox(older_than=PURGE_AFTER):
+    """حذف المهام المرسلة القديمة"""
+    with worker_app_context():
+        cutoff = damascus_now() - older_than
+        deleted = OutboxMessage.query.filter(
+            OutboxMessage.status == 'sent',
+            OutboxMessage.processed_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+
+def run_worker(stop_event=None, batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL):
+    """حلقة عامل التسليم: تسحب المهام من صندوق الصادر حتى يتم الإيقاف"""
+    worker_id = _default_worker_id()
+    stop_event = stop_event or threading.Event()
+    last_purge = 0.0
+
+    logger.info(f"Outbox worker {worker_id} started")
+
+    while not stop_event.is_set():
+        try:
+            processed = drain_outbox(worker_id, batch_size)
+
+            if time.monotonic() - last_purge > PURGE_INTERVAL_SECONDS:
+                purge_outbox()
+                last_purge = time.monotonic()
+        except Exception as e:
+            logger.error(f"Error in outbox worker: {e}")
+            processed = 0
+
+        if processed < batch_size:
+            stop_event.wait(poll_interval)
+
+    logger.info(f"Outbox worker {worker_id} stopped")
+
+
+def _default_worker_id():
+    return f'{os.getpid()}-{threading.get_ident()}-{uuid.uuid4().hex[:8]}'
+
+
+@outbox_handler('telegram_delivery')
+def _deliver_telegram_notification(message):
+    from app.utils.telegram_fanout import deliver_notification
+
+    # المسلَّمون عُلِّموا، فإعادة المحاولة مع التأخير التصاعدي ترسل لمن فشل إرسالهم مؤقتاً فقط
+    delivered, attempted, rejected = deliver_notification(message.notification_id)
+    failed = attempted - delivered - rejected
+    if failed:
+        raise RuntimeError(f'{failed} of {attempted} Telegram messages could not be delivered')
+
+
+@outbox_handler('absence_alerts')
+def _create_absence_alerts(message):
+    from app.utils.attendance import create_absence_notifications
+
+    with worker_app_context():
+        create_absence_notifications(message.payload)
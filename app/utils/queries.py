@@ -0,0 +1,128 @@
+"""
+بناة الاستعلامات الساخنة المشتركة بين المسارات والبوت والمهام الخلفية
+كل دالة تُرجع استعلاماً غير منفذ يكمله المستدعي (options / first / all / count)،
+ويبني منها query_plans خطط الفحص، فلا ينفصل الاستعلام المفحوص عن الاستعلام الذي يعمل فعلاً
+"""
+from app import db
+from app.models import (
+    User, Student, Enrollment, Grade, Lesson, Payment, InstallmentPayment,
+    Notification, NotificationRecipient, BotSession
+)
+
+
+# ---------- جلسات البوت ----------
+
+def bot_session(telegram_id):
+    return BotSession.query.filter_by(telegram_id=telegram_id)
+
+
+def bot_session_user(telegram_id):
+    """المستخدم النشط المرتبط بجلسة بوت مسجلة الدخول"""
+    return User.query.join(BotSession, BotSession.user_id == User.id).filter(
+        BotSession.telegram_id == telegram_id,
+        BotSession.is_authenticated == True,
+        User.is_active == True
+    )
+
+
+# ---------- الإشعارات ----------
+
+def user_notifications(user_id, unread_only=False, limit=50):
+    query = NotificationRecipient.query.filter_by(user_id=user_id)
+    if unread_only:
+        query = query.filter_by(is_read=False)
+    query = query.join(Notification).filter(Notification.is_active == True)
+    return query.order_by(NotificationRecipient.id.desc()).limit(limit)
+
+
+def telegram_targets(notification_id):
+    """(recipient_id, telegram_id) لمستلمي إشعار لم يُسلَّم لهم بعد ولديهم جلسة بوت مسجلة"""
+    return db.session.query(
+        NotificationRecipient.id,
+        BotSession.telegram_id
+    ).join(
+        BotSession,
+        db.and_(
+            BotSession.user_id == NotificationRecipient.user_id,
+            BotSession.is_authenticated == True
+        )
+    ).filter(
+        NotificationRecipient.notification_id == notification_id,
+        NotificationRecipient.telegram_delivered == False
+    ).order_by(NotificationRecipient.id, BotSession.id)
+
+
+# ---------- التسجيلات ----------
+
+def student_enrollments(student_id):
+    return Enrollment.query.filter_by(student_id=student_id)
+
+
+def teacher_enrollments(teacher_id):
+    return Enrollment.query.filter_by(teacher_id=teacher_id)
+
+
+def course_enrollments(course_id):
+    return Enrollment.query.filter_by(course_id=course_id)
+
+
+def student_course_enrollment(student_id, course_id):
+    return Enrollment.query.filter_by(student_id=student_id, course_id=course_id)
+
+
+def teacher_course_enrollment(teacher_id, course_id):
+    return Enrollment.query.filter_by(teacher_id=teacher_id, course_id=course_id)
+
+
+def teacher_students(teacher_id):
+    student_ids = db.session.query(Enrollment.student_id).filter(Enrollment.teacher_id == teacher_id)
+    return Student.query.filter(Student.id.in_(student_ids))
+
+
+# ---------- العلامات والدروس ----------
+
+def student_grades(student_id):
+    return Grade.query.filter_by(student_id=student_id).order_by(Grade.created_at.desc())
+
+
+def teacher_student_grades(teacher_id, student_id):
+    return Grade.query.filter_by(student_id=student_id, teacher_id=teacher_id).order_by(Grade.created_at.desc())
+
+
+def course_lessons(course_id):
+    """الدروس المنشورة في دورة"""
+    return Lesson.query.filter_by(course_id=course_id, is_published=True)
+
+
+def teacher_lessons(teacher_id):
+    return Lesson.query.filter_by(teacher_id=teacher_id).order_by(Lesson.upload_date.desc(), Lesson.id.desc())
+
+
+# ---------- الأقساط ----------
+
+def due_payments(target_date):
+    """الأقساط غير المسددة التي يحل موعدها حتى target_date"""
+    return Payment.query.filter(
+        Payment.status.in_(['pending', 'partial']),
+        Payment.due_date <= target_date
+    )
+
+
+def payments_list(status=None):
+    """قائمة الأقساط مع الطالب والمستخدم، مصفاة بالحالة إن وُجدت"""
+    query = Payment.query.join(Student).join(User)
+    if status:
+        query = query.filter(Payment.status == status)
+    return query
+
+
+def student_payments(student_id):
+    return Payment.query.filter_by(student_id=student_id).order_by(Payment.created_at.desc())
+
+
+def payment_installments(payment_id):
+    return InstallmentPayment.query.filter_by(payment_id=payment_id).order_by(InstallmentPayment.payment_date.desc())
+
+
+def recent_installments(limit=10):
+    return InstallmentPayment.query.order_by(InstallmentPayment.created_at.desc()).limit(limit)
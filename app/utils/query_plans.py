@@ -0,0 +1,95 @@
+"""
+فحص خطط تنفيذ الاستعلامات الساخنة في المسارات والبوت
+كل استعلام في HOT_QUERIES يجب أن يصل إلى جداوله عبر فهرس؛ أي مسح كامل لجدول يُعد تراجعاً
+الفحص يعمل على SQLite (EXPLAIN QUERY PLAN) وعلى PostgreSQL (EXPLAIN بصيغة JSON)
+"""
+import json
+from datetime import date, timedelta
+from app.utils import queries
+
+# كل خطة تُبنى من دالة الاستعلام نفسها التي تستدعيها المسارات والبوت (app.utils.queries)،
+# فأي تعديل على استعلام حقيقي يظهر هنا مباشرة
+HOT_QUERIES = {
+    'bot_session': lambda: queries.bot_session(1),
+    'bot_session_user': lambda: queries.bot_session_user(1),
+    'user_notifications': lambda: queries.user_notifications(1),
+    'user_unread_notifications': lambda: queries.user_notifications(1, unread_only=True),
+    'telegram_targets': lambda: queries.telegram_targets(1),
+    'student_enrollments': lambda: queries.student_enrollments(1),
+    'teacher_enrollments': lambda: queries.teacher_enrollments(1),
+    'course_enrollments': lambda: queries.course_enrollments(1),
+    'student_course_enrollment': lambda: queries.student_course_enrollment(1, 1),
+    'teacher_course_enrollment': lambda: queries.teacher_course_enrollment(1, 1),
+    'teacher_students': lambda: queries.teacher_students(1),
+    'student_grades': lambda: queries.student_grades(1),
+    'teacher_student_grades': lambda: queries.teacher_student_grades(1, 1),
+    'course_lessons': lambda: queries.course_lessons(1),
+    'teacher_lessons': lambda: queries.teacher_lessons(1).limit(10),
+    'due_payments': lambda: queries.due_payments(date.today() + timedelta(days=3)),
+    'payments_by_status': lambda: queries.payments_list('pending'),
+    'student_payments': lambda: queries.student_payments(1),
+    'payment_installments': lambda: queries.payment_installments(1),
+    'recent_installments': lambda: queries.recent_installments(),
+}
+
+
+def _compile(statement, dialect):
+    compiled = statement.compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    return compiled.string, params
+
+
+def _sqlite_full_scans(connection, sql, params):
+    scans = set()
+    for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', params):
+        detail = row[-1]
+        # "SCAN table" بدون "USING ... INDEX" هو مسح كامل للجدول
+        if detail.startswith('SCAN ') and 'USING' not in detail:
+            scans.add(detail.split()[1])
+    return scans
+
+
+def _postgresql_full_scans(connection, sql, params):
+    plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {sql}', params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scans = set()
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node.get('Node Type') == 'Seq Scan':
+            scans.add(node.get('Relation Name'))
+        nodes.extend(node.get('Plans', []))
+    return scans
+
+
+def full_scans(statement, connection):
+    """أسماء الجداول التي يمسحها الاستعلام كاملة؛ يقبل عبارة select أو استعلام ORM"""
+    statement = getattr(statement, 'statement', statement)
+    sql, params = _compile(statement, connection.dialect)
+    if connection.dialect.name == 'postgresql':
+        return _postgresql_full_scans(connection, sql, params)
+    return _sqlite_full_scans(connection, sql, params)
+
+
+def check_hot_queries(engine, queries=None):
+    """
+    فحص خطط الاستعلامات الساخنة؛ تُرجع {اسم الاستعلام: الجداول الممسوحة كاملة} للاستعلامات المتراجعة فقط
+    البناة استعلامات ORM، فتُستدعى داخل سياق تطبيق
+    على PostgreSQL يُعطَّل enable_seqscan أثناء الفحص، فيبقى المسح الكامل فقط حين لا يوجد فهرس مناسب
+    """
+    queries = queries or HOT_QUERIES
+    failures = {}
+    with engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        for name, build in queries.items():
+            scans = full_scans(build(), connection)
+            if scans:
+                failures[name] = sorted(scans)
+        connection.rollback()
+    return failures
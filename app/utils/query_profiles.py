@@ -0,0 +1,59 @@
+"""
+ملفات تحميل مسبق (eager loading) للعلاقات التي تستخدمها صفحات الويب وردود البوت
+كل ملف يحمّل العلاقات المعروضة مع الاستعلام نفسه، فيبقى عدد الاستعلامات ثابتاً مهما كبر عدد العناصر
+الاستخدام: query.options(*GRADE_WITH_COURSE)
+"""
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, contains_eager, configure_mappers
+from app import db
+from app.models import Enrollment, Grade, Lesson, Student, Teacher, NotificationRecipient
+
+# بعض العلاقات (مثل Enrollment.course) معرّفة كـ backref في الطرف الآخر،
+# ولا تظهر كخصائص على الصنف قبل تهيئة المخططات
+configure_mappers()
+
+ENROLLMENT_WITH_COURSE = (joinedload(Enrollment.course),)
+
+GRADE_WITH_COURSE = (joinedload(Grade.course),)
+
+LESSON_WITH_COURSE = (joinedload(Lesson.course),)
+
+LESSON_DETAIL = (
+    joinedload(Lesson.course),
+    joinedload(Lesson.teacher).joinedload(Teacher.user),
+)
+
+STUDENT_WITH_USER = (joinedload(Student.user),)
+
+STUDENT_PROFILE = (
+    joinedload(Student.user),
+    joinedload(Student.class_grade),
+    joinedload(Student.section),
+)
+
+TEACHER_WITH_USER = (joinedload(Teacher.user),)
+
+# لاستعلامات المستلمين التي تربط جدول الإشعارات بـ join مسبقاً
+RECIPIENT_WITH_NOTIFICATION = (contains_eager(NotificationRecipient.notification),)
+
+
+@contextmanager
+def count_statements(engine=None):
+    """
+    عدّ عبارات SQL المنفذة داخل الكتلة، للتحقق من أن عرضاً ما لا يزيد استعلاماته مع حجم البيانات
+        with count_statements() as statements:
+            ...
+        assert len(statements) == 3
+    """
+    engine = engine or db.engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
@@ -3,9 +3,11 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime, timedelta
 from app import db
-from app.models import Payment, SiteSettings
+from app.models import SiteSettings
 from app.utils.notifications import send_payment_reminder_notification
+from app.utils import queries
 from app.utils.helpers import damascus_now
+from app.utils.worker_context import worker_app_context
 import os
 
 logger = logging.getLogger(__name__)
@@ -14,12 +16,11 @@ scheduler = None
 
 failed_backup_path = None
 
+synced_settings = None
+
 
 def check_payment_reminders():
-    from app import create_app
-    app = create_app()
-    
-    with app.app_context():
+    with worker_app_context():
         try:
             settings = SiteSettings.query.first()
             
@@ -30,10 +31,7 @@ def check_payment_reminders():
             today = damascus_now().date()
             target_date = today + timedelta(days=days_before)
             
-            payments = Payment.query.filter(
-                Payment.status.in_(['pending', 'partial']),
-                Payment.due_date <= target_date
-            ).all()
+            payments = queries.due_payments(target_date).all()
             
             for payment in payments:
                 if not payment.is_paid:
@@ -49,10 +47,8 @@ def check_payment_reminders():
 def daily_telegram_backup():
     """نسخ احتياطي يومي مع إرسال إلى تيليجرام وحذف من السيرفر"""
     global failed_backup_path
-    from app import create_app
-    app = create_app()
     
-    with app.app_context():
+    with worker_app_context():
         try:
             from app.utils.backup import BackupManager
             
@@ -107,6 +103,46 @@ def daily_telegram_backup():
             traceback.print_exc()
 
 
+def sync_schedules_from_settings():
+    """
+    مزامنة مواعيد المهام مع الإعدادات المحفوظة
+    عند تشغيل المجدول في عملية مستقلة لا تصل إليه تعديلات لوحة التحكم مباشرة، فيقرأها دورياً
+    """
+    global synced_settings
+    
+    with worker_app_context():
+        try:
+            settings = SiteSettings.query.first()
+            if not settings:
+                return
+            
+            current = (
+                bool(settings.payment_reminder_enabled),
+                settings.payment_reminder_time or '09:00',
+                bool(settings.telegram_backup_enabled)
+            )
+            if current == synced_settings:
+                return
+            
+            reminder_enabled, reminder_time, backup_enabled = current
+            update_reminder_schedule(reminder_time, reminder_enabled)
+            
+            if backup_enabled:
+                scheduler.add_job(
+                    func=daily_telegram_backup,
+                    trigger=CronTrigger(hour=21, minute=0),
+                    id='daily_telegram_backup_job',
+                    name='Daily Telegram Backup',
+                    replace_existing=True
+                )
+            elif scheduler.get_job('daily_telegram_backup_job'):
+                scheduler.remove_job('daily_telegram_backup_job')
+            
+            synced_settings = current
+        except Exception as e:
+            logger.error(f"Error syncing schedules from settings: {e}")
+
+
 def init_scheduler(app):
     global scheduler
     
@@ -142,6 +178,35 @@ def init_scheduler(app):
                 
                 logger.info("Daily Telegram backup scheduler initialized at 21:00 (9 PM)")
         
+        from app.utils.db_engine import run_checkpoint, CHECKPOINT_MINUTES
+        scheduler.add_job(
+            func=run_checkpoint,
+            trigger='interval',
+            minutes=CHECKPOINT_MINUTES,
+            id='wal_checkpoint_job',
+            name='SQLite WAL Checkpoint',
+            replace_existing=True
+        )
+        
+        from app.utils.unread_counters import run_repair
+        scheduler.add_job(
+            func=run_repair,
+            trigger='interval',
+            hours=1,
+            id='unread_counters_repair_job',
+            name='Repair Unread Notification Counters',
+            replace_existing=True
+        )
+        
+        scheduler.add_job(
+            func=sync_schedules_from_settings,
+            trigger='interval',
+            minutes=1,
+            id='sync_schedules_job',
+            name='Sync Schedules From Settings',
+            replace_existing=True
+        )
+        
         scheduler.start()
         logger.info("Scheduler started successfully")
 
@@ -0,0 +1,117 @@
+from datetime import datetime
+from sqlalchemy import select, func, case, and_
+from app import db
+from app.models import (Student, Teacher, Course, Enrollment, Notification,
+                        NotificationRecipient, Payment)
+from app.utils.cache import VersionedCache
+
+dashboard_stats_cache = VersionedCache('dashboard_stats', {
+    'students', 'teachers', 'courses', 'enrollments',
+    'notifications', 'notification_recipients', 'payments'
+})
+
+payment_stats_cache = VersionedCache('payment_stats', {
+    'payments', 'installment_payments', 'students'
+})
+
+
+def _count(model, *criteria):
+    return select(func.count(model.id)).where(*criteria).scalar_subquery()
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def compute_dashboard_stats():
+    """حساب إحصائيات لوحة التحكم باستعلام واحد"""
+    payment_totals = select(
+        func.count(Payment.id).label('total_payments'),
+        _count_if(Payment.status == 'paid').label('paid_count'),
+        _count_if(Payment.status.in_(['pending', 'partial'])).label('pending_count'),
+        func.coalesce(func.sum(Payment.paid_amount), 0).label('total_collected'),
+        func.coalesce(func.sum(Payment.total_amount), 0).label('total_expected')
+    ).subquery()
+
+    row = db.session.execute(select(
+        payment_totals,
+        _count(Student).label('students'),
+        _count(Teacher).label('teachers'),
+        _count(Course).label('courses'),
+        _count(Enrollment).label('enrollments'),
+        _count(Notification).label('notifications_total'),
+        _count(Notification, Notification.is_active == True).label('notifications_active'),
+        _count(NotificationRecipient, NotificationRecipient.is_read == False).label('total_unread')
+    )).one()
+
+    payment_stats = {
+        'total_payments': row.total_payments,
+        'paid_count': row.paid_count,
+        'pending_count': row.pending_count,
+        'total_collected': row.total_collected,
+        'total_expected': row.total_expected
+    }
+    payment_stats['total_remaining'] = payment_stats['total_expected'] - payment_stats['total_collected']
+
+    return {
+        'stats': {
+            'students': row.students,
+            'teachers': row.teachers,
+            'courses': row.courses,
+            'enrollments': row.enrollments
+        },
+        'notification_stats': {
+            'total': row.notifications_total,
+            'active': row.notifications_active,
+            'total_unread': row.total_unread
+        },
+        'payment_stats': payment_stats
+    }
+
+
+def compute_payment_report_stats(today):
+    """حساب إحصائيات تقرير الأقساط بتجميع SQL واحد"""
+    is_open = Payment.status.in_(['pending', 'partial'])
+    is_overdue = and_(is_open, Payment.due_date < today)
+
+    row = db.session.execute(select(
+        func.count(Payment.id).label('total_count'),
+        _count_if(Payment.status == 'paid').label('paid_count'),
+        _count_if(Payment.status == 'partial').label('partial_count'),
+        _count_if(Payment.status == 'pending').label('pending_count'),
+        func.coalesce(func.sum(Payment.total_amount), 0).label('total_expected'),
+        func.coalesce(func.sum(Payment.paid_amount), 0).label('total_collected'),
+        func.count(func.distinct(Payment.student_id)).label('students_with_payments'),
+        func.count(func.distinct(case((is_open, Payment.student_id)))).label('students_with_pending'),
+        _count_if(is_overdue).label('overdue_count'),
+        func.coalesce(func.sum(case(
+            (is_overdue, Payment.total_amount - func.coalesce(Payment.paid_amount, 0)), else_=0
+        )), 0).label('overdue_amount')
+    )).one()
+
+    total_expected = row.total_expected
+    total_collected = row.total_collected
+
+    return {
+        'total_expected': total_expected,
+        'total_collected': total_collected,
+        'total_remaining': total_expected - total_collected,
+        'collection_rate': (total_collected / total_expected * 100) if total_expected > 0 else 0,
+        'paid_count': row.paid_count,
+        'partial_count': row.partial_count,
+        'pending_count': row.pending_count,
+        'total_count': row.total_count,
+        'students_with_payments': row.students_with_payments,
+        'students_with_pending': row.students_with_pending,
+        'overdue_count': row.overdue_count,
+        'overdue_amount': row.overdue_amount
+    }
+
+
+def get_dashboard_stats():
+    return dashboard_stats_cache.get('dashboard', compute_dashboard_stats)
+
+
+def get_payment_report_stats():
+    today = datetime.now().date()
+    return payment_stats_cache.get(('payment_report', today), lambda: compute_payment_report_stats(today))
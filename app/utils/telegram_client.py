@@ -0,0 +1,135 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+from telegram import Bot
+from telegram.request import HTTPXRequest
+from app.utils.telegram_scheduler import BULK, get_outbound_scheduler
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_POOL_SIZE = int(os.environ.get('TELEGRAM_POOL_SIZE', 20))
+
+_loop = None
+_thread = None
+_bots = {}
+_lock = threading.Lock()
+
+
+class TelegramClientRegistry:
+    """
+    عملاء Bot مشتركون لكل العملية، واحد لكل (توكن، عنوان API)
+    العملاء يعيشون في حلقة أحداث مخصصة في خيط واحد، فتبقى اتصالات HTTP (keep-alive)
+    مفتوحة بين الرسائل بدل فتح اتصال ومصافحة TLS جديدة لكل إرسال
+    """
+
+    @staticmethod
+    def _ensure_loop():
+        global _loop, _thread
+        with _lock:
+            if _loop is None or _loop.is_closed():
+                _loop = asyncio.new_event_loop()
+                _thread = threading.Thread(target=_loop.run_forever, name='telegram-io', daemon=True)
+                _thread.start()
+            return _loop
+
+    @staticmethod
+    async def _create_bot(token, base_url):
+        kwargs = {
+            'token': token,
+            'request': HTTPXRequest(connection_pool_size=CONNECTION_POOL_SIZE)
+        }
+        if base_url:
+            kwargs['base_url'] = base_url
+        bot = Bot(**kwargs)
+        await bot.initialize()
+        return bot
+
+    @classmethod
+    async def _get_bot(cls, token, base_url=None):
+        # نخزن مهمة الإنشاء نفسها حتى لا تنشئ الطلبات المتزامنة أكثر من عميل لنفس التوكن
+        key = (token, base_url)
+        task = _bots.get(key)
+        if task is None:
+            task = asyncio.ensure_future(cls._create_bot(token, base_url))
+            _bots[key] = task
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            if _bots.get(key) is task:
+                del _bots[key]
+            raise
+
+    @classmethod
+    async def _invoke(cls, token, base_url, func, args, kwargs):
+        bot = await cls._get_bot(token, base_url)
+        return await func(bot, *args, **kwargs)
+
+    @classmethod
+    def _submit(cls, token, func, args, kwargs, base_url=None):
+        loop = cls._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(cls._invoke(token, base_url, func, args, kwargs), loop)
+
+    @classmethod
+    def submit(cls, token, func, *args, base_url=None, **kwargs):
+        """جدولة func(bot, ...) دون انتظار؛ تُرجع concurrent.futures.Future"""
+        return cls._submit(token, func, args, kwargs, base_url)
+
+    @classmethod
+    def run(cls, token, func, *args, base_url=None, timeout=None, **kwargs):
+        """تنفيذ func(bot, ...) بالعميل المشترك من كود متزامن وانتظار النتيجة"""
+        return cls._submit(token, func, args, kwargs, base_url).result(timeout)
+
+    @classmethod
+    async def call(cls, token, func, *args, base_url=None, **kwargs):
+        """تنفيذ func(bot, ...) بالعميل المشترك من أي حلقة أحداث أخرى"""
+        loop = cls._ensure_loop()
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        if current is loop:
+            return await cls._invoke(token, base_url, func, args, kwargs)
+        return await asyncio.wrap_future(cls._submit(token, func, args, kwargs, base_url))
+
+    @staticmethod
+    def shutdown(timeout=10):
+        """إغلاق اتصالات كل العملاء وإيقاف حلقة الأحداث"""
+        global _loop, _thread
+        with _lock:
+            loop, thread = _loop, _thread
+            _loop, _thread = None, None
+        if loop is None or loop.is_closed():
+            return
+
+        async def close_all():
+            for task in list(_bots.values()):
+                try:
+                    bot = await task
+                    await bot.shutdown()
+                except Exception as e:
+                    logger.error(f"Error closing Telegram client: {e}")
+            _bots.clear()
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_all(), loop).result(timeout)
+        except Exception as e:
+            logger.error(f"Error shutting down Telegram clients: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+        loop.close()
+
+
+atexit.register(TelegramClientRegistry.shutdown)
+
+
+async def _send_message(bot, chat_id, text, **kwargs):
+    return await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+
+
+async def send_message(bot_token, chat_id, text, priority=BULK, **kwargs):
+    """إرسال رسالة عبر العميل المشترك بعد أخذ دورها من منسق الإرسال؛ تُرجع كائن الرسالة"""
+    await get_outbound_scheduler().acquire(chat_id, priority)
+    return await TelegramClientRegistry.call(bot_token, _send_message, chat_id, text, **kwargs)
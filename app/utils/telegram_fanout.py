@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from sqlalchemy import update
+from telegram.constants import ParseMode
+from telegram.error import RetryAfter, Forbidden, BadRequest
+from app import db
+from app.models import Notification, NotificationRecipient, SiteSettings
+from app.utils import queries
+from app.utils.helpers import damascus_now
+from app.utils.telegram_client import TelegramClientRegistry
+from app.utils.telegram_scheduler import BULK, get_outbound_scheduler
+from app.utils.worker_context import worker_app_context
+
+logger = logging.getLogger(__name__)
+
+# المعدل العام ومعدل كل محادثة يفرضهما منسق الإرسال المشترك (telegram_scheduler)
+MAX_CONCURRENT_SENDS = 20
+MAX_SEND_ATTEMPTS = 3
+DELIVERY_BATCH_SIZE = 500
+
+# رفض نهائي من تيليجرام (حظر البوت، محادثة غير صالحة): لا فائدة من إعادة المحاولة
+REJECTED = object()
+
+
+async def _send_one(bot, semaphore, chat_id, text):
+    scheduler = get_outbound_scheduler()
+    async with semaphore:
+        for attempt in range(1, MAX_SEND_ATTEMPTS + 1):
+            await scheduler.acquire(chat_id, BULK)
+            try:
+                result = await bot.send_message(
+                    chat_id=chat_id,
+                    text=text,
+                    parse_mode=ParseMode.MARKDOWN
+                )
+                return result.message_id
+            except RetryAfter as e:
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+                logger.warning(f"Telegram rate limit hit, retrying {chat_id} after {retry_after}s")
+                await asyncio.sleep(retry_after)
+            except (Forbidden, BadRequest) as e:
+                logger.error(f"Error sending Telegram message to {chat_id}: {e}")
+                return REJECTED
+            except Exception as e:
+                logger.error(f"Error sending Telegram message to {chat_id} (attempt {attempt}): {e}")
+                if attempt < MAX_SEND_ATTEMPTS:
+                    await asyncio.sleep(attempt)
+        return None
+
+
+async def fan_out(bot_token, messages, max_concurrency=MAX_CONCURRENT_SENDS, base_url=None, rejected=None):
+    """
+    إرسال مجموعة رسائل عبر عميل البوت المشترك للعملية واتصالاته المفتوحة
+    messages: قائمة من (key, chat_id, text)
+    rejected: مجموعة اختيارية تُضاف إليها مفاتيح الرسائل المرفوضة نهائياً
+    تُرجع قاموساً {key: message_id} للرسائل التي أُرسلت بنجاح
+    """
+    if not messages:
+        return {}
+
+    async def send_all(bot):
+        semaphore = asyncio.Semaphore(max_concurrency)
+        return await asyncio.gather(*[
+            _send_one(bot, semaphore, chat_id, text)
+            for _, chat_id, text in messages
+        ])
+
+    message_ids = await TelegramClientRegistry.call(bot_token, send_all, base_url=base_url)
+
+    delivered = {}
+    for (key, _, _), message_id in zip(messages, message_ids):
+        if message_id is REJECTED:
+            if rejected is not None:
+                rejected.add(key)
+        elif message_id:
+            delivered[key] = message_id
+    return delivered
+
+
+def get_telegram_targets(notification_id):
+    """جلب (recipient_id, telegram_id) لكل المستلمين غير المسلَّمين باستعلام واحد"""
+    rows = queries.telegram_targets(notification_id).all()
+
+    targets = {}
+    for recipient_id, telegram_id in rows:
+        targets.setdefault(recipient_id, telegram_id)
+    return targets
+
+
+def mark_telegram_delivered_bulk(delivered):
+    """تحديث علامات التسليم لعدة مستلمين دفعة واحدة"""
+    if not delivered:
+        return
+
+    now = damascus_now()
+    rows = [
+        {
+            'id': recipient_id,
+            'telegram_delivered': True,
+            'telegram_delivered_at': now,
+            'telegram_message_id': message_id
+        }
+        for recipient_id, message_id in delivered.items()
+    ]
+
+    for start in range(0, len(rows), DELIVERY_BATCH_SIZE):
+        db.session.execute(update(NotificationRecipient), rows[start:start + DELIVERY_BATCH_SIZE])
+    db.session.commit()
+
+
+def deliver_notification(notification_id):
+    """
+    إرسال إشعار إلى مستلميه الذين لم يُسلَّم لهم بعد على تيليجرام
+    تُرجع (عدد الرسائل المرسلة، عدد الرسائل التي جرت محاولة إرسالها، عدد المرفوضة نهائياً)
+    الباقي فشل مؤقت تعيد المحاولة إليه مهمة صندوق الصادر، والمسلَّم لا يُرسل مرة أخرى
+    """
+    with worker_app_context():
+        notification = db.session.get(Notification, notification_id)
+        if not notification or not notification.send_telegram:
+            return 0, 0, 0
+
+        settings = SiteSettings.query.first()
+        if not settings or not settings.telegram_bot_token:
+            return 0, 0, 0
+
+        targets = get_telegram_targets(notification_id)
+        if not targets:
+            return 0, 0, 0
+
+        text = f"🔔 *{notification.title}*\n\n{notification.message}"
+        messages = [(recipient_id, telegram_id, text) for recipient_id, telegram_id in targets.items()]
+
+        rejected = set()
+        delivered = asyncio.run(fan_out(settings.telegram_bot_token, messages, rejected=rejected))
+        mark_telegram_delivered_bulk(delivered)
+
+        logger.info(f"Notification {notification_id}: delivered {len(delivered)}/{len(messages)} Telegram messages"
+                    f" ({len(rejected)} rejected)")
+        return len(delivered), len(messages), len(rejected)
@@ -0,0 +1,392 @@
+import asyncio
+import fcntl
+import heapq
+import itertools
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# أولويات الإرسال: ردود المحادثة تسبق الإشعارات الجماعية
+INTERACTIVE = 0
+BULK = 1
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BULK: 'bulk'}
+
+# تيليجرام يسمح بحوالي 30 رسالة/ثانية للبوت وحوالي رسالة/ثانية لكل محادثة، نبقى تحت الحد بهامش أمان
+GLOBAL_RATE = float(os.environ.get('TELEGRAM_GLOBAL_RATE', 25))
+GLOBAL_BURST = float(os.environ.get('TELEGRAM_GLOBAL_BURST', 25))
+CHAT_RATE = float(os.environ.get('TELEGRAM_CHAT_RATE', 1))
+CHAT_BURST = float(os.environ.get('TELEGRAM_CHAT_BURST', 5))
+CHAT_BUCKET_IDLE_SECONDS = 300
+
+# حد البوت واحد لكل العمليات (عمّال الويب، عملية البوت، المجدول)، فالدلو العام محفوظ في ملف
+# تتشاركه عمليات الجهاز؛ قيمة فارغة تجعله دلواً خاصاً بالعملية
+GLOBAL_STATE_FILE = os.environ.get(
+    'TELEGRAM_RATE_STATE_FILE', os.path.join(tempfile.gettempdir(), 'alqasim-telegram-rate.state')
+)
+
+# حالات الطلب في الطابور
+WAITING = 0
+GRANTED = 1
+CANCELLED = 2
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+class TokenBucket:
+    """دلو رموز: rate رمز في الثانية وسعة capacity للدفعات القصيرة"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_at(self, now):
+        """أقرب وقت يتوفر فيه رمز واحد"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return now
+        return now + (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def try_take(self, now):
+        """أخذ رمز إن توفر؛ تُرجع 0 عند النجاح وإلا عدد الثواني حتى يتوفر"""
+        ready_at = self.ready_at(now)
+        if ready_at > now:
+            return ready_at - now
+        self.take()
+        return 0.0
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def is_idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class SharedTokenBucket:
+    """
+    دلو رموز حالته (الرموز، وقت آخر تحديث) في ملف تتشاركه العمليات، كل عملية تقرؤه وتعدّله تحت flock
+    فمجموع ما ترسله كل العمليات لا يتجاوز rate مهما كان عددها
+    الوقت بساعة النظام (time.time) لأن monotonic لا يُقارن بين العمليات على كل الأنظمة
+    """
+
+    STATE = struct.Struct('<dd')
+
+    def __init__(self, path, rate, capacity):
+        self.path = path
+        self.rate = rate
+        self.capacity = capacity
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def _update(self, change):
+        """قراءة الحالة وإعادة ملئها ثم كتابة ما تُرجعه change(tokens)، كلها تحت قفل الملف"""
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            now = time.time()
+            data = os.pread(self._fd, self.STATE.size, 0)
+            if len(data) == self.STATE.size:
+                tokens, updated = self.STATE.unpack(data)
+                tokens = min(self.capacity, tokens + max(now - updated, 0.0) * self.rate)
+            else:
+                tokens = self.capacity
+            tokens, result = change(tokens)
+            os.pwrite(self._fd, self.STATE.pack(tokens, now), 0)
+            return result
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def try_take(self, now):
+        def change(tokens):
+            if tokens >= 1:
+                return tokens - 1, 0.0
+            return tokens, (1 - tokens) / self.rate
+        return self._update(change)
+
+    def refund(self):
+        self._update(lambda tokens: (min(self.capacity, tokens + 1), None))
+
+
+class _Waiter:
+    """طلب إرسال في الطابور، يُرتب بالأولوية ثم بترتيب الوصول"""
+
+    __slots__ = ('priority', 'sequence', 'chat_id', 'enqueued_at', 'callback', 'state')
+
+    def __init__(self, priority, sequence, chat_id, enqueued_at, callback):
+        self.priority = priority
+        self.sequence = sequence
+        self.chat_id = chat_id
+        self.enqueued_at = enqueued_at
+        self.callback = callback
+        self.state = WAITING
+
+    def __lt__(self, other):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class OutboundScheduler:
+    """
+    منسق الإرسال الصادر لكل العملية:
+    - دلو رموز عام يحترم حد البوت (مشترك بين العمليات عبر global_state_file)، ودلو لكل محادثة
+    - الطلبات تنتظر في طابور أولويات (التفاعلية أولاً، ثم الجماعية بترتيب وصولها)
+    - إذا كانت محادثة الطلب الأعلى أولوية مقيّدة حالياً يُمرَّر الطلب التالي الجاهز حتى لا تضيع السعة
+    - يعمل في خيط خاص ولا يرتبط بحلقة أحداث معينة، فيشترك فيه البوت والإشعارات والبث
+
+    البنية: كومة لكل محادثة، وكومة جاهزة فيها رأس كل محادثة غير مقيّدة، وكومة للمحادثات المقيّدة
+    مرتبة بوقت جاهزيتها، فكل منح O(log n). المدخلات القديمة في الكومة الجاهزة (رأس تغير أو طلب أُلغي)
+    تُتجاهل عند خروجها
+    """
+
+    def __init__(self, global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST,
+                 chat_rate=CHAT_RATE, chat_burst=CHAT_BURST, global_state_file=GLOBAL_STATE_FILE):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        if global_state_file:
+            self._global = SharedTokenBucket(global_state_file, global_rate, global_burst)
+        else:
+            self._global = TokenBucket(global_rate, global_burst)
+        self._chats = {}
+        self._queues = {}
+        self._ready = []
+        self._throttled = []
+        self._throttled_chats = set()
+        self._pending = 0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._last_prune = time.monotonic()
+
+        self._granted = {priority: 0 for priority in PRIORITY_NAMES}
+        self._wait_total = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self._wait_max = {priority: 0.0 for priority in PRIORITY_NAMES}
+
+    def submit(self, chat_id, priority, callback):
+        """تسجيل طلب إرسال؛ callback() تُستدعى من خيط المنسق عندما يحين دوره. تُرجع الطلب لإلغائه"""
+        with self._condition:
+            waiter = _Waiter(priority, next(self._sequence), chat_id, time.monotonic(), callback)
+            queue = self._queues.setdefault(chat_id, [])
+            heapq.heappush(queue, waiter)
+            if queue[0] is waiter and chat_id not in self._throttled_chats:
+                heapq.heappush(self._ready, waiter)
+            self._pending += 1
+            self._ensure_thread()
+            self._condition.notify()
+            return waiter
+
+    def cancel(self, waiter):
+        """
+        إلغاء طلب: إن كان ينتظر يخرج من الطابور، وإن مُنح دوره ولم يُستخدم يعود الرمز إلى الدلوين
+        حتى لا يضيع من سعة البوت أو المحادثة
+        """
+        with self._condition:
+            if waiter.state == WAITING:
+                waiter.state = CANCELLED
+                self._pending -= 1
+                queue = self._queues.get(waiter.chat_id)
+                if queue and queue[0] is waiter:
+                    self._advance(waiter.chat_id)
+            elif waiter.state == GRANTED:
+                waiter.state = CANCELLED
+                self._global.refund()
+                bucket = self._chats.get(waiter.chat_id)
+                if bucket is not None:
+                    bucket.refund()
+            self._condition.notify()
+
+    async def acquire(self, chat_id, priority=INTERACTIVE):
+        """انتظار دور الإرسال إلى chat_id دون حجب حلقة الأحداث"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            if not future.done():
+                future.set_result(None)
+
+        waiter = self.submit(chat_id, priority, lambda: loop.call_soon_threadsafe(grant))
+        try:
+            await future
+        except asyncio.CancelledError:
+            self.cancel(waiter)
+            raise
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run_loop, name='telegram-scheduler', daemon=True)
+            self._thread.start()
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _advance(self, chat_id):
+        """إزالة الطلبات الملغاة من رأس كومة المحادثة، ووضع الرأس الجديد في الكومة الجاهزة"""
+        queue = self._queues.get(chat_id)
+        while queue and queue[0].state != WAITING:
+            heapq.heappop(queue)
+        if not queue:
+            self._queues.pop(chat_id, None)
+        elif chat_id not in self._throttled_chats:
+            heapq.heappush(self._ready, queue[0])
+
+    def _release_throttled(self, now):
+        while self._throttled and self._throttled[0][0] <= now:
+            _, _, chat_id = heapq.heappop(self._throttled)
+            self._throttled_chats.discard(chat_id)
+            self._advance(chat_id)
+
+    def _next_ready(self, now):
+        """أعلى طلب أولوية محادثته جاهزة، أو None"""
+        while self._ready:
+            waiter = self._ready[0]
+            queue = self._queues.get(waiter.chat_id)
+            if (waiter.state != WAITING or not queue or queue[0] is not waiter
+                    or waiter.chat_id in self._throttled_chats):
+                heapq.heappop(self._ready)
+                continue
+            if waiter.chat_id is not None:
+                chat_at = self._chat_bucket(waiter.chat_id).ready_at(now)
+                if chat_at > now:
+                    heapq.heappop(self._ready)
+                    heapq.heappush(self._throttled, (chat_at, next(self._sequence), waiter.chat_id))
+                    self._throttled_chats.add(waiter.chat_id)
+                    continue
+            return waiter
+        return None
+
+    def _prune(self, now):
+        if now - self._last_prune < CHAT_BUCKET_IDLE_SECONDS:
+            return
+        self._last_prune = now
+        for chat_id in [chat_id for chat_id, bucket in self._chats.items()
+                        if chat_id not in self._queues and bucket.is_idle(now)]:
+            del self._chats[chat_id]
+
+    def _run_loop(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+
+                now = time.monotonic()
+                self._release_throttled(now)
+                waiter = self._next_ready(now)
+                if waiter is None:
+                    timeout = self._throttled[0][0] - now if self._throttled else None
+                    self._condition.wait(max(timeout, 0.001) if timeout is not None else None)
+                    continue
+
+                wait = self._global.try_take(now)
+                if wait:
+                    self._condition.wait(wait)
+                    continue
+
+                heapq.heappop(self._ready)
+                heapq.heappop(self._queues[waiter.chat_id])
+                waiter.state = GRANTED
+                self._pending -= 1
+                if waiter.chat_id is not None:
+                    self._chat_bucket(waiter.chat_id).take()
+                self._advance(waiter.chat_id)
+
+                waited = now - waiter.enqueued_at
+                self._granted[waiter.priority] += 1
+                self._wait_total[waiter.priority] += waited
+                self._wait_max[waiter.priority] = max(self._wait_max[waiter.priority], waited)
+                self._prune(now)
+
+            try:
+                waiter.callback()
+            except Exception as e:
+                logger.error(f"Error granting Telegram send slot: {e}")
+
+    def metrics(self):
+        with self._condition:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            now = time.monotonic()
+            oldest = {name: 0.0 for name in PRIORITY_NAMES.values()}
+            for queue in self._queues.values():
+                for waiter in queue:
+                    if waiter.state != WAITING:
+                        continue
+                    name = PRIORITY_NAMES[waiter.priority]
+                    depth[name] += 1
+                    oldest[name] = max(oldest[name], round(now - waiter.enqueued_at, 3))
+
+            return {
+                'queue_depth': depth,
+                'oldest_wait': oldest,
+                'granted': {PRIORITY_NAMES[p]: count for p, count in self._granted.items()},
+                'avg_wait': {
+                    PRIORITY_NAMES[p]: round(self._wait_total[p] / count, 3) if count else 0.0
+                    for p, count in self._granted.items()
+                },
+                'max_wait': {PRIORITY_NAMES[p]: round(value, 3) for p, value in self._wait_max.items()},
+                'tracked_chats': len(self._chats),
+                'global_rate': self.global_rate,
+                'global_shared': isinstance(self._global, SharedTokenBucket),
+                'chat_rate': self.chat_rate
+            }
+
+
+class SchedulerRateLimiter(BaseRateLimiter):
+    """
+    محدد معدل لتطبيق البوت يمرر كل طلب موجّه لمحادثة عبر المنسق المشترك بأولوية تفاعلية
+    يمكن تمرير أولوية أخرى لطلب بعينه عبر rate_limit_args (مثل BULK)
+    """
+
+    def __init__(self, max_retries=1):
+        self.max_retries = max_retries
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id') if data else None
+        priority = rate_limit_args if isinstance(rate_limit_args, int) and rate_limit_args in PRIORITY_NAMES else INTERACTIVE
+
+        for attempt in range(self.max_retries + 1):
+            if chat_id is not None:
+                await get_outbound_scheduler().acquire(chat_id, priority)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+                logger.warning(f"Telegram rate limit hit on {endpoint}, retrying after {retry_after}s")
+                await asyncio.sleep(retry_after)
+
+
+def get_outbound_scheduler():
+    """المنسق المشترك للعملية الحالية، يُنشأ عند أول استخدام"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = OutboundScheduler()
+        return _scheduler
@@ -0,0 +1,173 @@
+"""
+عدادات الإشعارات غير المقروءة لكل مستخدم (جدول notification_unread_counts)
+- تُعدَّل بعبارات SQL ذرية داخل معاملة التغيير نفسها: إنشاء إشعار، القراءة، التفعيل والتعطيل، الحذف
+- قراءة العدد بحث بالمفتاح الأساسي بدل عدّ المستلمين مع join عند كل تحميل وكل استطلاع
+- العد يشمل الإشعارات النشطة فقط؛ غياب صف المستخدم يعني صفر
+- repair_unread_counters يعيد الحساب من سجلات المستلمين ويصحح أي انحراف (يشغّلها المجدول دورياً)
+"""
+import logging
+import sqlalchemy as sa
+from sqlalchemy import select, func, update, delete
+from app import db
+from app.models import Notification, NotificationRecipient, NotificationUnreadCount
+from app.utils.helpers import damascus_now
+from app.utils.upsert import dialect_insert, upsert
+
+logger = logging.getLogger(__name__)
+
+counts = NotificationUnreadCount.__table__
+
+
+def _unread_by_user(notification_id=None, user_ids=None):
+    """(user_id, unread) لغير المقروء من الإشعارات النشطة، أو من إشعار واحد فقط"""
+    query = select(
+        NotificationRecipient.user_id,
+        func.count().label('unread')
+    ).where(NotificationRecipient.is_read == False)
+
+    if notification_id is not None:
+        query = query.where(NotificationRecipient.notification_id == notification_id)
+    else:
+        query = query.join(Notification).where(Notification.is_active == True)
+
+    if user_ids is not None:
+        query = query.where(NotificationRecipient.user_id.in_(user_ids))
+
+    return query.group_by(NotificationRecipient.user_id)
+
+
+def notification_added(notification_id):
+    """إضافة غير المقروء من إشعار نشط إلى عدادات مستلميه بعبارة INSERT ... SELECT واحدة"""
+    source = _unread_by_user(notification_id).subquery()
+    stmt = dialect_insert(counts).from_select(
+        ['user_id', 'unread', 'updated_at'],
+        select(source.c.user_id, source.c.unread, sa.literal(damascus_now())).where(sa.true())
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={
+            'unread': counts.c.unread + stmt.excluded.unread,
+            'updated_at': stmt.excluded.updated_at
+        }
+    )
+    db.session.execute(stmt)
+
+
+def notification_activated(notification_id):
+    notification_added(notification_id)
+
+
+def notification_deactivated(notification_id):
+    """طرح غير المقروء من إشعار من عدادات مستلميه، عند تعطيله أو قبل حذفه وهو نشط"""
+    unread = select(func.count()).where(
+        NotificationRecipient.notification_id == notification_id,
+        NotificationRecipient.is_read == False,
+        NotificationRecipient.user_id == counts.c.user_id
+    ).scalar_subquery()
+    recipients = select(NotificationRecipient.user_id).where(
+        NotificationRecipient.notification_id == notification_id,
+        NotificationRecipient.is_read == False
+    )
+    remaining = counts.c.unread - unread
+    db.session.execute(
+        update(counts)
+        .where(counts.c.user_id.in_(recipients))
+        .values(unread=sa.case((remaining < 0, 0), else_=remaining), updated_at=damascus_now())
+    )
+
+
+def recipient_read(user_id, notification_id):
+    """إنقاص عداد المستخدم بعد قراءة مستلم، إذا كان الإشعار نشطاً (غير النشط غير محسوب أصلاً)"""
+    active = select(Notification.id).where(
+        Notification.id == notification_id,
+        Notification.is_active == True
+    ).exists()
+    db.session.execute(
+        update(counts)
+        .where(counts.c.user_id == user_id, counts.c.unread > 0, active)
+        .values(unread=counts.c.unread - 1, updated_at=damascus_now())
+    )
+
+
+def all_read(user_id):
+    db.session.execute(
+        update(counts)
+        .where(counts.c.user_id == user_id)
+        .values(unread=0, updated_at=damascus_now())
+    )
+
+
+def reset_unread_counters():
+    """بعد حذف كل الإشعارات"""
+    db.session.execute(delete(counts))
+
+
+def get_unread_count(user_id):
+    return db.session.execute(
+        select(counts.c.unread).where(counts.c.user_id == user_id)
+    ).scalar() or 0
+
+
+def rebuild_unread_counters(connection):
+    """إعادة بناء كل العدادات من سجلات المستلمين (للترحيل الأول)"""
+    connection.execute(delete(counts))
+    source = _unread_by_user().subquery()
+    connection.execute(
+        sa.insert(counts).from_select(
+            ['user_id', 'unread', 'updated_at'],
+            select(source.c.user_id, source.c.unread, sa.literal(damascus_now()))
+        )
+    )
+
+
+def repair_unread_counters(user_ids=None):
+    """
+    مقارنة العدادات بالعدد الفعلي وتصحيح المنحرف منها؛ تُرجع عدد المستخدمين الذين صُحّحت عداداتهم
+    user_ids: فحص مستخدمين محددين فقط
+    """
+    actual = dict(db.session.execute(_unread_by_user(user_ids=user_ids)).all())
+
+    stored_query = select(counts.c.user_id, counts.c.unread)
+    if user_ids is not None:
+        stored_query = stored_query.where(counts.c.user_id.in_(user_ids))
+    stored = dict(db.session.execute(stored_query).all())
+
+    drifted = [
+        user_id for user_id in set(actual) | set(stored)
+        if actual.get(user_id, 0) != stored.get(user_id, 0)
+    ]
+
+    if drifted:
+        # القيمة الصحيحة تُحسب داخل عبارة التحديث نفسها حتى لا تكتب قيمة قديمة إذا تغير شيء منذ القراءة
+        unread = select(func.count()).select_from(NotificationRecipient).join(Notification).where(
+            NotificationRecipient.user_id == counts.c.user_id,
+            NotificationRecipient.is_read == False,
+            Notification.is_active == True
+        ).scalar_subquery()
+        db.session.execute(
+            update(counts)
+            .where(counts.c.user_id.in_(drifted))
+            .values(unread=unread, updated_at=damascus_now())
+        )
+
+        missing = [
+            {'user_id': user_id, 'unread': actual[user_id], 'updated_at': damascus_now()}
+            for user_id in drifted if user_id not in stored
+        ]
+        upsert(counts, missing, index_elements=['user_id'])
+        logger.warning(f"Repaired unread notification counters for {len(drifted)} users")
+
+    db.session.commit()
+    return len(drifted)
+
+
+def run_repair():
+    """مهمة المجدول الدورية"""
+    from app.utils.worker_context import worker_app_context
+
+    with worker_app_context():
+        try:
+            repair_unread_counters()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error repairing unread notification counters: {e}")
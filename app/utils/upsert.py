@@ -0,0 +1,40 @@
+from sqlalchemy.dialects import sqlite, postgresql
+from app import db
+
+
+def dialect_insert(model_or_table, bind=None):
+    """إرجاع عبارة INSERT خاصة بمحرك قاعدة البيانات تدعم ON CONFLICT"""
+    bind = bind or db.session.get_bind()
+    if bind.dialect.name == 'postgresql':
+        return postgresql.insert(model_or_table)
+    return sqlite.insert(model_or_table)
+
+
+def upsert(model_or_table, rows, index_elements, update_columns=None, bind=None, returning=None):
+    """
+    إدراج الصفوف أو تحديثها عند التعارض مع قيد فريد
+    update_columns: قائمة أعمدة تُستبدل بالقيم الجديدة، أو قاموس {عمود: تعبير}،
+    أو دالة تستقبل excluded (القيم المرفوضة) وتُرجع القاموس
+    returning: أعمدة تُرجع للصفوف التي أُدرجت أو حُدّثت فعلاً
+    """
+    if not rows:
+        return None
+
+    stmt = dialect_insert(model_or_table, bind)
+
+    if update_columns is None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    else:
+        if callable(update_columns):
+            update_columns = update_columns(stmt.excluded)
+        elif not isinstance(update_columns, dict):
+            update_columns = {column: stmt.excluded[column] for column in update_columns}
+        stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=update_columns)
+
+    if returning is not None:
+        stmt = stmt.returning(*returning)
+
+    if bind is not None:
+        with bind.begin() as connection:
+            return connection.execute(stmt, rows)
+    return db.session.execute(stmt, rows)
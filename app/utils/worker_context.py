@@ -0,0 +1,43 @@
+import threading
+import logging
+from contextlib import contextmanager
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+_worker_app = None
+_lock = threading.RLock()
+
+
+def register_app(app):
+    """تسجيل نسخة التطبيق المشتركة لهذه العملية (تُسجَّل أول نسخة فقط)"""
+    global _worker_app
+    with _lock:
+        if _worker_app is None:
+            _worker_app = app
+            logger.info("Shared application instance registered for this process")
+    return _worker_app
+
+
+def get_worker_app():
+    """إرجاع نسخة التطبيق المشتركة، وبناؤها مرة واحدة فقط لكل عملية"""
+    if _worker_app is not None:
+        return _worker_app
+
+    with _lock:
+        if _worker_app is None:
+            from app import create_app
+            register_app(create_app())
+    return _worker_app
+
+
+@contextmanager
+def worker_app_context():
+    """سياق تطبيق للمهام الخلفية والإشعارات والبوت دون إعادة بناء التطبيق"""
+    if has_app_context():
+        yield current_app._get_current_object()
+        return
+
+    app = get_worker_app()
+    with app.app_context():
+        yield app
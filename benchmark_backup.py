@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+سكريبت قياس أثر النسخ الاحتياطي الحي على عمليات الكتابة في SQLite
+تُنشأ قاعدة مؤقتة بالحجم المطلوب، وخيط كتابة يحفظ معاملة صغيرة كل --write-interval،
+ثم تؤخذ نسخة بإحدى الطرق ويُطبع زمن النسخ وزمن انتظار الكتابات (p50 / p99 / الأقصى)
+- copy: نسخ الملف بـ shutil.copy (السلوك القديم، قد ينتج نسخة ممزقة)
+- single: Connection.backup في خطوة واحدة
+- stepped: BackupManager.snapshot_database (خطوات مع لقطة قراءة ثابتة في WAL ثم integrity_check)
+الاستخدام:
+    python benchmark_backup.py
+    python benchmark_backup.py --size-mb 300 --journal wal --method stepped
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+ROW_BYTES = 4096
+
+
+def build_database(path, size_mb, journal):
+    connection = sqlite3.connect(path)
+    connection.execute(f'PRAGMA journal_mode={journal}')
+    connection.execute('CREATE TABLE blobs (id INTEGER PRIMARY KEY, data BLOB)')
+    connection.execute('CREATE TABLE writes (id INTEGER PRIMARY KEY, created REAL)')
+    rows = size_mb * 1024 * 1024 // ROW_BYTES
+    for start in range(0, rows, 1000):
+        connection.executemany('INSERT INTO blobs (data) VALUES (?)',
+                               [(os.urandom(ROW_BYTES),) for _ in range(min(1000, rows - start))])
+        connection.commit()
+    connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    connection.close()
+
+
+class Writer(threading.Thread):
+    """يحفظ معاملة صغيرة كل interval ويسجل زمن كل حفظ بما فيه انتظار القفل"""
+
+    def __init__(self, path, interval):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.latencies = []
+        self.errors = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        connection = sqlite3.connect(self.path, timeout=15)
+        while not self.stop.is_set():
+            started = time.perf_counter()
+            try:
+                connection.execute('INSERT INTO writes (created) VALUES (?)', (time.time(),))
+                connection.commit()
+                self.latencies.append(time.perf_counter() - started)
+            except sqlite3.OperationalError:
+                self.errors += 1
+                connection.rollback()
+            self.stop.wait(self.interval)
+        connection.close()
+
+
+def take_backup(method, source, dest):
+    if method == 'copy':
+        shutil.copy(source, dest)
+    elif method == 'single':
+        src = sqlite3.connect(source, timeout=30)
+        dst = sqlite3.connect(dest)
+        try:
+            src.backup(dst, pages=-1)
+        finally:
+            dst.close()
+            src.close()
+    else:
+        from app.utils.backup import BackupManager
+        BackupManager.snapshot_database(dest, source_path=source, progress=lambda copied, total: None)
+
+
+def benchmark(method, journal, args, directory):
+    source = os.path.join(directory, f'source-{journal}.db')
+    if not os.path.exists(source):
+        build_database(source, args.size_mb, journal)
+    dest = os.path.join(directory, f'backup-{journal}-{method}.db')
+
+    writer = Writer(source, args.write_interval)
+    writer.start()
+    time.sleep(0.5)
+    started = time.perf_counter()
+    take_backup(method, source, dest)
+    elapsed = time.perf_counter() - started
+    time.sleep(0.5)
+    writer.stop.set()
+    writer.join()
+
+    latencies = sorted(writer.latencies)
+    os.remove(dest)
+    return {
+        'seconds': round(elapsed, 2),
+        'writes': len(latencies),
+        'errors': writer.errors,
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 1) if latencies else None,
+        'max_ms': round(latencies[-1] * 1000, 1) if latencies else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس أثر النسخ الاحتياطي الحي على الكتابة')
+    parser.add_argument('--size-mb', type=int, default=100)
+    parser.add_argument('--journal', choices=['wal', 'delete', 'both'], default='both')
+    parser.add_argument('--method', choices=['copy', 'single', 'stepped', 'all'], default='all')
+    parser.add_argument('--write-interval', type=float, default=0.01)
+    args = parser.parse_args()
+
+    journals = ['delete', 'wal'] if args.journal == 'both' else [args.journal]
+    methods = ['copy', 'single', 'stepped'] if args.method == 'all' else [args.method]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for journal in journals:
+            for method in methods:
+                results[(journal, method)] = benchmark(method, journal, args, directory)
+
+    print(f"\nقاعدة {args.size_mb}MB، كتابة كل {args.write_interval * 1000:.0f}ms")
+    for (journal, method), result in results.items():
+        print(f"{journal:>6} {method:>7}: النسخ={result['seconds']}s  كتابات={result['writes']}  "
+              f"p50={result['p50_ms']}ms  p99={result['p99_ms']}ms  الأقصى={result['max_ms']}ms  "
+              f"أخطاء={result['errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+اختبار حمل للبوت: إعادة تشغيل آلاف التحديثات المحاكاة عبر معالجات bot.py مقابل خادم Bot API وهمي
+قاعدة SQLite مؤقتة فيها طلاب مسجلون في البوت ودورات وعلامات، وكل تحديث أمر من أوامر البوت
+(/start، /dashboard، /mycourses، /mygrades، /courses، /news) لمستخدم من المستخدمين بالتناوب
+يُطبع عدد التحديثات في الثانية وزمن معالجة التحديث (p50 / p95) لكل درجة توازي
+منسق الإرسال يُشغَّل بلا سقف معدل افتراضياً حتى يُقاس البوت نفسه لا حد تيليجرام
+الاستخدام:
+    python benchmark_bot.py
+    python benchmark_bot.py --updates 5000 --users 500 --concurrency 1,16,64
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+from benchmark_fanout import FakeBotAPI, TOKEN, use_scheduler
+from benchmark_worker_context import make_config
+
+COMMANDS = ['/start', '/dashboard', '/mycourses', '/mygrades', '/courses', '/news']
+
+
+def seed(users):
+    from app import db
+    from app.models import User, Student, Teacher, Course, Enrollment, Grade, BotSession, SiteSettings
+
+    db.session.add(SiteSettings(telegram_bot_token=TOKEN, telegram_bot_enabled=True))
+    teacher = Teacher(user=User(phone_number='0800000000', full_name='teacher', role='teacher', password_hash='-'))
+    courses = [Course(title=f'Course {index}') for index in range(5)]
+    db.session.add_all([teacher] + courses)
+    db.session.flush()
+
+    telegram_ids = []
+    for index in range(users):
+        user = User(phone_number=f'09{index:08d}', full_name=f'student {index}', role='student', password_hash='-')
+        student = Student(user=user, student_number=f'S{index}')
+        db.session.add(student)
+        db.session.flush()
+        for course in courses[:3]:
+            db.session.add(Enrollment(student_id=student.id, course_id=course.id, teacher_id=teacher.id))
+            db.session.add(Grade(student_id=student.id, course_id=course.id, teacher_id=teacher.id,
+                                 exam_name='Exam', grade=80, max_grade=100))
+        session = BotSession(telegram_id=100000 + index)
+        db.session.add(session)
+        session.authenticate(user)
+        telegram_ids.append(session.telegram_id)
+    db.session.commit()
+    return telegram_ids
+
+
+def update_data(update_id, telegram_id, command):
+    sender = {'id': telegram_id, 'is_bot': False, 'first_name': 'student'}
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': telegram_id, 'type': 'private'},
+            'from': sender,
+            'text': command,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        }
+    }
+
+
+async def replay(api, telegram_ids, updates, concurrency):
+    import bot
+    from telegram import Update
+    from app.utils.bot_updates import PerChatUpdateProcessor
+
+    queued_at = {}
+    latencies = []
+    done = asyncio.Event()
+
+    class MeasuredProcessor(PerChatUpdateProcessor):
+        async def do_process_update(self, update, coroutine):
+            await super().do_process_update(update, coroutine)
+            latencies.append(time.perf_counter() - queued_at[update.update_id])
+            if len(latencies) == updates:
+                done.set()
+
+    bot.PerChatUpdateProcessor = MeasuredProcessor
+    bot.CONCURRENT_UPDATES = concurrency
+    application = bot.build_application(TOKEN, polling=False, base_url=api.base_url)
+    await application.initialize()
+    await application.start()
+
+    users = itertools.cycle(telegram_ids)
+    commands = itertools.cycle(COMMANDS)
+    sent_before = api.sent
+    started = time.perf_counter()
+    for update_id in range(1, updates + 1):
+        update = Update.de_json(update_data(update_id, next(users), next(commands)), application.bot)
+        queued_at[update_id] = time.perf_counter()
+        await application.update_queue.put(update)
+    await done.wait()
+    elapsed = time.perf_counter() - started
+
+    await application.stop()
+    await application.shutdown()
+
+    latencies.sort()
+    return {
+        'rate': round(updates / elapsed, 1),
+        'seconds': round(elapsed, 2),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+        'replies': api.sent - sent_before
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='اختبار حمل لمعالجات البوت')
+    parser.add_argument('--updates', type=int, default=3000)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--concurrency', default='1,64', help='درجات التوازي مفصولة بفواصل')
+    parser.add_argument('--latency', type=float, default=0.05, help='زمن استجابة الخادم الوهمي بالثواني')
+    parser.add_argument('--rate', type=float, default=None, help='سقف المعدل العام رسالة/ثانية (افتراضياً بلا سقف)')
+    args = parser.parse_args()
+
+    from app import create_app
+    with tempfile.TemporaryDirectory() as directory:
+        # التطبيق الأول يُسجَّل كنسخة العملية المشتركة التي يستخدمها bot.py
+        app = create_app(make_config(f"sqlite:///{os.path.join(directory, 'benchmark.db')}"))
+        with app.app_context():
+            telegram_ids = seed(args.users)
+
+        use_scheduler(args.rate)
+        api = FakeBotAPI(args.latency).start()
+        try:
+            results = {
+                concurrency: asyncio.run(replay(api, telegram_ids, args.updates, concurrency))
+                for concurrency in [int(value) for value in args.concurrency.split(',')]
+            }
+        finally:
+            api.stop()
+
+    print(f"\n{args.updates} تحديث من {args.users} مستخدم، زمن استجابة الخادم {args.latency * 1000:.0f}ms")
+    for concurrency, result in results.items():
+        print(f"توازي {concurrency:>3}: {result['rate']:>7} تحديث/ثانية  {result['seconds']}s  "
+              f"p50={result['p50_ms']}ms  p95={result['p95_ms']}ms  ردود={result['replies']}")
+
+
+if __name__ == '__main__':
+    main()
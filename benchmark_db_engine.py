@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+سكريبت قياس أثر إعدادات اتصال SQLite (db_engine) على القراءة والكتابة المتزامنتين
+خيوط قراءة تستعلم عن إشعارات مستخدم عشوائي، وخيوط كتابة تضيف إشعاراً وتحدّث عداد غير المقروء في معاملة واحدة
+- default: الإعدادات القديمة (journal_mode=DELETE، synchronous=FULL، مهلة sqlite3 الافتراضية)
+- profile: _apply_sqlite_pragmas من app/utils/db_engine.py كما يطبقها create_app على كل اتصال
+يُطبع عدد القراءات والكتابات في الثانية وأخطاء "database is locked" في الثانية
+الاستخدام:
+    python benchmark_db_engine.py
+    python benchmark_db_engine.py --readers 6 --writers 3 --seconds 3 --profile both
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+USERS = 1000
+
+
+def build_database(path, rows):
+    connection = sqlite3.connect(path)
+    connection.executescript('''
+        CREATE TABLE notifications (id INTEGER PRIMARY KEY, user_id INTEGER, title TEXT, created REAL);
+        CREATE INDEX idx_notifications_user ON notifications (user_id, created);
+        CREATE TABLE counters (user_id INTEGER PRIMARY KEY, unread INTEGER NOT NULL DEFAULT 0);
+    ''')
+    connection.executemany('INSERT INTO counters (user_id, unread) VALUES (?, 0)', [(user,) for user in range(USERS)])
+    connection.executemany(
+        'INSERT INTO notifications (user_id, title, created) VALUES (?, ?, ?)',
+        [(random.randrange(USERS), f'notification {index}', time.time()) for index in range(rows)]
+    )
+    connection.commit()
+    connection.close()
+
+
+def connect(path, profile):
+    if profile == 'default':
+        return sqlite3.connect(path, check_same_thread=False)
+
+    from app.utils.db_engine import SQLITE_BUSY_TIMEOUT_MS, _apply_sqlite_pragmas
+    connection = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    _apply_sqlite_pragmas(connection, None)
+    return connection
+
+
+class Worker(threading.Thread):
+    def __init__(self, path, profile, write, stop):
+        super().__init__(daemon=True)
+        self.path = path
+        self.profile = profile
+        self.write = write
+        self.stop = stop
+        self.done = 0
+        self.errors = 0
+
+    def operation(self, connection):
+        user = random.randrange(USERS)
+        if self.write:
+            connection.execute('INSERT INTO notifications (user_id, title, created) VALUES (?, ?, ?)',
+                               (user, 'new', time.time()))
+            connection.execute('UPDATE counters SET unread = unread + 1 WHERE user_id = ?', (user,))
+            connection.commit()
+        else:
+            connection.execute('SELECT id, title FROM notifications WHERE user_id = ? '
+                               'ORDER BY created DESC LIMIT 20', (user,)).fetchall()
+            connection.execute('SELECT unread FROM counters WHERE user_id = ?', (user,)).fetchone()
+
+    def run(self):
+        connection = connect(self.path, self.profile)
+        while not self.stop.is_set():
+            try:
+                self.operation(connection)
+                self.done += 1
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) and 'busy' not in str(e):
+                    raise
+                self.errors += 1
+                connection.rollback()
+        connection.close()
+
+
+def benchmark(profile, args, directory):
+    path = os.path.join(directory, f'{profile}.db')
+    build_database(path, args.rows)
+    if profile != 'default':
+        connect(path, profile).close()
+
+    stop = threading.Event()
+    workers = [Worker(path, profile, False, stop) for _ in range(args.readers)]
+    workers += [Worker(path, profile, True, stop) for _ in range(args.writers)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    readers = [worker for worker in workers if not worker.write]
+    writers = [worker for worker in workers if worker.write]
+    return {
+        'reads': round(sum(worker.done for worker in readers) / elapsed),
+        'writes': round(sum(worker.done for worker in writers) / elapsed),
+        'errors': round(sum(worker.errors for worker in workers) / elapsed, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس إعدادات اتصال SQLite تحت قراءة وكتابة متزامنتين')
+    parser.add_argument('--profile', choices=['default', 'profile', 'both'], default='both')
+    parser.add_argument('--readers', type=int, default=6)
+    parser.add_argument('--writers', type=int, default=3)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    profiles = ['default', 'profile'] if args.profile == 'both' else [args.profile]
+    with tempfile.TemporaryDirectory() as directory:
+        results = {profile: benchmark(profile, args, directory) for profile in profiles}
+
+    print(f"\n{args.readers} خيوط قراءة و{args.writers} خيوط كتابة لمدة {args.seconds:g}s")
+    for profile, result in results.items():
+        print(f"{profile:>8}: قراءات/ثانية={result['reads']}  كتابات/ثانية={result['writes']}  "
+              f"أخطاء قفل/ثانية={result['errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+سكريبت قياس إنتاجية إرسال الإشعارات على تيليجرام مقابل خادم Bot API وهمي محلي
+- fanout: fan_out كما يستخدمه deliver_notification (عميل مشترك، إرسال متزامن محدود)
+- sequential: السلوك القديم، asyncio.run() وBot جديد لكل مستلم
+الخادم الوهمي يضيف زمن استجابة ثابتاً (--latency) يحاكي الشبكة إلى api.telegram.org
+منسق الإرسال يُشغَّل افتراضياً بلا سقف معدل لقياس المحرك نفسه؛ --rate 25 يقيس السلوك الفعلي المقيّد بحد تيليجرام
+الاستخدام:
+    python benchmark_fanout.py
+    python benchmark_fanout.py --recipients 1000 --latency 0.08 --mode fanout
+    python benchmark_fanout.py --rate 25
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+TOKEN = '123456:benchmark'
+
+
+class FakeBotAPI:
+    """
+    خادم Bot API وهمي يجيب getMe وsendMessage بعد تأخير ثابت، ويعدّ الرسائل المستلمة والاتصالات المفتوحة
+    connect_latency: تأخير إضافي عند فتح كل اتصال يحاكي مصافحة TCP وTLS
+    """
+
+    def __init__(self, latency=0.05, port=0, connect_latency=0.0):
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.sent = 0
+        self.connections = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}/bot'
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _result(self, method, params):
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'benchmark', 'username': 'benchmark_bot'}
+        if method == 'sendMessage':
+            with self._lock:
+                self.sent += 1
+            return {
+                'message_id': next(self._ids),
+                'date': int(time.time()),
+                'chat': {'id': int(params.get('chat_id', 1)), 'type': 'private'},
+                'text': params.get('text', '')
+            }
+        return True
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                with api._lock:
+                    api.connections += 1
+                time.sleep(api.connect_latency)
+                super().setup()
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                params = {}
+                if 'json' in (self.headers.get('Content-Type') or ''):
+                    params = json.loads(body or b'{}')
+                elif body:
+                    params = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+                time.sleep(api.latency)
+
+                method = self.path.rsplit('/', 1)[-1]
+                payload = json.dumps({'ok': True, 'result': api._result(method, params)}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def use_scheduler(rate):
+    """استبدال منسق الإرسال في العملية بمنسق بالمعدل المطلوب"""
+    from app.utils import telegram_scheduler
+    rate = rate or 1e9
+    telegram_scheduler._scheduler = telegram_scheduler.OutboundScheduler(
+        global_rate=rate, global_burst=rate, chat_rate=rate, chat_burst=rate
+    )
+
+
+def run_fanout(api, messages):
+    from app.utils.telegram_fanout import fan_out
+    return len(asyncio.run(fan_out(TOKEN, messages, base_url=api.base_url)))
+
+
+def run_sequential(api, messages):
+    from telegram import Bot
+
+    async def send_one(chat_id, text):
+        async with Bot(TOKEN, base_url=api.base_url) as bot:
+            return await bot.send_message(chat_id=chat_id, text=text)
+
+    delivered = 0
+    for _, chat_id, text in messages:
+        if asyncio.run(send_one(chat_id, text)):
+            delivered += 1
+    return delivered
+
+
+def benchmark(mode, api, recipients):
+    messages = [(index, 100000 + index, f'🔔 *تنبيه*\n\nرسالة رقم {index}') for index in range(recipients)]
+    run = run_fanout if mode == 'fanout' else run_sequential
+    sent_before = api.sent
+    started = time.perf_counter()
+    delivered = run(api, messages)
+    elapsed = time.perf_counter() - started
+    return {
+        'delivered': delivered,
+        'requests': api.sent - sent_before,
+        'seconds': round(elapsed, 2),
+        'rate': round(delivered / elapsed, 1) if elapsed else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس إنتاجية إرسال الإشعارات على تيليجرام')
+    parser.add_argument('--mode', choices=['fanout', 'sequential', 'both'], default='both')
+    parser.add_argument('--recipients', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.05, help='زمن استجابة الخادم الوهمي بالثواني')
+    parser.add_argument('--rate', type=float, default=None, help='سقف المعدل العام رسالة/ثانية (افتراضياً بلا سقف)')
+    args = parser.parse_args()
+
+    use_scheduler(args.rate)
+    api = FakeBotAPI(args.latency).start()
+    try:
+        # تسخين: تهيئة العميل المشترك (getMe) قبل القياس
+        run_fanout(api, [(0, 1, 'warmup')])
+        modes = ['sequential', 'fanout'] if args.mode == 'both' else [args.mode]
+        results = {mode: benchmark(mode, api, args.recipients) for mode in modes}
+    finally:
+        api.stop()
+
+    rate = f'{args.rate:g} رسالة/ثانية' if args.rate else 'بلا سقف'
+    print(f"\n{args.recipients} مستلم، زمن استجابة {args.latency * 1000:.0f}ms، المعدل العام: {rate}")
+    for mode, result in results.items():
+        print(f"{mode:>10}: {result['rate']:>8} رسالة/ثانية  {result['seconds']}s  "
+              f"سُلّمت={result['delivered']}  طلبات الخادم={result['requests']}")
+
+    if len(results) == 2 and results['sequential']['rate']:
+        print(f"\nfanout / sequential = {results['fanout']['rate'] / results['sequential']['rate']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+سكريبت قياس إنشاء إشعار لكل مستخدمي المعهد على قاعدة SQLite مؤقتة
+- bulk: create_notification كما هو (INSERT ... SELECT للمستلمين وتحديث العدادات بعبارة واحدة)
+- legacy: السلوك القديم، تحميل كل مستخدم ثم إضافة كائن NotificationRecipient لكل واحد
+يُطبع الزمن وعدد عبارات SQL لكل إشعار
+الاستخدام:
+    python benchmark_notifications.py
+    python benchmark_notifications.py --users 10000 --rounds 5
+"""
+import argparse
+import os
+import tempfile
+import time
+from sqlalchemy import insert
+from benchmark_worker_context import make_config
+
+
+def seed_users(count):
+    from app import db
+    from app.models import User
+    db.session.execute(insert(User), [
+        {'phone_number': f'09{index:08d}', 'full_name': f'user {index}', 'role': 'student', 'password_hash': '-'}
+        for index in range(count)
+    ])
+    db.session.add(User(phone_number='0800000000', full_name='admin', role='admin', password_hash='-'))
+    db.session.commit()
+    return User.query.filter_by(role='admin').first().id
+
+
+def create_legacy(admin_id):
+    from app import db
+    from app.models import Notification, NotificationRecipient
+    from app.utils import unread_counters
+    from app.utils.notifications import get_notification_recipients
+
+    notification = Notification(title='تنبيه', message='رسالة', notification_type='general',
+                                target_type='all', created_by=admin_id, send_telegram=False)
+    db.session.add(notification)
+    db.session.flush()
+    for user in get_notification_recipients('all'):
+        db.session.add(NotificationRecipient(notification_id=notification.id, user_id=user.id))
+    db.session.flush()
+    unread_counters.notification_added(notification.id)
+    db.session.commit()
+
+
+def create_bulk(admin_id):
+    from app.utils.notifications import create_notification
+    create_notification('تنبيه', 'رسالة', 'general', admin_id, target_type='all', send_telegram=False)
+
+
+def benchmark(mode, admin_id, rounds):
+    from app import db
+    from app.utils.query_profiles import count_statements
+
+    create = create_bulk if mode == 'bulk' else create_legacy
+    timings, statements = [], []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        with count_statements() as executed:
+            create(admin_id)
+        timings.append(time.perf_counter() - started)
+        statements.append(len(executed))
+        db.session.remove()
+    return {
+        'ms': round(sorted(timings)[len(timings) // 2] * 1000, 1),
+        'statements': max(statements)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس إنشاء إشعار لكل المستخدمين')
+    parser.add_argument('--mode', choices=['legacy', 'bulk', 'both'], default='both')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    from app import create_app
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(make_config(f"sqlite:///{os.path.join(directory, 'benchmark.db')}"))
+        with app.app_context():
+            admin_id = seed_users(args.users)
+            modes = ['legacy', 'bulk'] if args.mode == 'both' else [args.mode]
+            results = {mode: benchmark(mode, admin_id, args.rounds) for mode in modes}
+
+    print(f"\nإشعار إلى {args.users} مستخدم (الوسيط من {args.rounds} تشغيلات)")
+    for mode, result in results.items():
+        print(f"{mode:>7}: {result['ms']:>8}ms  عبارات SQL={result['statements']}")
+
+    if len(results) == 2 and results['bulk']['ms']:
+        print(f"\nlegacy / bulk = {results['legacy']['ms'] / results['bulk']['ms']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+اختبار حمل لبث الإشعارات (SSE): آلاف الاتصالات الخاملة المفتوحة على gunicorn كما يشغّله serve.py
+- تُنشأ قاعدة SQLite مؤقتة فيها --connections طالب، ولكل طالب كوكي جلسة موقّعة
+- يُفتح اتصال /student/api/notifications/stream لكل طالب ويُنتظر حدث unread الأول
+- تبقى الاتصالات خاملة --idle ثانية يُقاس خلالها استهلاك المعالج والذاكرة لعمليات الخادم وزمن /healthz
+- يُنشأ إشعار لكل المستخدمين من عملية أخرى (هذا السكريبت) ويُقاس زمن وصوله لكل اتصال عبر خيط المراقبة
+الاستخدام:
+    python benchmark_stream.py
+    python benchmark_stream.py --connections 1000 --idle 30 --workers 4 --threads 256
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import tempfile
+import time
+from benchmark_web import wait_until_ready
+from benchmark_worker_context import make_config
+
+STREAM_PATH = '/student/api/notifications/stream'
+
+
+def server_app():
+    """التطبيق الذي تشغّله عمليات gunicorn على القاعدة المؤقتة"""
+    from app import create_app
+    return create_app(make_config(os.environ['BENCHMARK_STREAM_DATABASE_URI']))
+
+
+def seed(app, count):
+    """طلاب ومدير؛ تُرجع (معرّف المدير، كوكي جلسة لكل طالب)"""
+    from sqlalchemy import insert
+    from app import db
+    from app.models import User
+
+    db.session.execute(insert(User), [
+        {'phone_number': f'09{index:08d}', 'full_name': f'student {index}', 'role': 'student', 'password_hash': '-'}
+        for index in range(count)
+    ])
+    admin = User(phone_number='0800000000', full_name='admin', role='admin', password_hash='-')
+    db.session.add(admin)
+    db.session.commit()
+
+    serializer = app.session_interface.get_signing_serializer(app)
+    cookies = [
+        serializer.dumps({'_user_id': user.get_id(), '_fresh': True})
+        for user in User.query.filter_by(role='student').order_by(User.id)
+    ]
+    return admin.id, cookies
+
+
+def server_pids(master):
+    """عملية gunicorn الرئيسية وعمّالها"""
+    pids = [master]
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as stat:
+                if int(stat.read().rsplit(')', 1)[1].split()[1]) == master:
+                    pids.append(int(name))
+        except (OSError, IndexError, ValueError):
+            pass
+    return pids
+
+
+def server_usage(pids):
+    """(ثواني المعالج، الذاكرة المقيمة بالميغابايت) لمجموع العمليات"""
+    cpu, rss = 0.0, 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat') as stat:
+                fields = stat.read().rsplit(')', 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+            with open(f'/proc/{pid}/statm') as statm:
+                rss += int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            pass
+    return cpu, rss / 1024 / 1024
+
+
+class Stream:
+    def __init__(self):
+        self.status = None
+        self.connected = None
+        self.events = []
+
+
+async def open_stream(port, cookie, stream):
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write((f'GET {STREAM_PATH} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n'
+                  f'Cookie: session={cookie}\r\n\r\n').encode())
+    await writer.drain()
+    try:
+        stream.status = (await reader.readline()).decode().split(' ')[1]
+        if stream.status != '200':
+            return
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+
+        event = None
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            line = line.strip()
+            if line.startswith(b'event: '):
+                event = line[7:]
+            elif line.startswith(b'data: ') and event == b'unread':
+                if stream.connected is None:
+                    stream.connected = time.perf_counter() - started
+                stream.events.append((time.perf_counter(), int(line[6:])))
+    finally:
+        writer.close()
+
+
+async def healthz(port, timeout=10):
+    """(الحالة، الزمن)؛ الطلب الذي لا يُجاب خلال timeout يُحسب خطأ"""
+    started = time.perf_counter()
+
+    async def request():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            writer.write(b'GET /healthz HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n')
+            await writer.drain()
+            status = (await reader.readline()).decode().split(' ')[1]
+            await reader.read()
+            return status
+        finally:
+            writer.close()
+
+    try:
+        status = await asyncio.wait_for(request(), timeout)
+    except asyncio.TimeoutError:
+        status = 'timeout'
+    return status, time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return round(values[min(int(len(values) * fraction), len(values) - 1)] * 1000, 1) if values else None
+
+
+async def run(args, port, pids, push):
+    streams = [Stream() for _ in args.cookies]
+    tasks = [asyncio.create_task(open_stream(port, cookie, stream)) for cookie, stream in zip(args.cookies, streams)]
+
+    deadline = time.monotonic() + args.connect_timeout
+    while time.monotonic() < deadline and any(stream.connected is None and stream.status in (None, '200')
+                                              for stream in streams):
+        await asyncio.sleep(0.1)
+    connected = [stream for stream in streams if stream.connected is not None]
+
+    cpu_before, _ = server_usage(pids)
+    health = []
+    idle_until = time.monotonic() + args.idle
+    while time.monotonic() < idle_until:
+        health.append(await healthz(port))
+        await asyncio.sleep(0.5)
+    cpu_after, rss = server_usage(pids)
+
+    pushed_at = time.perf_counter()
+    await asyncio.get_running_loop().run_in_executor(None, push)
+    delivery_deadline = time.monotonic() + args.poll_seconds * 3 + 5
+    while time.monotonic() < delivery_deadline and any(
+            not any(at >= pushed_at for at, _ in stream.events) for stream in connected):
+        await asyncio.sleep(0.05)
+    delivery = [next(at for at, _ in stream.events if at >= pushed_at) - pushed_at
+                for stream in connected if any(at >= pushed_at for at, _ in stream.events)]
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {
+        'connected': len(connected),
+        'rejected': sum(1 for stream in streams if stream.status not in (None, '200')),
+        'connect_p50': percentile([stream.connected for stream in connected], 0.5),
+        'connect_p95': percentile([stream.connected for stream in connected], 0.95),
+        'idle_cpu_percent': round((cpu_after - cpu_before) / args.idle * 100, 1),
+        'server_rss_mb': round(rss),
+        'healthz_p50': percentile([seconds for _, seconds in health], 0.5),
+        'healthz_max': percentile([seconds for _, seconds in health], 1.0),
+        'healthz_errors': sum(1 for status, _ in health if status != '200'),
+        'delivered': len(delivery),
+        'delivery_p50': percentile(delivery, 0.5),
+        'delivery_max': percentile(delivery, 1.0)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='اختبار حمل لاتصالات بث الإشعارات الخاملة')
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--idle', type=float, default=20, help='مدة بقاء الاتصالات خاملة بالثواني')
+    parser.add_argument('--workers', type=int, default=None, help='افتراضياً WEB_WORKERS من serve.py')
+    parser.add_argument('--threads', type=int, default=None, help='افتراضياً WEB_THREADS من serve.py')
+    parser.add_argument('--poll-seconds', type=float, default=2, help='NOTIFICATION_STREAM_POLL_SECONDS للخادم')
+    parser.add_argument('--connect-timeout', type=float, default=60)
+    parser.add_argument('--port', type=int, default=5093)
+    args = parser.parse_args()
+
+    import serve
+    from app import create_app
+    from app.utils.notifications import create_notification
+    workers = args.workers or serve.WEB_WORKERS
+    threads = args.threads or serve.WEB_THREADS
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_uri = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        app = create_app(make_config(database_uri))
+        with app.app_context():
+            admin_id, args.cookies = seed(app, args.connections)
+
+        def push():
+            with app.app_context():
+                create_notification('تنبيه', 'رسالة', 'general', admin_id, target_type='all', send_telegram=False)
+
+        environment = dict(os.environ, **serve.web_env(threads), BENCHMARK_STREAM_DATABASE_URI=database_uri,
+                           NOTIFICATION_STREAM_POLL_SECONDS=str(args.poll_seconds))
+        server = subprocess.Popen(
+            serve.web_command(f'127.0.0.1:{args.port}', workers, threads)
+            + ['--log-level', 'warning', '--graceful-timeout', '5', 'benchmark_stream:server_app()'],
+            env=environment
+        )
+        try:
+            wait_until_ready(args.port)
+            result = asyncio.run(run(args, args.port, server_pids(server.pid), push))
+        finally:
+            # خيوط البث لا تلاحظ إغلاق الاتصال إلا عند الكتابة التالية، فلا يُنتظر الإيقاف الهادئ طويلاً
+            server.terminate()
+            try:
+                server.wait(30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+    print(f"\n{args.connections} اتصال SSE على gunicorn ({workers} عمال × {threads} خيط)، "
+          f"خمول {args.idle:g}s، مراقبة كل {args.poll_seconds:g}s")
+    print(f"متصل={result['connected']}  مرفوض={result['rejected']}  "
+          f"زمن الاتصال p50={result['connect_p50']}ms p95={result['connect_p95']}ms")
+    print(f"أثناء الخمول: معالج الخادم={result['idle_cpu_percent']}%  الذاكرة={result['server_rss_mb']}MB  "
+          f"/healthz p50={result['healthz_p50']}ms الأقصى={result['healthz_max']}ms أخطاء={result['healthz_errors']}")
+    print(f"إشعار من عملية أخرى: وصل إلى {result['delivered']}/{result['connected']}  "
+          f"p50={result['delivery_p50']}ms  الأقصى={result['delivery_max']}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+سكريبت قياس كلفة الإرسال المفرد على تيليجرام (إشعار مستخدم، تنبيه نموذج التواصل، رفع نسخة احتياطية)
+مقابل خادم Bot API وهمي محلي
+- per_call: السلوك القديم، Bot جديد لكل رسالة (initialize أي getMe، ثم إغلاق الاتصال)
+- shared: TelegramClientRegistry، عميل واحد مهيأ واتصالات keep-alive مفتوحة بين الرسائل
+--connect-latency يحاكي مصافحة TCP وTLS التي يدفعها كل اتصال جديد إلى api.telegram.org
+الاستخدام:
+    python benchmark_telegram_client.py
+    python benchmark_telegram_client.py --messages 200 --latency 0.08 --connect-latency 0.15
+"""
+import argparse
+import asyncio
+import time
+from benchmark_fanout import FakeBotAPI, TOKEN
+
+
+def send_per_call(api, chat_id, text):
+    from telegram import Bot
+
+    async def send():
+        async with Bot(TOKEN, base_url=api.base_url) as bot:
+            return await bot.send_message(chat_id=chat_id, text=text)
+
+    return asyncio.run(send())
+
+
+def send_shared(api, chat_id, text):
+    from app.utils.telegram_client import TelegramClientRegistry, _send_message
+    return TelegramClientRegistry.run(TOKEN, _send_message, chat_id, text, base_url=api.base_url)
+
+
+def benchmark(mode, api, messages):
+    send = send_shared if mode == 'shared' else send_per_call
+    connections_before = api.connections
+    timings = []
+    for index in range(messages):
+        started = time.perf_counter()
+        send(api, 100000 + index, f'رسالة رقم {index}')
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'p50_ms': round(timings[len(timings) // 2] * 1000, 1),
+        'p95_ms': round(timings[int(len(timings) * 0.95)] * 1000, 1),
+        'seconds': round(sum(timings), 2),
+        'connections': api.connections - connections_before
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس كلفة الإرسال المفرد على تيليجرام')
+    parser.add_argument('--mode', choices=['per_call', 'shared', 'both'], default='both')
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05, help='زمن استجابة الطلب بالثواني')
+    parser.add_argument('--connect-latency', type=float, default=0.1, help='زمن فتح اتصال جديد بالثواني')
+    args = parser.parse_args()
+
+    api = FakeBotAPI(args.latency, connect_latency=args.connect_latency).start()
+    try:
+        # تسخين العميل المشترك حتى لا تُحتسب تهيئته الأولى (مرة واحدة لكل عملية)
+        send_shared(api, 1, 'warmup')
+        modes = ['per_call', 'shared'] if args.mode == 'both' else [args.mode]
+        results = {mode: benchmark(mode, api, args.messages) for mode in modes}
+    finally:
+        api.stop()
+
+    print(f"\n{args.messages} رسالة متتالية، زمن الطلب {args.latency * 1000:.0f}ms، "
+          f"فتح الاتصال {args.connect_latency * 1000:.0f}ms")
+    for mode, result in results.items():
+        print(f"{mode:>8}: p50={result['p50_ms']}ms  p95={result['p95_ms']}ms  "
+              f"المجموع={result['seconds']}s  اتصالات جديدة={result['connections']}")
+
+    if len(results) == 2 and results['shared']['seconds']:
+        print(f"\nper_call / shared = {results['per_call']['seconds'] / results['shared']['seconds']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+سكريبت قياس إنتاجية طلبات الويب: خادم التطوير كما يشغّله runner.py مقابل gunicorn كما يشغّله serve.py
+كل وضع يُشغَّل في عملية منفصلة على منفذ محلي، ثم تُرسل إليه طلبات متزامنة لمدة محددة
+ويُطبع عدد الطلبات في الثانية وزمن الاستجابة (p50 / p95) ونسبة الأخطاء
+الاستخدام:
+    python benchmark_web.py
+    python benchmark_web.py --mode serve --path /healthz --concurrency 64 --duration 20
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+
+RUNNER_COMMAND = (
+    "from app.utils.worker_context import get_worker_app; "
+    "get_worker_app().run(host='127.0.0.1', port={port}, debug=False, use_reloader=False)"
+)
+
+
+def server_command(mode, port):
+    if mode == 'runner':
+        # نفس خادم التطوير الذي يشغّله runner.run_flask
+        return [sys.executable, '-c', RUNNER_COMMAND.format(port=port)]
+
+    from serve import WEB_WORKERS, WEB_WORKER_CLASS, WEB_THREADS
+    return [
+        sys.executable, '-m', 'gunicorn',
+        '--workers', str(WEB_WORKERS),
+        '--worker-class', WEB_WORKER_CLASS,
+        '--threads', str(WEB_THREADS),
+        '--bind', f'127.0.0.1:{port}',
+        '--log-level', 'warning',
+        'main:app'
+    ]
+
+
+def wait_until_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/healthz')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f'Server on port {port} did not become ready')
+
+
+def _client(args):
+    """عملية عميل واحدة بعدة خيوط، كل خيط باتصال keep-alive خاص؛ تُرجع (أزمنة الاستجابة، الأخطاء)"""
+    port, path, threads, duration = args
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def run():
+        local = []
+        failed = 0
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+                    continue
+                local.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies, errors[0]
+
+
+def run_load(port, path, concurrency, duration, client_processes):
+    # العميل موزع على عدة عمليات حتى لا يكون GIL العميل نفسه هو السقف
+    per_process = max(1, concurrency // client_processes)
+    with multiprocessing.Pool(client_processes) as pool:
+        results = pool.map(_client, [(port, path, per_process, duration)] * client_processes)
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = sum(result[1] for result in results)
+    if not latencies:
+        return {'requests': 0, 'rps': 0.0, 'p50_ms': None, 'p95_ms': None, 'errors': errors}
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+        'errors': errors
+    }
+
+
+def benchmark(mode, args):
+    env = dict(os.environ, SCHEDULER_ENABLED='false', PROCESS_ROLE='web' if mode == 'serve' else 'all')
+    server = subprocess.Popen(server_command(mode, args.port), env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(args.port)
+        # تسخين: تحميل القوالب وفتح اتصالات قاعدة البيانات قبل القياس
+        run_load(args.port, args.path, args.concurrency, 2, args.client_processes)
+        return run_load(args.port, args.path, args.concurrency, args.duration, args.client_processes)
+    finally:
+        server.terminate()
+        try:
+            server.wait(15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس إنتاجية طلبات الويب حسب طريقة التشغيل')
+    parser.add_argument('--mode', choices=['runner', 'serve', 'both'], default='both')
+    parser.add_argument('--path', default='/', help='المسار المطلوب (افتراضياً الصفحة الرئيسية)')
+    parser.add_argument('--concurrency', type=int, default=32, help='عدد الاتصالات المتزامنة')
+    parser.add_argument('--duration', type=int, default=10, help='مدة القياس بالثواني')
+    parser.add_argument('--client-processes', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    modes = ['runner', 'serve'] if args.mode == 'both' else [args.mode]
+    results = {mode: benchmark(mode, args) for mode in modes}
+
+    print(f"\n{args.path} — {args.concurrency} اتصال متزامن لمدة {args.duration} ثانية")
+    for mode, result in results.items():
+        print(f"{mode:>7}: {result['rps']:>8} طلب/ثانية  p50={result['p50_ms']}ms  "
+              f"p95={result['p95_ms']}ms  أخطاء={result['errors']}  ({result['requests']} طلب)")
+
+    if len(results) == 2 and results['runner']['rps']:
+        print(f"\nserve.py / runner.py = {results['serve']['rps'] / results['runner']['rps']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
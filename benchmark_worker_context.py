@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+سكريبت قياس كلفة سياق التطبيق للمهام الخلفية: create_app() لكل مهمة (السلوك القديم)
+مقابل النسخة المشتركة عبر worker_app_context
+كل مهمة تقرأ الإعدادات وتنشئ إشعاراً لمستخدم واحد كما تفعل مهام المجدول، على قاعدة SQLite مؤقتة
+ويُطبع زمن المهمة (p50 / p95) ومجموع زمن التشغيل لكل وضع
+الاستخدام:
+    python benchmark_worker_context.py
+    python benchmark_worker_context.py --jobs 200 --mode shared
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def make_config(database_uri):
+    from config import Config
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_uri
+        SCHEDULER_ENABLED = False
+        TELEGRAM_BACKUP_ENABLED = False
+        AUTO_BACKUP_DEBOUNCE_SECONDS = 3600
+        AUTO_BACKUP_MAX_DELAY_SECONDS = 3600
+    return BenchmarkConfig
+
+
+def job():
+    from app.models import SiteSettings, User
+    from app.utils.notifications import create_notification
+
+    SiteSettings.query.first()
+    user = User.query.filter_by(role='admin').first()
+    create_notification('تذكير', 'رسالة', 'general', user.id,
+                        target_type='user', target_id=user.id, send_telegram=False)
+
+
+def run(mode, config, jobs):
+    from app import create_app, db
+    from app.utils.worker_context import worker_app_context
+
+    timings = []
+    for _ in range(jobs):
+        started = time.perf_counter()
+        if mode == 'create_app':
+            with create_app(config).app_context():
+                job()
+                db.session.remove()
+        else:
+            with worker_app_context():
+                job()
+                db.session.remove()
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس كلفة سياق التطبيق للمهام الخلفية')
+    parser.add_argument('--mode', choices=['create_app', 'shared', 'both'], default='both')
+    parser.add_argument('--jobs', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        config = make_config(f"sqlite:///{os.path.join(directory, 'benchmark.db')}")
+
+        from app import create_app
+        from app.utils.worker_context import register_app
+        from app import db
+        from app.models import User
+        # النسخة الأولى تنشئ المخطط وتُسجَّل كنسخة مشتركة للعملية
+        app = register_app(create_app(config))
+        with app.app_context():
+            db.session.add(User(phone_number='0900000000', full_name='admin', role='admin', password_hash='-'))
+            db.session.commit()
+
+        modes = ['create_app', 'shared'] if args.mode == 'both' else [args.mode]
+        results = {mode: run(mode, config, args.jobs) for mode in modes}
+
+    print(f"\n{args.jobs} مهمة لكل وضع")
+    for mode, timings in results.items():
+        p50 = timings[len(timings) // 2] * 1000
+        p95 = timings[int(len(timings) * 0.95)] * 1000
+        print(f"{mode:>10}: p50={p50:.1f}ms  p95={p95:.1f}ms  المجموع={sum(timings):.2f}s")
+
+    if len(results) == 2:
+        ratio = sum(results['create_app']) / sum(results['shared'])
+        print(f"\ncreate_app / shared = {ratio:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
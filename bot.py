@@ -1,7 +1,5 @@
-import asyncio
 import os
 import logging
-from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 from telegram.ext import (
     Application,
@@ -14,13 +12,15 @@ from telegram.ext import (
 )
 from telegram.constants import ParseMode
 
-from app import create_app, db
-from app.models import (
-    User, Student, Teacher, Course, Lesson, Grade, News, 
-    Enrollment, SiteSettings, BotSession, BotStatistics,
-    Notification, NotificationRecipient
-)
-from app.utils.helpers import damascus_now
+from app.models import SiteSettings
+from app.utils import bot_data, bot_catalog
+from app.utils.bot_data import run_db
+from app.utils.bot_sessions import get_session_cache
+from app.utils.bot_stats import get_bot_stats
+from app.utils.bot_updates import PerChatUpdateProcessor
+from app.utils.telegram_client import send_message
+from app.utils.telegram_scheduler import SchedulerRateLimiter
+from app.utils.worker_context import get_worker_app
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -28,70 +28,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-flask_app = create_app()
+flask_app = get_worker_app()
 
 LOGIN_PHONE, LOGIN_PASSWORD = range(2)
 
-def get_or_create_session(telegram_id, username=None, first_name=None, last_name=None):
-    with flask_app.app_context():
-        session = BotSession.query.filter_by(telegram_id=telegram_id).first()
-        if not session:
-            session = BotSession(
-                telegram_id=telegram_id,
-                username=username,
-                first_name=first_name,
-                last_name=last_name
-            )
-            db.session.add(session)
-            db.session.commit()
-        else:
-            session.last_activity = damascus_now()
-            session.username = username
-            session.first_name = first_name
-            session.last_name = last_name
-            db.session.commit()
-        return session
+CONCURRENT_UPDATES = int(os.environ.get('BOT_CONCURRENT_UPDATES', 64))
+
+LOGIN_REQUIRED_TEXT = "🔒 يجب تسجيل الدخول أولاً!\n\nاستخدم /login"
+LOGIN_REQUIRED_CALLBACK_TEXT = "🔒 يجب تسجيل الدخول أولاً!"
+
+async def get_or_create_session(telegram_id, username=None, first_name=None, last_name=None):
+    return await run_db(bot_data.get_or_create_session, telegram_id, username, first_name, last_name)
 
 def update_statistics(increment_received=True, increment_sent=False):
-    with flask_app.app_context():
-        today = damascus_now().date()
-        stats = BotStatistics.query.filter_by(date=today).first()
-        if not stats:
-            stats = BotStatistics(
-                date=today,
-                messages_received=0,
-                messages_sent=0,
-                total_users=0,
-                active_users_today=0
-            )
-            db.session.add(stats)
-        
-        if increment_received:
-            stats.messages_received += 1
-        if increment_sent:
-            stats.messages_sent += 1
-        
-        stats.total_users = BotSession.query.count()
-        stats.active_users_today = BotSession.query.filter(
-            BotSession.last_activity >= datetime.combine(today, datetime.min.time())
-        ).count()
-        
-        db.session.commit()
+    # العدادات تتراكم في الذاكرة وتُكتب في قاعدة البيانات دورياً
+    get_bot_stats().record(
+        received=1 if increment_received else 0,
+        sent=1 if increment_sent else 0
+    )
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
-    session = get_or_create_session(
+    await get_or_create_session(
         user.id,
         user.username,
         user.first_name,
         user.last_name
     )
     update_statistics()
-    
-    with flask_app.app_context():
-        settings = SiteSettings.query.first()
-        institute_name = settings.institute_name if settings else "معهد القاسم للعلوم واللغات"
-    
+
+    settings = await run_db(bot_data.get_bot_settings)
+    institute_name = settings['institute_name'] if settings else "معهد القاسم للعلوم واللغات"
+
     welcome_text = f"""
 🌟 مرحباً بك في {institute_name} 🌟
 
@@ -117,14 +85,14 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 /teachers - المعلمون
 /help - المساعدة
 """
-    
+
     keyboard = [
         [KeyboardButton("🔐 تسجيل الدخول"), KeyboardButton("📚 الدورات")],
         [KeyboardButton("📰 الأخبار"), KeyboardButton("👨‍🏫 المعلمون")],
         [KeyboardButton("ℹ️ المساعدة"), KeyboardButton("📞 التواصل")]
     ]
     reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    
+
     await update.message.reply_text(welcome_text, reply_markup=reply_markup)
     update_statistics(increment_sent=True)
 
@@ -166,20 +134,18 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
 async def login_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user = update.effective_user
-    session = get_or_create_session(user.id, user.username, user.first_name, user.last_name)
+    await get_or_create_session(user.id, user.username, user.first_name, user.last_name)
     update_statistics()
-    
-    with flask_app.app_context():
-        session = BotSession.query.filter_by(telegram_id=user.id).first()
-        if session and session.is_authenticated:
-            user_obj = User.query.get(session.user_id)
-            await update.message.reply_text(
-                f"أنت مسجل دخول بالفعل كـ {user_obj.full_name} ({user_obj.role})\n\n"
-                "استخدم /logout لتسجيل الخروج أولاً."
-            )
-            update_statistics(increment_sent=True)
-            return ConversationHandler.END
-    
+
+    user_data = await run_db(bot_data.get_session_user, user.id)
+    if user_data:
+        await update.message.reply_text(
+            f"أنت مسجل دخول بالفعل كـ {user_data['full_name']} ({user_data['role']})\n\n"
+            "استخدم /logout لتسجيل الخروج أولاً."
+        )
+        update_statistics(increment_sent=True)
+        return ConversationHandler.END
+
     await update.message.reply_text(
         "🔐 *تسجيل الدخول*\n\n"
         "📱 الرجاء إدخال رقم جوالك:\n"
@@ -194,7 +160,7 @@ async def login_phone(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     phone = update.message.text.strip()
     context.user_data['login_phone'] = phone
     update_statistics()
-    
+
     await update.message.reply_text(
         "🔑 الرجاء إدخال كلمة المرور:\n\n"
         "أو /cancel للإلغاء"
@@ -207,68 +173,64 @@ async def login_password(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     phone = context.user_data.get('login_phone')
     user_tg = update.effective_user
     update_statistics()
-    
+
     await update.message.delete()
-    
-    with flask_app.app_context():
-        user = User.query.filter_by(phone_number=phone).first()
-        
-        if user and user.check_password(password):
-            if not user.is_active:
-                await update.message.reply_text(
-                    "❌ حسابك غير نشط. يرجى التواصل مع الإدارة."
-                )
-                update_statistics(increment_sent=True)
-                return ConversationHandler.END
-            
-            session = BotSession.query.filter_by(telegram_id=user_tg.id).first()
-            session.authenticate(user)
-            
-            role_emoji = {
-                'admin': '👑',
-                'assistant': '🛡️',
-                'teacher': '👨‍🏫',
-                'student': '👨‍🎓'
-            }
-            
-            # تخصيص الأزرار حسب دور المستخدم
-            if user.role == 'student':
-                keyboard = [
-                    [KeyboardButton("📊 لوحة التحكم"), KeyboardButton("📚 دوراتي")],
-                    [KeyboardButton("📖 دروسي"), KeyboardButton("📝 درجاتي")],
-                    [KeyboardButton("🔔 الإشعارات"), KeyboardButton("📰 الأخبار")],
-                    [KeyboardButton("🚪 تسجيل الخروج")]
-                ]
-            elif user.role == 'teacher':
-                keyboard = [
-                    [KeyboardButton("📊 لوحة التحكم"), KeyboardButton("📚 دوراتي")],
-                    [KeyboardButton("📖 دروسي"), KeyboardButton("👥 طلابي")],
-                    [KeyboardButton("🔔 الإشعارات"), KeyboardButton("📰 الأخبار")],
-                    [KeyboardButton("🚪 تسجيل الخروج")]
-                ]
-            else:  # admin or assistant
-                keyboard = [
-                    [KeyboardButton("📊 لوحة التحكم"), KeyboardButton("🔔 الإشعارات")],
-                    [KeyboardButton("📰 الأخبار"), KeyboardButton("🚪 تسجيل الخروج")]
-                ]
-            
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-            
-            await update.message.reply_text(
-                f"✅ تم تسجيل الدخول بنجاح!\n\n"
-                f"{role_emoji.get(user.role, '👤')} مرحباً {user.full_name}\n"
-                f"📋 الدور: {user.role}\n\n"
-                f"استخدم القائمة أدناه أو /dashboard للبدء",
-                reply_markup=reply_markup
-            )
-            update_statistics(increment_sent=True)
-        else:
-            await update.message.reply_text(
-                "❌ رقم الجوال أو كلمة المرور غير صحيحة.\n\n"
-                "حاول مرة أخرى باستخدام /login"
-            )
-            update_statistics(increment_sent=True)
-    
+
+    status, user = await run_db(bot_data.authenticate, user_tg.id, phone, password)
+
+    if status == 'inactive':
+        await update.message.reply_text(
+            "❌ حسابك غير نشط. يرجى التواصل مع الإدارة."
+        )
+        update_statistics(increment_sent=True)
+        return ConversationHandler.END
+
+    if status == 'ok':
+        role_emoji = {
+            'admin': '👑',
+            'assistant': '🛡️',
+            'teacher': '👨‍🏫',
+            'student': '👨‍🎓'
+        }
+
+        # تخصيص الأزرار حسب دور المستخدم
+        if user['role'] == 'student':
+            keyboard = [
+                [KeyboardButton("📊 لوحة التحكم"), KeyboardButton("📚 دوراتي")],
+                [KeyboardButton("📖 دروسي"), KeyboardButton("📝 درجاتي")],
+                [KeyboardButton("🔔 الإشعارات"), KeyboardButton("📰 الأخبار")],
+                [KeyboardButton("🚪 تسجيل الخروج")]
+            ]
+        elif user['role'] == 'teacher':
+            keyboard = [
+                [KeyboardButton("📊 لوحة التحكم"), KeyboardButton("📚 دوراتي")],
+                [KeyboardButton("📖 دروسي"), KeyboardButton("👥 طلابي")],
+                [KeyboardButton("🔔 الإشعارات"), KeyboardButton("📰 الأخبار")],
+                [KeyboardButton("🚪 تسجيل الخروج")]
+            ]
+        else:  # admin or assistant
+            keyboard = [
+                [KeyboardButton("📊 لوحة التحكم"), KeyboardButton("🔔 الإشعارات")],
+                [KeyboardButton("📰 الأخبار"), KeyboardButton("🚪 تسجيل الخروج")]
+            ]
+
+        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+        await update.message.reply_text(
+            f"✅ تم تسجيل الدخول بنجاح!\n\n"
+            f"{role_emoji.get(user['role'], '👤')} مرحباً {user['full_name']}\n"
+            f"📋 الدور: {user['role']}\n\n"
+            f"استخدم القائمة أدناه أو /dashboard للبدء",
+            reply_markup=reply_markup
+        )
+        update_statistics(increment_sent=True)
+    else:
+        await update.message.reply_text(
+            "❌ رقم الجوال أو كلمة المرور غير صحيحة.\n\n"
+            "حاول مرة أخرى باستخدام /login"
+        )
+        update_statistics(increment_sent=True)
+
     return ConversationHandler.END
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -282,122 +244,101 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 async def logout(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
     update_statistics()
-    
-    with flask_app.app_context():
-        session = BotSession.query.filter_by(telegram_id=user.id).first()
-        if session and session.is_authenticated:
-            session.logout()
-            
-            keyboard = [
-                [KeyboardButton("🔐 تسجيل الدخول"), KeyboardButton("📚 الدورات")],
-                [KeyboardButton("📰 الأخبار"), KeyboardButton("👨‍🏫 المعلمون")]
-            ]
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-            
-            await update.message.reply_text(
-                "👋 تم تسجيل الخروج بنجاح!\n\n"
-                "يمكنك تسجيل الدخول مرة أخرى باستخدام /login",
-                reply_markup=reply_markup
-            )
-            update_statistics(increment_sent=True)
-        else:
-            await update.message.reply_text("أنت لست مسجل دخول!")
-            update_statistics(increment_sent=True)
+
+    if await run_db(bot_data.logout, user.id):
+        keyboard = [
+            [KeyboardButton("🔐 تسجيل الدخول"), KeyboardButton("📚 الدورات")],
+            [KeyboardButton("📰 الأخبار"), KeyboardButton("👨‍🏫 المعلمون")]
+        ]
+        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+        await update.message.reply_text(
+            "👋 تم تسجيل الخروج بنجاح!\n\n"
+            "يمكنك تسجيل الدخول مرة أخرى باستخدام /login",
+            reply_markup=reply_markup
+        )
+        update_statistics(increment_sent=True)
+    else:
+        await update.message.reply_text("أنت لست مسجل دخول!")
+        update_statistics(increment_sent=True)
 
 async def dashboard(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
     update_statistics()
-    
-    with flask_app.app_context():
-        session = BotSession.query.filter_by(telegram_id=user.id).first()
-        if not session or not session.is_authenticated:
-            await update.message.reply_text(
-                "🔒 يجب تسجيل الدخول أولاً!\n\nاستخدم /login"
-            )
-            update_statistics(increment_sent=True)
-            return
-        
-        user_obj = User.query.get(session.user_id)
-        
-        if user_obj.role == 'student':
-            student = Student.query.filter_by(user_id=user_obj.id).first()
-            if student:
-                my_courses = Enrollment.query.filter_by(student_id=student.id).count()
-                total_grades = Grade.query.filter_by(student_id=student.id).count()
-                
-                dashboard_text = f"""
+
+    data = await run_db(bot_data.get_dashboard, user.id)
+    if not data:
+        await update.message.reply_text(LOGIN_REQUIRED_TEXT)
+        update_statistics(increment_sent=True)
+        return
+
+    user_data = data['user']
+
+    if user_data['role'] == 'student':
+        student = data.get('student')
+        if student:
+            dashboard_text = f"""
 📊 *لوحة تحكم الطالب*
 
-👤 الاسم: {student.user.full_name}
-📱 الجوال: {student.user.phone_number}
-📚 عدد الدورات: {my_courses}
-📝 عدد الدرجات: {total_grades}
+👤 الاسم: {user_data['full_name']}
+📱 الجوال: {user_data['phone_number']}
+📚 عدد الدورات: {student['courses']}
+📝 عدد الدرجات: {student['grades']}
 
 استخدم الأزرار أدناه للتصفح:
 """
-                keyboard = [
-                    [InlineKeyboardButton("📚 دوراتي", callback_data="my_courses")],
-                    [InlineKeyboardButton("📖 دروسي", callback_data="my_lessons")],
-                    [InlineKeyboardButton("📝 درجاتي", callback_data="my_grades")],
-                    [InlineKeyboardButton("📅 سجل الحضور", callback_data="my_attendance")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                await update.message.reply_text(
-                    dashboard_text,
-                    parse_mode=ParseMode.MARKDOWN,
-                    reply_markup=reply_markup
-                )
-                update_statistics(increment_sent=True)
-        
-        elif user_obj.role == 'teacher':
-            teacher = Teacher.query.filter_by(user_id=user_obj.id).first()
-            if teacher:
-                my_enrollments = Enrollment.query.filter_by(teacher_id=teacher.id).count()
-                my_students = Student.query.join(Enrollment).filter(
-                    Enrollment.teacher_id == teacher.id
-                ).distinct().count()
-                my_lessons = Lesson.query.filter_by(teacher_id=teacher.id).count()
-                
-                dashboard_text = f"""
+            keyboard = [
+                [InlineKeyboardButton("📚 دوراتي", callback_data="my_courses")],
+                [InlineKeyboardButton("📖 دروسي", callback_data="my_lessons")],
+                [InlineKeyboardButton("📝 درجاتي", callback_data="my_grades")],
+                [InlineKeyboardButton("📅 سجل الحضور", callback_data="my_attendance")]
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+
+            await update.message.reply_text(
+                dashboard_text,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=reply_markup
+            )
+            update_statistics(increment_sent=True)
+
+    elif user_data['role'] == 'teacher':
+        teacher = data.get('teacher')
+        if teacher:
+            dashboard_text = f"""
 👨‍🏫 *لوحة تحكم المعلم*
 
-👤 الاسم: {teacher.user.full_name}
-📚 التخصص: {teacher.specialization or 'غير محدد'}
-📖 عدد الدورات: {my_enrollments}
-👥 عدد الطلاب: {my_students}
-📝 عدد الدروس: {my_lessons}
+👤 الاسم: {user_data['full_name']}
+📚 التخصص: {teacher['specialization'] or 'غير محدد'}
+📖 عدد الدورات: {teacher['enrollments']}
+👥 عدد الطلاب: {teacher['students']}
+📝 عدد الدروس: {teacher['lessons']}
 
 استخدم الأزرار أدناه للتصفح:
 """
-                keyboard = [
-                    [InlineKeyboardButton("📚 دوراتي", callback_data="teacher_courses")],
-                    [InlineKeyboardButton("📖 دروسي", callback_data="teacher_lessons")],
-                    [InlineKeyboardButton("👥 طلابي", callback_data="teacher_students")],
-                    [InlineKeyboardButton("📅 سجل الحضور", callback_data="my_attendance")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                await update.message.reply_text(
-                    dashboard_text,
-                    parse_mode=ParseMode.MARKDOWN,
-                    reply_markup=reply_markup
-                )
-                update_statistics(increment_sent=True)
-        
-        elif user_obj.role in ['admin', 'assistant']:
-            stats = {
-                'students': Student.query.count(),
-                'teachers': Teacher.query.count(),
-                'courses': Course.query.count(),
-                'enrollments': Enrollment.query.count()
-            }
-            
-            dashboard_text = f"""
+            keyboard = [
+                [InlineKeyboardButton("📚 دوراتي", callback_data="teacher_courses")],
+                [InlineKeyboardButton("📖 دروسي", callback_data="teacher_lessons")],
+                [InlineKeyboardButton("👥 طلابي", callback_data="teacher_students")],
+                [InlineKeyboardButton("📅 سجل الحضور", callback_data="my_attendance")]
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+
+            await update.message.reply_text(
+                dashboard_text,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=reply_markup
+            )
+            update_statistics(increment_sent=True)
+
+    elif user_data['role'] in ['admin', 'assistant']:
+        stats = data['stats']
+
+        dashboard_text = f"""
 👑 *لوحة تحكم الإدارة*
 
-👤 الاسم: {user_obj.full_name}
-📋 الدور: {user_obj.role}
+👤 الاسم: {user_data['full_name']}
+📋 الدور: {user_data['role']}
 
 📊 *إحصائيات النظام:*
 👨‍🎓 الطلاب: {stats['students']}
@@ -405,498 +346,235 @@ async def dashboard(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 📚 الدورات: {stats['courses']}
 📝 التسجيلات: {stats['enrollments']}
 """
-            await update.message.reply_text(
-                dashboard_text,
-                parse_mode=ParseMode.MARKDOWN
-            )
-            update_statistics(increment_sent=True)
-
-async def view_courses(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    update_statistics()
-    
-    with flask_app.app_context():
-        courses = Course.query.all()
-        
-        if not courses:
-            await update.message.reply_text("لا توجد دورات متاحة حالياً")
-            update_statistics(increment_sent=True)
-            return
-        
         await update.message.reply_text(
-            f"📚 *الدورات المتاحة ({len(courses)})*\n\n"
-            "اختر دورة لعرض التفاصيل:",
+            dashboard_text,
             parse_mode=ParseMode.MARKDOWN
         )
         update_statistics(increment_sent=True)
-        
-        for course in courses[:10]:
-            enrolled_count = Enrollment.query.filter_by(course_id=course.id).count()
-            available_seats = (course.max_students - enrolled_count) if course.max_students else "غير محدود"
-            
-            course_text = f"""
-📖 *{course.title}*
-
-📝 الوصف: {course.description[:100] if course.description else 'لا يوجد وصف'}...
-⏱️ المدة: {course.duration}
-👥 المقاعد المتاحة: {available_seats}
-"""
-            
-            keyboard = [[InlineKeyboardButton("عرض التفاصيل", callback_data=f"course_{course.id}")]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-                course_text,
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=reply_markup
-            )
-            update_statistics(increment_sent=True)
-            await asyncio.sleep(0.5)
 
-async def view_news(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+SEPARATOR = "━━━━━━━━━━━━━━━"
+
+def page_navigation(prefix, page, pages):
+    """صف أزرار السابق/التالي لقائمة مقسمة إلى صفحات، أو None إذا كانت صفحة واحدة"""
+    if pages <= 1:
+        return None
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("◀️ السابق", callback_data=f"{prefix}_{page - 1}"))
+    navigation.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data="noop"))
+    if page < pages - 1:
+        navigation.append(InlineKeyboardButton("التالي ▶️", callback_data=f"{prefix}_{page + 1}"))
+    return navigation
+
+def catalog_markup(kind, page):
+    keyboard = [[InlineKeyboardButton(label, callback_data=callback)] for label, callback in page['buttons']]
+    navigation = page_navigation(f"catalog_{kind}", page['page'], page['pages'])
+    if navigation:
+        keyboard.append(navigation)
+    return InlineKeyboardMarkup(keyboard) if keyboard else None
+
+async def send_catalog(update: Update, kind: str) -> None:
     update_statistics()
-    
-    with flask_app.app_context():
-        news_items = News.query.filter_by(is_published=True).order_by(
-            News.created_at.desc()
-        ).limit(5).all()
-        
-        if not news_items:
-            await update.message.reply_text("لا توجد أخبار متاحة حالياً")
-            update_statistics(increment_sent=True)
-            return
-        
-        await update.message.reply_text(
-            f"📰 *آخر الأخبار ({len(news_items)})*",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        update_statistics(increment_sent=True)
-        
-        for news in news_items:
-            news_date = news.created_at.strftime('%Y-%m-%d')
-            news_text = f"""
-📰 *{news.title}*
 
-📅 التاريخ: {news_date}
+    # رسالة واحدة لكل صفحة مع أزرار تنقل، بدل رسالة لكل عنصر
+    page = await run_db(bot_catalog.get_catalog_page, kind, 0)
+    await update.message.reply_text(
+        page['text'],
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=catalog_markup(kind, page)
+    )
+    update_statistics(increment_sent=True)
 
-{news.content[:200]}...
-"""
-            
-            keyboard = [[InlineKeyboardButton("قراءة المزيد", callback_data=f"news_{news.id}")]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-                news_text,
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=reply_markup
-            )
-            update_statistics(increment_sent=True)
-            await asyncio.sleep(0.5)
+async def view_courses(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await send_catalog(update, 'courses')
+
+async def view_news(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await send_catalog(update, 'news')
 
 async def view_teachers(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    update_statistics()
-    
-    with flask_app.app_context():
-        teachers = Teacher.query.all()
-        
-        if not teachers:
-            await update.message.reply_text("لا يوجد معلمون مسجلون حالياً")
-            update_statistics(increment_sent=True)
-            return
-        
-        await update.message.reply_text(
-            f"👨‍🏫 *قائمة المعلمين ({len(teachers)})*",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        update_statistics(increment_sent=True)
-        
-        for teacher in teachers:
-            teacher_text = f"""
-👨‍🏫 *{teacher.user.full_name}*
+    await send_catalog(update, 'teachers')
+
+def render_student_courses(result):
+    text = f"📚 *دوراتي ({result['total']})*\n"
+    keyboard = []
+    for course in result['courses']:
+        text += f"""
+📖 *{course['title']}*
+👨‍🏫 المعلم: {course['teacher_name'] or 'غير محدد'}
+📝 عدد الدروس: {course['lessons_count']}
+⏱️ المدة: {course['duration']}
+{SEPARATOR}
+"""
+        keyboard.append([InlineKeyboardButton(f"📖 دروس {course['title']}", callback_data=f"lessons_{course['id']}")])
+    return text, keyboard
 
-📚 التخصص: {teacher.specialization or 'غير محدد'}
-📜 المؤهلات: {teacher.qualifications or 'غير محدد'}
-⏱️ الخبرة: {teacher.experience_years or 0} سنة
+def render_student_lesson_courses(result):
+    text = "📖 *دروسي*\n\nاختر دورة لعرض دروسها:"
+    keyboard = [
+        [InlineKeyboardButton(f"📖 {course['title']} ({course['lessons_count']})", callback_data=f"lessons_{course['id']}")]
+        for course in result['courses']
+    ]
+    return text, keyboard
+
+def render_teacher_courses(result):
+    text = f"📚 *دوراتي ({result['total']})*\n"
+    for course in result['courses']:
+        text += f"""
+📖 *{course['title']}*
+👥 عدد الطلاب: {course['students']}
+📝 عدد الدروس: {course['lessons_count']}
+⏱️ المدة: {course['duration']}
+{SEPARATOR}
 """
-            
-            keyboard = [[InlineKeyboardButton("عرض التفاصيل", callback_data=f"teacher_{teacher.id}")]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-                teacher_text,
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=reply_markup
-            )
-            update_statistics(increment_sent=True)
-            await asyncio.sleep(0.5)
+    return text, []
+
+def render_teacher_lessons(result):
+    text = f"📖 *دروسي ({result['total']})*\n"
+    for lesson in result['lessons']:
+        lesson_date = lesson['upload_date'].strftime('%Y-%m-%d')
+        has_file = "📎" if lesson['has_file'] else ""
+        text += f"""
+📖 *{lesson['title']}* {has_file}
+📚 الدورة: {lesson['course_title'] or 'غير محدد'}
+📅 التاريخ: {lesson_date}
+{'✅ منشور' if lesson['is_published'] else '⏸️ غير منشور'}
+{SEPARATOR}
+"""
+    return text, []
+
+def render_teacher_students(result):
+    text = f"👥 *طلابي ({result['total']})*\n"
+    for student in result['students']:
+        text += f"""
+👨‍🎓 *{student['full_name']}*
+📱 الجوال: {student['phone_number']}
+📚 الدورات: {', '.join(student['courses'])}
+{SEPARATOR}
+"""
+    return text, []
+
+# النوع: (دالة البيانات، مفتاح العناصر، دالة العرض، نص القائمة الفارغة)
+LISTINGS = {
+    'mycourses': (bot_data.get_student_courses, 'courses', render_student_courses, "أنت غير مسجل في أي دورة حالياً"),
+    'mylessons': (bot_data.get_student_courses, 'courses', render_student_lesson_courses, "أنت غير مسجل في أي دورة حالياً"),
+    'tcourses': (bot_data.get_teacher_courses, 'courses', render_teacher_courses, "ليس لديك دورات حالياً"),
+    'tlessons': (bot_data.get_teacher_lessons, 'lessons', render_teacher_lessons, "ليس لديك دروس حالياً"),
+    'tstudents': (bot_data.get_teacher_students, 'students', render_teacher_students, "ليس لديك طلاب حالياً"),
+}
+
+async def show_listing(update: Update, kind: str, page: int = 0) -> None:
+    """عرض صفحة واحدة من قائمة المستخدم في رسالة واحدة، أو تعديل الرسالة عند التنقل بين الصفحات"""
+    query = update.callback_query
+    loader, key, render, empty_text = LISTINGS[kind]
+    result = await run_db(loader, update.effective_user.id, page)
+
+    reply = query.edit_message_text if query else update.message.reply_text
+
+    if not result:
+        await reply(LOGIN_REQUIRED_CALLBACK_TEXT if query else LOGIN_REQUIRED_TEXT)
+        update_statistics(increment_sent=True)
+        return
+
+    if result[key] is None:
+        return
+
+    if not result[key]:
+        await reply(empty_text)
+        update_statistics(increment_sent=True)
+        return
+
+    text, keyboard = render(result)
+    navigation = page_navigation(f"page_{kind}", result['page'], result['pages'])
+    if navigation:
+        keyboard.append(navigation)
+
+    await reply(
+        text,
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None
+    )
+    update_statistics(increment_sent=True)
 
 async def my_courses(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    user = update.effective_user
     update_statistics()
-    
-    with flask_app.app_context():
-        session = BotSession.query.filter_by(telegram_id=user.id).first()
-        if not session or not session.is_authenticated:
-            await update.message.reply_text(
-                "🔒 يجب تسجيل الدخول أولاً!\n\nاستخدم /login"
-            )
-            update_statistics(increment_sent=True)
-            return
-        
-        user_obj = User.query.get(session.user_id)
-        
-        if user_obj.role == 'student':
-            student = Student.query.filter_by(user_id=user_obj.id).first()
-            if student:
-                enrollments = Enrollment.query.filter_by(student_id=student.id).all()
-                
-                if not enrollments:
-                    await update.message.reply_text("أنت غير مسجل في أي دورة حالياً")
-                    update_statistics(increment_sent=True)
-                    return
-                
-                await update.message.reply_text(
-                    f"📚 *دوراتي ({len(enrollments)})*",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                update_statistics(increment_sent=True)
-                
-                for enrollment in enrollments:
-                    course = enrollment.course
-                    teacher = Teacher.query.get(enrollment.teacher_id) if enrollment.teacher_id else None
-                    lessons_count = Lesson.query.filter_by(
-                        course_id=course.id,
-                        is_published=True
-                    ).count()
-                    
-                    course_text = f"""
-📖 *{course.title}*
-
-👨‍🏫 المعلم: {teacher.user.full_name if teacher else 'غير محدد'}
-📝 عدد الدروس: {lessons_count}
-⏱️ المدة: {course.duration}
-"""
-                    
-                    keyboard = [[InlineKeyboardButton("عرض الدروس", callback_data=f"lessons_{course.id}")]]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    
-                    await update.message.reply_text(
-                        course_text,
-                        parse_mode=ParseMode.MARKDOWN,
-                        reply_markup=reply_markup
-                    )
-                    update_statistics(increment_sent=True)
-                    await asyncio.sleep(0.5)
+    await show_listing(update, 'mycourses')
 
 async def my_grades(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
     update_statistics()
-    
-    with flask_app.app_context():
-        session = BotSession.query.filter_by(telegram_id=user.id).first()
-        if not session or not session.is_authenticated:
-            await update.message.reply_text(
-                "🔒 يجب تسجيل الدخول أولاً!\n\nاستخدم /login"
-            )
-            update_statistics(increment_sent=True)
-            return
-        
-        user_obj = User.query.get(session.user_id)
-        
-        if user_obj.role == 'student':
-            student = Student.query.filter_by(user_id=user_obj.id).first()
-            if student:
-                grades = Grade.query.filter_by(student_id=student.id).order_by(
-                    Grade.created_at.desc()
-                ).all()
-                
-                if not grades:
-                    await update.message.reply_text("لا توجد درجات مسجلة لك حالياً")
-                    update_statistics(increment_sent=True)
-                    return
-                
-                grades_text = f"📝 *درجاتي ({len(grades)})*\n\n"
-                
-                for grade in grades[:20]:
-                    course = grade.course
-                    grade_date = grade.created_at.strftime('%Y-%m-%d')
-                    grades_text += f"""
-📚 {course.title}
-📋 {grade.exam_name}
-✅ الدرجة: {grade.grade}/{grade.max_grade}
+
+    data = await run_db(bot_data.get_student_grades, user.id)
+    if not data:
+        await update.message.reply_text(LOGIN_REQUIRED_TEXT)
+        update_statistics(increment_sent=True)
+        return
+
+    grades = data['grades']
+    if grades is None:
+        return
+
+    if not grades:
+        await update.message.reply_text("لا توجد درجات مسجلة لك حالياً")
+        update_statistics(increment_sent=True)
+        return
+
+    grades_text = f"📝 *درجاتي ({data['total']})*\n\n"
+
+    for grade in grades:
+        grade_date = grade['created_at'].strftime('%Y-%m-%d')
+        grades_text += f"""
+📚 {grade['course_title']}
+📋 {grade['exam_name']}
+✅ الدرجة: {grade['grade']}/{grade['max_grade']}
 📅 التاريخ: {grade_date}
 ━━━━━━━━━━━━━━━
 """
-                
-                await update.message.reply_text(
-                    grades_text,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                update_statistics(increment_sent=True)
+
+    await update.message.reply_text(
+        grades_text,
+        parse_mode=ParseMode.MARKDOWN
+    )
+    update_statistics(increment_sent=True)
 
 async def my_lessons(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    user = update.effective_user
     update_statistics()
-    
-    with flask_app.app_context():
-        session = BotSession.query.filter_by(telegram_id=user.id).first()
-        if not session or not session.is_authenticated:
-            await update.message.reply_text(
-                "🔒 يجب تسجيل الدخول أولاً!\n\nاستخدم /login"
-            )
-            update_statistics(increment_sent=True)
-            return
-        
-        user_obj = User.query.get(session.user_id)
-        
-        if user_obj.role == 'student':
-            student = Student.query.filter_by(user_id=user_obj.id).first()
-            if student:
-                enrollments = Enrollment.query.filter_by(student_id=student.id).all()
-                
-                if not enrollments:
-                    await update.message.reply_text("أنت غير مسجل في أي دورة حالياً")
-                    update_statistics(increment_sent=True)
-                    return
-                
-                await update.message.reply_text(
-                    "📖 *دروسي*\n\nاختر دورة لعرض دروسها:",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                update_statistics(increment_sent=True)
-                
-                for enrollment in enrollments:
-                    course = enrollment.course
-                    lessons_count = Lesson.query.filter_by(
-                        course_id=course.id,
-                        is_published=True
-                    ).count()
-                    
-                    course_text = f"""
-📖 *{course.title}*
-
-📝 عدد الدروس: {lessons_count}
-"""
-                    
-                    keyboard = [[InlineKeyboardButton("عرض الدروس", callback_data=f"lessons_{course.id}")]]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    
-                    await update.message.reply_text(
-                        course_text,
-                        parse_mode=ParseMode.MARKDOWN,
-                        reply_markup=reply_markup
-                    )
-                    update_statistics(increment_sent=True)
-                    await asyncio.sleep(0.5)
+    await show_listing(update, 'mylessons')
 
 async def teacher_courses(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    user = update.effective_user
     update_statistics()
-    
-    with flask_app.app_context():
-        session = BotSession.query.filter_by(telegram_id=user.id).first()
-        if not session or not session.is_authenticated:
-            await update.message.reply_text(
-                "🔒 يجب تسجيل الدخول أولاً!\n\nاستخدم /login"
-            )
-            update_statistics(increment_sent=True)
-            return
-        
-        user_obj = User.query.get(session.user_id)
-        
-        if user_obj.role == 'teacher':
-            teacher = Teacher.query.filter_by(user_id=user_obj.id).first()
-            if teacher:
-                enrollments = Enrollment.query.filter_by(teacher_id=teacher.id).all()
-                
-                if not enrollments:
-                    await update.message.reply_text("ليس لديك دورات حالياً")
-                    update_statistics(increment_sent=True)
-                    return
-                
-                courses_dict = {}
-                for enrollment in enrollments:
-                    if enrollment.course_id not in courses_dict:
-                        courses_dict[enrollment.course_id] = {
-                            'course': enrollment.course,
-                            'students': 0
-                        }
-                    courses_dict[enrollment.course_id]['students'] += 1
-                
-                await update.message.reply_text(
-                    f"📚 *دوراتي ({len(courses_dict)})*",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                update_statistics(increment_sent=True)
-                
-                for course_data in courses_dict.values():
-                    course = course_data['course']
-                    students_count = course_data['students']
-                    lessons_count = Lesson.query.filter_by(
-                        course_id=course.id,
-                        teacher_id=teacher.id
-                    ).count()
-                    
-                    course_text = f"""
-📖 *{course.title}*
-
-👥 عدد الطلاب: {students_count}
-📝 عدد الدروس: {lessons_count}
-⏱️ المدة: {course.duration}
-"""
-                    
-                    await update.message.reply_text(
-                        course_text,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    update_statistics(increment_sent=True)
-                    await asyncio.sleep(0.5)
+    await show_listing(update, 'tcourses')
 
 async def teacher_lessons(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    user = update.effective_user
     update_statistics()
-    
-    with flask_app.app_context():
-        session = BotSession.query.filter_by(telegram_id=user.id).first()
-        if not session or not session.is_authenticated:
-            await update.message.reply_text(
-                "🔒 يجب تسجيل الدخول أولاً!\n\nاستخدم /login"
-            )
-            update_statistics(increment_sent=True)
-            return
-        
-        user_obj = User.query.get(session.user_id)
-        
-        if user_obj.role == 'teacher':
-            teacher = Teacher.query.filter_by(user_id=user_obj.id).first()
-            if teacher:
-                lessons = Lesson.query.filter_by(teacher_id=teacher.id).all()
-                
-                if not lessons:
-                    await update.message.reply_text("ليس لديك دروس حالياً")
-                    update_statistics(increment_sent=True)
-                    return
-                
-                await update.message.reply_text(
-                    f"📖 *دروسي ({len(lessons)})*",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                update_statistics(increment_sent=True)
-                
-                for lesson in lessons[:20]:
-                    course = Course.query.get(lesson.course_id)
-                    lesson_date = lesson.upload_date.strftime('%Y-%m-%d')
-                    has_file = "📎" if lesson.file_path else ""
-                    
-                    lesson_text = f"""
-📖 *{lesson.title}* {has_file}
-
-📚 الدورة: {course.title if course else 'غير محدد'}
-📅 التاريخ: {lesson_date}
-{'✅ منشور' if lesson.is_published else '⏸️ غير منشور'}
-"""
-                    
-                    await update.message.reply_text(
-                        lesson_text,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    update_statistics(increment_sent=True)
-                    await asyncio.sleep(0.5)
+    await show_listing(update, 'tlessons')
 
 async def teacher_students(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    user = update.effective_user
     update_statistics()
-    
-    with flask_app.app_context():
-        session = BotSession.query.filter_by(telegram_id=user.id).first()
-        if not session or not session.is_authenticated:
-            await update.message.reply_text(
-                "🔒 يجب تسجيل الدخول أولاً!\n\nاستخدم /login"
-            )
-            update_statistics(increment_sent=True)
-            return
-        
-        user_obj = User.query.get(session.user_id)
-        
-        if user_obj.role == 'teacher':
-            teacher = Teacher.query.filter_by(user_id=user_obj.id).first()
-            if teacher:
-                enrollments = Enrollment.query.filter_by(teacher_id=teacher.id).all()
-                
-                if not enrollments:
-                    await update.message.reply_text("ليس لديك طلاب حالياً")
-                    update_statistics(increment_sent=True)
-                    return
-                
-                students_dict = {}
-                for enrollment in enrollments:
-                    student_id = enrollment.student_id
-                    if student_id not in students_dict:
-                        student = Student.query.get(student_id)
-                        students_dict[student_id] = {
-                            'student': student,
-                            'courses': []
-                        }
-                    students_dict[student_id]['courses'].append(enrollment.course.title)
-                
-                await update.message.reply_text(
-                    f"👥 *طلابي ({len(students_dict)})*",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                update_statistics(increment_sent=True)
-                
-                for student_data in list(students_dict.values())[:20]:
-                    student = student_data['student']
-                    courses_list = ', '.join(student_data['courses'])
-                    
-                    student_text = f"""
-👨‍🎓 *{student.user.full_name}*
-
-📱 الجوال: {student.user.phone_number}
-📚 الدورات: {courses_list}
-"""
-                    
-                    await update.message.reply_text(
-                        student_text,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    update_statistics(increment_sent=True)
-                    await asyncio.sleep(0.5)
+    await show_listing(update, 'tstudents')
+
+def _role_label(role):
+    return '👨‍🎓 طالب' if role == 'student' else '👨‍🏫 معلم'
 
 async def my_attendance(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
     update_statistics()
-    
-    with flask_app.app_context():
-        session = BotSession.query.filter_by(telegram_id=user.id).first()
-        if not session or not session.is_authenticated:
-            await update.message.reply_text(
-                "🔒 يجب تسجيل الدخول أولاً!\n\nاستخدم /login"
-            )
-            update_statistics(increment_sent=True)
-            return
-        
-        user_obj = User.query.get(session.user_id)
-        
-        from datetime import timedelta, date
-        from app.models import Attendance
-        
-        stats = Attendance.get_user_stats(user_obj.id)
-        
-        thirty_days_ago = date.today() - timedelta(days=365)
-        recent_stats = Attendance.get_user_stats(
-            user_obj.id, 
-            start_date=thirty_days_ago
-        )
-        
-        recent_records = Attendance.query.filter_by(user_id=user_obj.id).order_by(
-            Attendance.date.desc()
-        ).limit(10).all()
-        
-        attendance_text = f"""
+
+    data = await run_db(bot_data.get_attendance_summary, user.id)
+    if not data:
+        await update.message.reply_text(LOGIN_REQUIRED_TEXT)
+        update_statistics(increment_sent=True)
+        return
+
+    user_data = data['user']
+    stats = data['stats']
+    recent_stats = data['recent_stats']
+    recent_records = data['recent_records']
+
+    attendance_text = f"""
 📅 *سجل الحضور والغياب*
 
-👤 {user_obj.full_name}
-{'👨‍🎓 طالب' if user_obj.role == 'student' else '👨‍🏫 معلم'}
+👤 {user_data['full_name']}
+{_role_label(user_data['role'])}
 
 📊 *الإحصائيات الإجمالية:*
 ✅ أيام الحضور: {stats.get('present', 0)}
@@ -911,421 +589,266 @@ async def my_attendance(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
 📋 *آخر 10 سجلات:*
 """
-        
-        if recent_records:
-            for record in recent_records:
-                status_emoji = "✅" if record.status == 'present' else "❌"
-                status_text = "حضور" if record.status == 'present' else "غياب"
-                date_str = record.date.strftime('%Y-%m-%d')
-                notes_text = f"\n   📝 {record.notes}" if record.notes else ""
-                
-                attendance_text += f"\n{status_emoji} {date_str} - {status_text}{notes_text}\n"
-        else:
-            attendance_text += "\nلا توجد سجلات حضور حتى الآن"
-        
-        await update.message.reply_text(
-            attendance_text,
-            parse_mode=ParseMode.MARKDOWN
-        )
-        update_statistics(increment_sent=True)
+
+    if recent_records:
+        for record in recent_records:
+            status_emoji = "✅" if record['status'] == 'present' else "❌"
+            status_text = "حضور" if record['status'] == 'present' else "غياب"
+            date_str = record['date'].strftime('%Y-%m-%d')
+            notes_text = f"\n   📝 {record['notes']}" if record['notes'] else ""
+
+            attendance_text += f"\n{status_emoji} {date_str} - {status_text}{notes_text}\n"
+    else:
+        attendance_text += "\nلا توجد سجلات حضور حتى الآن"
+
+    await update.message.reply_text(
+        attendance_text,
+        parse_mode=ParseMode.MARKDOWN
+    )
+    update_statistics(increment_sent=True)
 
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
     update_statistics()
-    
+
     data = query.data
-    
-    if data.startswith('course_'):
+
+    if data.startswith('catalog_'):
+        _, kind, page_number = data.split('_')
+        page = await run_db(bot_catalog.get_catalog_page, kind, int(page_number))
+        await query.edit_message_text(
+            page['text'],
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=catalog_markup(kind, page)
+        )
+        update_statistics(increment_sent=True)
+
+    elif data.startswith('page_'):
+        _, kind, page_number = data.split('_')
+        await show_listing(update, kind, int(page_number))
+
+    elif data.startswith('course_'):
         course_id = int(data.split('_')[1])
-        with flask_app.app_context():
-            course = Course.query.get(course_id)
-            if course:
-                enrolled_count = Enrollment.query.filter_by(course_id=course.id).count()
-                available_seats = (course.max_students - enrolled_count) if course.max_students else "غير محدود"
-                lessons_count = Lesson.query.filter_by(course_id=course.id, is_published=True).count()
-                
-                course_detail = f"""
-📖 *{course.title}*
+        course = await run_db(bot_data.get_course, course_id)
+        if course:
+            course_detail = f"""
+📖 *{course['title']}*
 
 📝 *الوصف:*
-{course.description or 'لا يوجد وصف'}
+{course['description'] or 'لا يوجد وصف'}
 
-⏱️ المدة: {course.duration}
-📚 عدد الدروس: {lessons_count}
-👥 المقاعد المتاحة: {available_seats}
-{'⭐ دورة مميزة' if course.is_featured else ''}
+⏱️ المدة: {course['duration']}
+📚 عدد الدروس: {course['lessons_count']}
+👥 المقاعد المتاحة: {course['available_seats']}
+{'⭐ دورة مميزة' if course['is_featured'] else ''}
 """
-                await query.edit_message_text(
-                    course_detail,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                update_statistics(increment_sent=True)
-    
+            await query.edit_message_text(
+                course_detail,
+                parse_mode=ParseMode.MARKDOWN
+            )
+            update_statistics(increment_sent=True)
+
     elif data.startswith('news_'):
         news_id = int(data.split('_')[1])
-        with flask_app.app_context():
-            news = News.query.get(news_id)
-            if news:
-                news_date = news.created_at.strftime('%Y-%m-%d %H:%M')
-                news_detail = f"""
-📰 *{news.title}*
+        news = await run_db(bot_data.get_news, news_id)
+        if news:
+            news_date = news['created_at'].strftime('%Y-%m-%d %H:%M')
+            news_detail = f"""
+📰 *{news['title']}*
 
 📅 {news_date}
 
-{news.content}
+{news['content']}
 """
-                await query.edit_message_text(
-                    news_detail,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                update_statistics(increment_sent=True)
-    
+            await query.edit_message_text(
+                news_detail,
+                parse_mode=ParseMode.MARKDOWN
+            )
+            update_statistics(increment_sent=True)
+
     elif data == 'teacher_courses':
-        user = query.from_user
-        with flask_app.app_context():
-            session = BotSession.query.filter_by(telegram_id=user.id).first()
-            if not session or not session.is_authenticated:
-                await query.edit_message_text("🔒 يجب تسجيل الدخول أولاً!")
-                update_statistics(increment_sent=True)
-                return
-            
-            user_obj = User.query.get(session.user_id)
-            if user_obj.role == 'teacher':
-                teacher = Teacher.query.filter_by(user_id=user_obj.id).first()
-                if teacher:
-                    enrollments = Enrollment.query.filter_by(teacher_id=teacher.id).all()
-                    
-                    if not enrollments:
-                        await query.edit_message_text("ليس لديك دورات حالياً")
-                        update_statistics(increment_sent=True)
-                        return
-                    
-                    courses_dict = {}
-                    for enrollment in enrollments:
-                        if enrollment.course_id not in courses_dict:
-                            courses_dict[enrollment.course_id] = {
-                                'course': enrollment.course,
-                                'students': 0
-                            }
-                        courses_dict[enrollment.course_id]['students'] += 1
-                    
-                    courses_text = f"📚 *دوراتي ({len(courses_dict)})*\n\n"
-                    
-                    for course_data in list(courses_dict.values())[:10]:
-                        course = course_data['course']
-                        students_count = course_data['students']
-                        lessons_count = Lesson.query.filter_by(
-                            course_id=course.id,
-                            teacher_id=teacher.id
-                        ).count()
-                        
-                        courses_text += f"""📖 *{course.title}*
-👥 عدد الطلاب: {students_count}
-📝 عدد الدروس: {lessons_count}
-━━━━━━━━━━━━━━━
-"""
-                    
-                    await query.edit_message_text(
-                        courses_text,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    update_statistics(increment_sent=True)
-    
+        await show_listing(update, 'tcourses')
+
     elif data == 'teacher_lessons':
-        user = query.from_user
-        with flask_app.app_context():
-            session = BotSession.query.filter_by(telegram_id=user.id).first()
-            if not session or not session.is_authenticated:
-                await query.edit_message_text("🔒 يجب تسجيل الدخول أولاً!")
-                update_statistics(increment_sent=True)
-                return
-            
-            user_obj = User.query.get(session.user_id)
-            if user_obj.role == 'teacher':
-                teacher = Teacher.query.filter_by(user_id=user_obj.id).first()
-                if teacher:
-                    lessons = Lesson.query.filter_by(teacher_id=teacher.id).all()
-                    
-                    if not lessons:
-                        await query.edit_message_text("ليس لديك دروس حالياً")
-                        update_statistics(increment_sent=True)
-                        return
-                    
-                    lessons_text = f"📖 *دروسي ({len(lessons)})*\n\n"
-                    
-                    for lesson in lessons[:10]:
-                        course = Course.query.get(lesson.course_id)
-                        lesson_date = lesson.upload_date.strftime('%Y-%m-%d')
-                        has_file = "📎" if lesson.file_path else ""
-                        
-                        lessons_text += f"""📖 *{lesson.title}* {has_file}
-📚 الدورة: {course.title if course else 'غير محدد'}
-📅 {lesson_date}
-━━━━━━━━━━━━━━━
-"""
-                    
-                    await query.edit_message_text(
-                        lessons_text,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    update_statistics(increment_sent=True)
-    
+        await show_listing(update, 'tlessons')
+
     elif data == 'teacher_students':
-        user = query.from_user
-        with flask_app.app_context():
-            session = BotSession.query.filter_by(telegram_id=user.id).first()
-            if not session or not session.is_authenticated:
-                await query.edit_message_text("🔒 يجب تسجيل الدخول أولاً!")
-                update_statistics(increment_sent=True)
-                return
-            
-            user_obj = User.query.get(session.user_id)
-            if user_obj.role == 'teacher':
-                teacher = Teacher.query.filter_by(user_id=user_obj.id).first()
-                if teacher:
-                    enrollments = Enrollment.query.filter_by(teacher_id=teacher.id).all()
-                    
-                    if not enrollments:
-                        await query.edit_message_text("ليس لديك طلاب حالياً")
-                        update_statistics(increment_sent=True)
-                        return
-                    
-                    students_dict = {}
-                    for enrollment in enrollments:
-                        student_id = enrollment.student_id
-                        if student_id not in students_dict:
-                            student = Student.query.get(student_id)
-                            students_dict[student_id] = {
-                                'student': student,
-                                'courses': []
-                            }
-                        students_dict[student_id]['courses'].append(enrollment.course.title)
-                    
-                    students_text = f"👥 *طلابي ({len(students_dict)})*\n\n"
-                    
-                    for student_data in list(students_dict.values())[:10]:
-                        student = student_data['student']
-                        courses_list = ', '.join(student_data['courses'][:3])
-                        
-                        students_text += f"""👨‍🎓 *{student.user.full_name}*
-📱 {student.user.phone_number}
-📚 {courses_list}
-━━━━━━━━━━━━━━━
-"""
-                    
-                    await query.edit_message_text(
-                        students_text,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    update_statistics(increment_sent=True)
-    
+        await show_listing(update, 'tstudents')
+
     elif data.startswith('teacher_'):
         teacher_id = int(data.split('_')[1])
-        with flask_app.app_context():
-            teacher = Teacher.query.get(teacher_id)
-            if teacher:
-                teacher_detail = f"""
-👨‍🏫 *{teacher.user.full_name}*
-
-📚 التخصص: {teacher.specialization or 'غير محدد'}
-📜 المؤهلات: {teacher.qualifications or 'غير محدد'}
-⏱️ الخبرة: {teacher.experience_years or 0} سنة
-📱 الجوال: {teacher.phone or 'غير محدد'}
-
-{teacher.bio or ''}
+        teacher = await run_db(bot_data.get_teacher, teacher_id)
+        if teacher:
+            teacher_detail = f"""
+👨‍🏫 *{teacher['full_name']}*
+
+📚 التخصص: {teacher['specialization'] or 'غير محدد'}
+📜 المؤهلات: {teacher['qualifications'] or 'غير محدد'}
+⏱️ الخبرة: {teacher['experience_years'] or 0} سنة
+📱 الجوال: {teacher['phone'] or 'غير محدد'}
+
+{teacher['bio'] or ''}
 """
-                await query.edit_message_text(
-                    teacher_detail,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                update_statistics(increment_sent=True)
-    
-    elif data.startswith('lessons_'):
-        course_id = int(data.split('_')[1])
-        user = query.from_user
-        
-        with flask_app.app_context():
-            session = BotSession.query.filter_by(telegram_id=user.id).first()
-            if not session or not session.is_authenticated:
-                await query.edit_message_text("🔒 يجب تسجيل الدخول أولاً!")
-                update_statistics(increment_sent=True)
-                return
-            
-            user_obj = User.query.get(session.user_id)
-            student = Student.query.filter_by(user_id=user_obj.id).first()
-            
-            if not student:
-                await query.edit_message_text("لم يتم العثور على ملف الطالب")
-                update_statistics(increment_sent=True)
-                return
-            
-            enrollment = Enrollment.query.filter_by(
-                student_id=student.id,
-                course_id=course_id
-            ).first()
-            
-            if not enrollment:
-                await query.edit_message_text("أنت غير مسجل في هذه الدورة")
-                update_statistics(increment_sent=True)
-                return
-            
-            course = Course.query.get(course_id)
-            lessons = Lesson.query.filter_by(
-                course_id=course_id,
-                is_published=True
-            ).all()
-            
-            if not lessons:
-                await query.edit_message_text(f"لا توجد دروس متاحة في دورة {course.title}")
-                update_statistics(increment_sent=True)
-                return
-            
-            lessons_text = f"📖 *دروس دورة {course.title}*\n\nاختر درساً لعرض التفاصيل:"
-            
-            keyboard = []
-            for lesson in lessons[:20]:
-                has_file = "📎 " if lesson.file_path else ""
-                keyboard.append([InlineKeyboardButton(
-                    f"{has_file}{lesson.title}", 
-                    callback_data=f"lesson_{lesson.id}"
-                )])
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
             await query.edit_message_text(
-                lessons_text,
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=reply_markup
+                teacher_detail,
+                parse_mode=ParseMode.MARKDOWN
             )
             update_statistics(increment_sent=True)
-    
+
+    elif data.startswith('lessons_'):
+        parts = data.split('_')
+        course_id = int(parts[1])
+        page = int(parts[2]) if len(parts) > 2 else 0
+        status, result = await run_db(bot_data.get_course_lessons, query.from_user.id, course_id, page)
+
+        if status == 'unauthenticated':
+            await query.edit_message_text(LOGIN_REQUIRED_CALLBACK_TEXT)
+            update_statistics(increment_sent=True)
+            return
+
+        if status == 'no_student':
+            await query.edit_message_text("لم يتم العثور على ملف الطالب")
+            update_statistics(increment_sent=True)
+            return
+
+        if status == 'not_enrolled':
+            await query.edit_message_text("أنت غير مسجل في هذه الدورة")
+            update_statistics(increment_sent=True)
+            return
+
+        if not result['lessons']:
+            await query.edit_message_text(f"لا توجد دروس متاحة في دورة {result['course_title']}")
+            update_statistics(increment_sent=True)
+            return
+
+        lessons_text = f"📖 *دروس دورة {result['course_title']}*\n\nاختر درساً لعرض التفاصيل:"
+
+        keyboard = []
+        for lesson in result['lessons']:
+            has_file = "📎 " if lesson['has_file'] else ""
+            keyboard.append([InlineKeyboardButton(
+                f"{has_file}{lesson['title']}",
+                callback_data=f"lesson_{lesson['id']}"
+            )])
+
+        navigation = page_navigation(f"lessons_{course_id}", result['page'], result['pages'])
+        if navigation:
+            keyboard.append(navigation)
+
+        reply_markup = InlineKeyboardMarkup(keyboard)
+
+        await query.edit_message_text(
+            lessons_text,
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=reply_markup
+        )
+        update_statistics(increment_sent=True)
+
     elif data.startswith('lesson_'):
         lesson_id = int(data.split('_')[1])
-        user = query.from_user
-        
-        with flask_app.app_context():
-            session = BotSession.query.filter_by(telegram_id=user.id).first()
-            if not session or not session.is_authenticated:
-                await query.edit_message_text("🔒 يجب تسجيل الدخول أولاً!")
-                update_statistics(increment_sent=True)
-                return
-            
-            lesson = Lesson.query.get(lesson_id)
-            if not lesson:
-                await query.edit_message_text("لم يتم العثور على الدرس")
-                update_statistics(increment_sent=True)
-                return
-            
-            course = Course.query.get(lesson.course_id)
-            teacher = Teacher.query.get(lesson.teacher_id)
-            lesson_date = lesson.upload_date.strftime('%Y-%m-%d')
-            
-            lesson_detail = f"""
-📖 *{lesson.title}*
-
-📚 الدورة: {course.title if course else 'غير محدد'}
-👨‍🏫 المعلم: {teacher.user.full_name if teacher else 'غير محدد'}
+        status, lesson = await run_db(bot_data.get_lesson, query.from_user.id, lesson_id)
+
+        if status == 'unauthenticated':
+            await query.edit_message_text(LOGIN_REQUIRED_CALLBACK_TEXT)
+            update_statistics(increment_sent=True)
+            return
+
+        if status == 'not_found':
+            await query.edit_message_text("لم يتم العثور على الدرس")
+            update_statistics(increment_sent=True)
+            return
+
+        lesson_date = lesson['upload_date'].strftime('%Y-%m-%d')
+
+        lesson_detail = f"""
+📖 *{lesson['title']}*
+
+📚 الدورة: {lesson['course_title'] or 'غير محدد'}
+👨‍🏫 المعلم: {lesson['teacher_name'] or 'غير محدد'}
 📅 التاريخ: {lesson_date}
 
 📝 *الوصف:*
-{lesson.description or 'لا يوجد وصف'}
+{lesson['description'] or 'لا يوجد وصف'}
 """
-            
-            if lesson.file_path:
-                lesson_detail += f"\n📎 *يوجد ملف مرفق*"
-                keyboard = [[InlineKeyboardButton("📥 تحميل الملف", callback_data=f"download_{lesson.id}")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                await query.edit_message_text(
-                    lesson_detail,
-                    parse_mode=ParseMode.MARKDOWN,
-                    reply_markup=reply_markup
-                )
-            else:
-                await query.edit_message_text(
-                    lesson_detail,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-            
-            update_statistics(increment_sent=True)
-    
+
+        if lesson['has_file']:
+            lesson_detail += f"\n📎 *يوجد ملف مرفق*"
+            keyboard = [[InlineKeyboardButton("📥 تحميل الملف", callback_data=f"download_{lesson['id']}")]]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+
+            await query.edit_message_text(
+                lesson_detail,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=reply_markup
+            )
+        else:
+            await query.edit_message_text(
+                lesson_detail,
+                parse_mode=ParseMode.MARKDOWN
+            )
+
+        update_statistics(increment_sent=True)
+
     elif data.startswith('download_'):
         lesson_id = int(data.split('_')[1])
-        user = query.from_user
-        
-        with flask_app.app_context():
-            lesson = Lesson.query.get(lesson_id)
-            if lesson and lesson.file_path:
-                file_path = os.path.join('app', 'static', lesson.file_path)
-                
-                if os.path.exists(file_path):
-                    await query.answer("جاري إرسال الملف...")
-                    
-                    with open(file_path, 'rb') as f:
-                        await query.message.reply_document(
-                            document=f,
-                            filename=os.path.basename(lesson.file_path),
-                            caption=f"📖 {lesson.title}"
-                        )
-                    update_statistics(increment_sent=True)
-                else:
-                    await query.answer("عذراً، الملف غير موجود", show_alert=True)
-                    update_statistics(increment_sent=True)
+        lesson = await run_db(bot_data.get_lesson_file, lesson_id)
+
+        if lesson:
+            file_path = os.path.join('app', 'static', lesson['file_path'])
+
+            if os.path.exists(file_path):
+                await query.answer("جاري إرسال الملف...")
+
+                with open(file_path, 'rb') as f:
+                    await query.message.reply_document(
+                        document=f,
+                        filename=os.path.basename(lesson['file_path']),
+                        caption=f"📖 {lesson['title']}"
+                    )
+                update_statistics(increment_sent=True)
             else:
-                await query.answer("عذراً، لا يوجد ملف مرفق", show_alert=True)
+                await query.answer("عذراً، الملف غير موجود", show_alert=True)
                 update_statistics(increment_sent=True)
-    
+        else:
+            await query.answer("عذراً، لا يوجد ملف مرفق", show_alert=True)
+            update_statistics(increment_sent=True)
+
     elif data == 'my_courses':
         await query.edit_message_text(
             "📚 استخدم زر 'دوراتي' من القائمة الرئيسية لعرض دوراتك"
         )
         update_statistics(increment_sent=True)
-    
+
     elif data == 'my_lessons':
         await query.edit_message_text(
             "📖 استخدم زر 'دروسي' من القائمة الرئيسية لعرض دروسك"
         )
         update_statistics(increment_sent=True)
-    
+
     elif data == 'my_grades':
         await query.edit_message_text(
             "📝 استخدم زر 'درجاتي' من القائمة الرئيسية لعرض درجاتك"
         )
         update_statistics(increment_sent=True)
-    
+
     elif data == 'my_attendance':
-        user = query.from_user
-        
-        with flask_app.app_context():
-            session = BotSession.query.filter_by(telegram_id=user.id).first()
-            if not session or not session.is_authenticated:
-                await query.edit_message_text("🔒 يجب تسجيل الدخول أولاً!")
-                update_statistics(increment_sent=True)
-                return
-            
-            user_obj = User.query.get(session.user_id)
-            
-            from datetime import timedelta, date
-            from app.models import Attendance
-            
-            stats = Attendance.get_user_stats(user_obj.id)
-            
-            thirty_days_ago = date.today() - timedelta(days=365)
-            recent_stats = Attendance.get_user_stats(
-                user_obj.id, 
-                start_date=thirty_days_ago
-            )
-            
-            recent_records = Attendance.query.filter_by(user_id=user_obj.id).order_by(
-                Attendance.date.desc()
-            ).limit(10).all()
-            
-            attendance_text = f"""
+        result = await run_db(bot_data.get_attendance_summary, query.from_user.id)
+        if not result:
+            await query.edit_message_text(LOGIN_REQUIRED_CALLBACK_TEXT)
+            update_statistics(increment_sent=True)
+            return
+
+        user_data = result['user']
+        stats = result['stats']
+        recent_stats = result['recent_stats']
+        recent_records = result['recent_records']
+
+        attendance_text = f"""
 📅 *سجل الحضور والغياب*
 
-👤 {user_obj.full_name}
-{'👨‍🎓 طالب' if user_obj.role == 'student' else '👨‍🏫 معلم'}
+👤 {user_data['full_name']}
+{_role_label(user_data['role'])}
 
 📊 *الإحصائيات الإجمالية:*
 ✅ حضور: {stats.get('present', 0)}
@@ -1340,117 +863,100 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 📋 *آخر 10 سجلات:*
 """
-            
-            if recent_records:
-                for record in recent_records[:5]:
-                    status_emoji = "✅" if record.status == 'present' else "❌"
-                    status_text = "حضور" if record.status == 'present' else "غياب"
-                    date_str = record.date.strftime('%Y-%m-%d')
-                    
-                    attendance_text += f"{status_emoji} {date_str} - {status_text}\n"
-            else:
-                attendance_text += "لا توجد سجلات"
-            
-            await query.edit_message_text(
-                attendance_text,
-                parse_mode=ParseMode.MARKDOWN
-            )
-            update_statistics(increment_sent=True)
-    
+
+        if recent_records:
+            for record in recent_records[:5]:
+                status_emoji = "✅" if record['status'] == 'present' else "❌"
+                status_text = "حضور" if record['status'] == 'present' else "غياب"
+                date_str = record['date'].strftime('%Y-%m-%d')
+
+                attendance_text += f"{status_emoji} {date_str} - {status_text}\n"
+        else:
+            attendance_text += "لا توجد سجلات"
+
+        await query.edit_message_text(
+            attendance_text,
+            parse_mode=ParseMode.MARKDOWN
+        )
+        update_statistics(increment_sent=True)
+
     elif data.startswith('read_notif_'):
         notif_recipient_id = int(data.split('_')[2])
-        user = query.from_user
-        
-        with flask_app.app_context():
-            recipient = NotificationRecipient.query.get(notif_recipient_id)
-            if recipient and recipient.user.id:
-                session = BotSession.query.filter_by(telegram_id=user.id).first()
-                if session and session.user_id == recipient.user_id:
-                    if not recipient.is_read:
-                        recipient.mark_as_read(source='telegram')
-                    
-                    notification = recipient.notification
-                    notif_text = f"""
-🔔 *{notification.title}*
-
-{notification.message}
-
-📅 {notification.created_at.strftime('%Y-%m-%d %H:%M') if notification.created_at else ''}
+        notification = await run_db(bot_data.read_notification, query.from_user.id, notif_recipient_id)
+
+        if notification:
+            notif_text = f"""
+🔔 *{notification['title']}*
+
+{notification['message']}
+
+📅 {notification['created_at'].strftime('%Y-%m-%d %H:%M') if notification['created_at'] else ''}
 """
-                    keyboard = [[InlineKeyboardButton("✅ تم القراءة", callback_data="notif_read_ok")]]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    
-                    await query.edit_message_text(
-                        notif_text,
-                        parse_mode=ParseMode.MARKDOWN,
-                        reply_markup=reply_markup
-                    )
-                    update_statistics(increment_sent=True)
-    
+            keyboard = [[InlineKeyboardButton("✅ تم القراءة", callback_data="notif_read_ok")]]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+
+            await query.edit_message_text(
+                notif_text,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=reply_markup
+            )
+            update_statistics(increment_sent=True)
+
     elif data == 'notif_read_ok':
         await query.answer("تمت القراءة", show_alert=False)
 
 async def my_notifications(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
     update_statistics()
-    
-    with flask_app.app_context():
-        session = BotSession.query.filter_by(telegram_id=user.id).first()
-        if not session or not session.is_authenticated:
-            await update.message.reply_text(
-                "🔒 يجب تسجيل الدخول أولاً!\n\nاستخدم /login"
-            )
-            update_statistics(increment_sent=True)
-            return
-        
-        from app.utils.notifications import get_user_notifications, get_unread_count
-        
-        unread_count = get_unread_count(session.user_id)
-        notifications = get_user_notifications(session.user_id, unread_only=False, limit=20)
-        
-        if not notifications:
-            await update.message.reply_text(
-                "📭 لا توجد إشعارات حالياً"
-            )
-            update_statistics(increment_sent=True)
-            return
-        
-        header_text = f"🔔 *الإشعارات*\n\n"
-        if unread_count > 0:
-            header_text += f"📬 لديك {unread_count} إشعار غير مقروء\n\n"
-        
-        await update.message.reply_text(header_text, parse_mode=ParseMode.MARKDOWN)
+
+    data = await run_db(bot_data.get_notifications, user.id, 20)
+    if not data:
+        await update.message.reply_text(LOGIN_REQUIRED_TEXT)
         update_statistics(increment_sent=True)
-        
-        for recipient in notifications[:10]:
-            notification = recipient.notification
-            if not notification:
-                continue
-            
-            status_emoji = "📬" if not recipient.is_read else "✅"
-            notif_preview = f"""
-{status_emoji} *{notification.title}*
-
-{notification.message[:100]}{'...' if len(notification.message) > 100 else ''}
-
-📅 {notification.created_at.strftime('%Y-%m-%d %H:%M') if notification.created_at else ''}
+        return
+
+    unread_count = data['unread_count']
+    notifications = data['notifications']
+
+    if not notifications:
+        await update.message.reply_text(
+            "📭 لا توجد إشعارات حالياً"
+        )
+        update_statistics(increment_sent=True)
+        return
+
+    header_text = f"🔔 *الإشعارات*\n\n"
+    if unread_count > 0:
+        header_text += f"📬 لديك {unread_count} إشعار غير مقروء\n\n"
+
+    await update.message.reply_text(header_text, parse_mode=ParseMode.MARKDOWN)
+    update_statistics(increment_sent=True)
+
+    for notification in notifications[:10]:
+        status_emoji = "📬" if not notification['is_read'] else "✅"
+        message = notification['message']
+        notif_preview = f"""
+{status_emoji} *{notification['title']}*
+
+{message[:100]}{'...' if len(message) > 100 else ''}
+
+📅 {notification['created_at'].strftime('%Y-%m-%d %H:%M') if notification['created_at'] else ''}
 """
-            
-            keyboard = [[InlineKeyboardButton("📖 قراءة", callback_data=f"read_notif_{recipient.id}")]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-                notif_preview,
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=reply_markup
-            )
-            update_statistics(increment_sent=True)
-            await asyncio.sleep(0.5)
+
+        keyboard = [[InlineKeyboardButton("📖 قراءة", callback_data=f"read_notif_{notification['recipient_id']}")]]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+
+        await update.message.reply_text(
+            notif_preview,
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=reply_markup
+        )
+        update_statistics(increment_sent=True)
 
 async def text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     text = update.message.text
     update_statistics()
-    
+
     if text == "📚 الدورات":
         return await view_courses(update, context)
     elif text == "📰 الأخبار":
@@ -1474,16 +980,15 @@ async def text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     elif text == "🚪 تسجيل الخروج":
         return await logout(update, context)
     elif text == "📞 التواصل":
-        with flask_app.app_context():
-            settings = SiteSettings.query.first()
-            contact_text = f"""
+        settings = await run_db(bot_data.get_bot_settings)
+        contact_text = f"""
 📞 *التواصل معنا*
 
-{f'📱 الهاتف 1: {settings.phone1}' if settings and settings.phone1 else ''}
-{f'📱 الهاتف 2: {settings.phone2}' if settings and settings.phone2 else ''}
-{f'📧 البريد: {settings.email}' if settings and settings.email else ''}
-{f'📍 العنوان: {settings.address}' if settings and settings.address else ''}
-{f'📘 Facebook: {settings.facebook_url}' if settings and settings.facebook_url else ''}
+{f'📱 الهاتف 1: {settings["phone1"]}' if settings and settings['phone1'] else ''}
+{f'📱 الهاتف 2: {settings["phone2"]}' if settings and settings['phone2'] else ''}
+{f'📧 البريد: {settings["email"]}' if settings and settings['email'] else ''}
+{f'📍 العنوان: {settings["address"]}' if settings and settings['address'] else ''}
+{f'📘 Facebook: {settings["facebook_url"]}' if settings and settings['facebook_url'] else ''}
 """
         await update.message.reply_text(contact_text, parse_mode=ParseMode.MARKDOWN)
         update_statistics(increment_sent=True)
@@ -1507,40 +1012,36 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         logger.error(f"Error in error handler: {e}")
 
 async def send_notification_to_user(telegram_id: int, message: str):
-    with flask_app.app_context():
-        settings = SiteSettings.query.first()
-        if not settings or not settings.telegram_bot_enabled:
-            return False
-        
-        if not settings.telegram_bot_token:
-            return False
-        
-        try:
-            application = Application.builder().token(settings.telegram_bot_token).build()
-            await application.bot.send_message(
-                chat_id=telegram_id,
-                text=message,
-                parse_mode=ParseMode.MARKDOWN
-            )
-            return True
-        except Exception as e:
-            logger.error(f"Error sending notification: {e}")
-            return False
+    settings = await run_db(bot_data.get_bot_settings)
+    if not settings or not settings['telegram_bot_enabled']:
+        return False
 
-def main() -> None:
-    with flask_app.app_context():
-        settings = SiteSettings.query.first()
-        if not settings or not settings.telegram_bot_token:
-            logger.error("Telegram bot token not configured!")
-            return
-        
-        if not settings.telegram_bot_enabled:
-            logger.info("Telegram bot is disabled in settings")
-            return
-        
-        token = settings.telegram_bot_token
-    
-    application = Application.builder().token(token).build()
+    if not settings['telegram_bot_token']:
+        return False
+
+    try:
+        await send_message(settings['telegram_bot_token'], telegram_id, message, parse_mode=ParseMode.MARKDOWN)
+        return True
+    except Exception as e:
+        logger.error(f"Error sending notification: {e}")
+        return False
+
+def build_application(token: str, polling: bool = True, base_url: str = None) -> Application:
+    """بناء تطبيق البوت وتسجيل المعالجات؛ بدون Updater في وضع Webhook، وbase_url لخادم Bot API بديل"""
+    # معالجة تحديثات المستخدمين المختلفين بالتوازي، فعمل قاعدة البيانات يجري في مجموعة الخيوط،
+    # وتحديثات المحادثة الواحدة بالتتابع حتى لا تتسابق على حالة محادثة تسجيل الدخول
+    # والردود تمر عبر منسق الإرسال المشترك بأولوية تفاعلية تسبق الإشعارات الجماعية
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(PerChatUpdateProcessor(CONCURRENT_UPDATES))
+        .rate_limiter(SchedulerRateLimiter())
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    if not polling:
+        builder = builder.updater(None)
+    application = builder.build()
     
     login_handler = ConversationHandler(
         entry_points=[
@@ -1570,9 +1071,45 @@ def main() -> None:
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, text_handler))
     
     application.add_error_handler(error_handler)
+    return application
+
+def shutdown_services() -> None:
+    """حفظ العدادات والجلسات المعلقة وإيقاف مجموعة خيوط قاعدة البيانات"""
+    get_bot_stats().stop()
+    get_session_cache().stop()
+    bot_data.shutdown_db_executor()
+
+def main() -> bool:
+    """تشغيل البوت بوضع Polling حتى الإيقاف؛ تُرجع False إذا لم يُشغَّل (معطل أو بوضع Webhook)"""
+    with flask_app.app_context():
+        settings = SiteSettings.query.first()
+        if not settings or not settings.telegram_bot_token:
+            logger.error("Telegram bot token not configured!")
+            return False
+        
+        if not settings.telegram_bot_enabled:
+            logger.info("Telegram bot is disabled in settings")
+            return False
+        
+        token = settings.telegram_bot_token
+        webhook_url = settings.telegram_bot_webhook_url if settings.telegram_bot_webhook_enabled else None
+    
+    if webhook_url:
+        # في وضع Webhook تصل التحديثات إلى عملية الويب: تحت serve.py تمررها إلى تطبيق البوت في عملية البوت،
+        # وفي التشغيل بعملية واحدة تعالجها بنفسها؛ هنا نكتفي بتسجيل العنوان لدى تيليجرام
+        from app.utils.bot_webhook import register_webhook
+        register_webhook(token, webhook_url)
+        logger.info(f"Webhook mode: updates are delivered to {webhook_url}")
+        return False
+    
+    application = build_application(token)
     
     logger.info("Bot started successfully!")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    try:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
+    finally:
+        shutdown_services()
+    return True
 
 if __name__ == '__main__':
     main()
@@ -2,9 +2,26 @@ import os
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+def database_uri():
+    """
+    SQLite المحلي افتراضياً؛ DATABASE_BACKEND=postgresql يستخدم DATABASE_URL
+    (الاختيار صريح حتى لا ينتقل التطبيق إلى قاعدة فارغة لمجرد وجود DATABASE_URL في البيئة)
+    """
+    backend = os.environ.get('DATABASE_BACKEND', 'sqlite').lower()
+    if backend == 'sqlite':
+        return 'sqlite:///' + os.path.join(basedir, 'alqasim_institute.db')
+    
+    url = os.environ.get('DATABASE_URL', '')
+    if not url:
+        raise RuntimeError(f'DATABASE_BACKEND={backend} requires DATABASE_URL')
+    for prefix in ('postgres://', 'postgresql://'):
+        if url.startswith(prefix):
+            return 'postgresql+psycopg://' + url[len(prefix):]
+    return url
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'alqasim_institute.db')
+    SQLALCHEMY_DATABASE_URI = database_uri()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
     UPLOAD_FOLDER = os.path.join(basedir, 'app', 'static', 'uploads')
@@ -14,3 +31,8 @@ class Config:
     TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '')
     TELEGRAM_CHAT_ID = os.environ.get('TELEGRAM_CHAT_ID', '')
     TELEGRAM_BACKUP_ENABLED = os.environ.get('TELEGRAM_BACKUP_ENABLED', 'False').lower() == 'true'
+    AUTO_BACKUP_DEBOUNCE_SECONDS = int(os.environ.get('AUTO_BACKUP_DEBOUNCE_SECONDS', 60))
+    AUTO_BACKUP_MAX_DELAY_SECONDS = int(os.environ.get('AUTO_BACKUP_MAX_DELAY_SECONDS', 600))
+    
+    # المهام المجدولة تعمل في عملية واحدة فقط؛ serve.py يعطّلها في عمليات الويب والبوت
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'True').lower() == 'true'
@@ -1,8 +1,22 @@
+import os
+import threading
 from app import create_app, db
 
 app = create_app()
 
+
+def start_outbox_worker():
+    """عامل صندوق الصادر (تسليم تيليجرام وتنبيهات الغياب) لخادم التطوير؛ runner.py وserve.py يشغّلانه بأنفسهما"""
+    from app.utils.outbox import run_worker
+    thread = threading.Thread(target=run_worker, name='OutboxWorkerThread', daemon=True)
+    thread.start()
+    return thread
+
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+    # مع debug=True يعمل الخادم في عملية فرعية يعيد المراقب تشغيلها، فيُشغَّل العامل فيها فقط لا في المراقب
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_outbox_worker()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -1,7 +1,8 @@
 import threading
 import logging
 import sys
-from app import create_app, db
+from app import db
+from app.utils.worker_context import get_worker_app
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -12,12 +13,13 @@ logger = logging.getLogger(__name__)
 flask_app = None
 bot_thread = None
 flask_thread = None
+worker_thread = None
 
 def run_flask():
     """تشغيل Flask App"""
     global flask_app
     try:
-        flask_app = create_app()
+        flask_app = get_worker_app()
         with flask_app.app_context():
             db.create_all()
         logger.info("Starting Flask application on port 5000...")
@@ -27,6 +29,17 @@ def run_flask():
         import traceback
         traceback.print_exc()
 
+def run_outbox_worker():
+    """تشغيل عامل تسليم الإشعارات"""
+    try:
+        from app.utils.outbox import run_worker
+        get_worker_app()
+        run_worker()
+    except Exception as e:
+        logger.error(f"Error running outbox worker: {e}")
+        import traceback
+        traceback.print_exc()
+
 def run_telegram_bot():
     """تشغيل Telegram Bot"""
     try:
@@ -40,7 +53,7 @@ def run_telegram_bot():
 
 def main():
     """تشغيل كل من Flask وTelegram Bot معاً"""
-    global flask_thread
+    global flask_thread, worker_thread
     
     logger.info("=" * 50)
     logger.info("بدء تشغيل النظام المتكامل")
@@ -51,6 +64,10 @@ def main():
     flask_thread.start()
     logger.info("✓ تم بدء تشغيل Flask App في thread منفصل")
     
+    worker_thread = threading.Thread(target=run_outbox_worker, name="OutboxWorkerThread", daemon=True)
+    worker_thread.start()
+    logger.info("✓ تم بدء تشغيل عامل تسليم الإشعارات في thread منفصل")
+    
     logger.info("✓ بدء تشغيل Telegram Bot في main thread...")
     logger.info("=" * 50)
     logger.info("النظام يعمل الآن! اضغط Ctrl+C للإيقاف")
@@ -58,6 +75,8 @@ def main():
     
     try:
         run_telegram_bot()
+        # في وضع Webhook ينتهي bot.main بعد تسجيل العنوان، والتحديثات تصل إلى Flask
+        flask_thread.join()
     except KeyboardInterrupt:
         logger.info("\n" + "=" * 50)
         logger.info("إيقاف النظام...")
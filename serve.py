@@ -0,0 +1,253 @@
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+WEB_WORKERS = int(os.environ.get('WEB_WORKERS', 4))
+# اتصالات الإشعارات (SSE) تبقى مفتوحة، فكل عامل يحتاج خيوطاً تكفي لها؛ الاتصال الخامل لا يحجز اتصال قاعدة بيانات
+# توزيع الاتصالات على العمال غير متساوٍ، فخيوط العامل أكثر من نصيبه (اختبار benchmark_stream.py: 1000 اتصال)
+WEB_WORKER_CLASS = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+WEB_THREADS = int(os.environ.get('WEB_THREADS', 512))
+# خيوط في كل عامل لا تأخذها اتصالات SSE، تبقى لطلبات الصفحات العادية
+WEB_RESERVED_THREADS = int(os.environ.get('WEB_RESERVED_THREADS', 64))
+WEB_BIND = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+HEALTH_PORT = int(os.environ.get('SUPERVISOR_HEALTH_PORT', 5001))
+SHUTDOWN_TIMEOUT = int(os.environ.get('SHUTDOWN_TIMEOUT', 30))
+RESTART_BACKOFF_MAX = 60
+
+
+class ChildProcess:
+    """عملية فرعية يراقبها المشرف ويعيد تشغيلها عند توقفها غير المتوقع"""
+
+    def __init__(self, name, command, env=None):
+        self.name = name
+        self.command = command
+        self.env = env or {}
+        self.process = None
+        self.restarts = 0
+        self.started_at = None
+        self.next_start_at = 0.0
+        self.backoff = 1
+
+    def start(self):
+        env = dict(os.environ, **self.env)
+        self.process = subprocess.Popen(self.command, env=env)
+        self.started_at = time.time()
+        logger.info(f"Started {self.name} (pid {self.process.pid})")
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def check(self):
+        """إعادة تشغيل العملية إذا توقفت، مع انتظار متزايد حتى لا تتكرر الأعطال بسرعة"""
+        if self.is_alive():
+            if time.time() - self.started_at > RESTART_BACKOFF_MAX:
+                self.backoff = 1
+            return
+
+        now = time.monotonic()
+        if self.process is not None and self.next_start_at == 0.0:
+            logger.error(f"{self.name} exited with code {self.process.returncode}, restarting in {self.backoff}s")
+            self.next_start_at = now + self.backoff
+            self.backoff = min(self.backoff * 2, RESTART_BACKOFF_MAX)
+            return
+
+        if now >= self.next_start_at:
+            if self.process is not None:
+                self.restarts += 1
+            self.next_start_at = 0.0
+            self.start()
+
+    def terminate(self):
+        if self.is_alive():
+            self.process.terminate()
+
+    def wait(self, deadline):
+        if self.process is None:
+            return
+        try:
+            self.process.wait(max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            logger.warning(f"{self.name} did not stop in time, killing it")
+            self.process.kill()
+            self.process.wait()
+
+    def status(self):
+        return {
+            'pid': self.process.pid if self.process else None,
+            'alive': self.is_alive(),
+            'restarts': self.restarts,
+            'started_at': self.started_at
+        }
+
+
+def web_command(bind=WEB_BIND, workers=WEB_WORKERS, threads=WEB_THREADS):
+    """
+    أمر gunicorn لعملية الويب (بدون وحدة التطبيق)
+    worker-connections محدود: العامل الممتلئ يتوقف عن قبول الاتصالات فتذهب إلى عامل آخر بدل أن تنتظر
+    في طابوره خلف اتصالات SSE لا تنتهي؛ الهامش فوق عدد الخيوط لاتصالات keep-alive الخاملة
+    """
+    return [
+        sys.executable, '-m', 'gunicorn',
+        '--workers', str(workers),
+        '--worker-class', WEB_WORKER_CLASS,
+        '--threads', str(threads),
+        '--worker-connections', str(threads + WEB_RESERVED_THREADS),
+        '--bind', bind,
+        '--graceful-timeout', str(SHUTDOWN_TIMEOUT),
+    ]
+
+
+def web_env(threads=WEB_THREADS):
+    """متغيرات بيئة عملية الويب؛ سقف اتصالات SSE لكل عامل يترك WEB_RESERVED_THREADS خيطاً للصفحات"""
+    env = {'SCHEDULER_ENABLED': 'false', 'PROCESS_ROLE': 'web'}
+    if 'NOTIFICATION_STREAM_MAX_SUBSCRIBERS' not in os.environ:
+        env['NOTIFICATION_STREAM_MAX_SUBSCRIBERS'] = str(max(threads - WEB_RESERVED_THREADS, 1))
+    return env
+
+
+def build_children():
+    python = sys.executable
+    script = os.path.abspath(__file__)
+    return [
+        ChildProcess('web', web_command() + ['main:app'], env=web_env()),
+        ChildProcess('bot', [python, script, 'bot'], env={'SCHEDULER_ENABLED': 'false', 'PROCESS_ROLE': 'bot'}),
+        ChildProcess('scheduler', [python, script, 'scheduler'], env={'SCHEDULER_ENABLED': 'true', 'PROCESS_ROLE': 'scheduler'}),
+    ]
+
+
+def start_health_server(children):
+    """نقطة /healthz للمشرف: حالة كل عملية فرعية (200 إذا كانت كلها تعمل وإلا 503)"""
+
+    class HealthHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/healthz':
+                self.send_error(404)
+                return
+            statuses = {child.name: child.status() for child in children}
+            healthy = all(status['alive'] for status in statuses.values())
+            body = json.dumps({'status': 'ok' if healthy else 'degraded', 'processes': statuses}).encode()
+            self.send_response(200 if healthy else 503)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('0.0.0.0', HEALTH_PORT), HealthHandler)
+    threading.Thread(target=server.serve_forever, name='supervisor-health', daemon=True).start()
+    logger.info(f"Supervisor health endpoint on port {HEALTH_PORT}")
+    return server
+
+
+def supervise():
+    """تشغيل عمليات الويب والبوت والمجدول ومراقبتها حتى وصول إشارة الإيقاف"""
+    # إنشاء الجداول وتهيئة قاعدة البيانات مرة واحدة قبل تشغيل العمليات الفرعية، دون تشغيل المجدول هنا
+    os.environ['SCHEDULER_ENABLED'] = 'false'
+    os.environ.setdefault('PROCESS_ROLE', 'supervisor')
+    from app.utils.worker_context import get_worker_app
+    get_worker_app()
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info("Shutting down...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    children = build_children()
+    health_server = start_health_server(children)
+
+    while not stop_event.is_set():
+        for child in children:
+            child.check()
+        stop_event.wait(1)
+
+    for child in children:
+        child.terminate()
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    for child in children:
+        child.wait(deadline)
+    health_server.shutdown()
+    logger.info("All processes stopped")
+
+
+def wait_for_stop_signal():
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    return stop_event
+
+
+def run_bot_process():
+    """عملية البوت وعامل تسليم الإشعارات"""
+    from app.utils.worker_context import get_worker_app
+    from app.utils.outbox import run_worker
+
+    get_worker_app()
+    stop_event = wait_for_stop_signal()
+
+    worker_thread = threading.Thread(target=run_worker, kwargs={'stop_event': stop_event},
+                                     name='OutboxWorkerThread')
+    worker_thread.start()
+
+    try:
+        # في وضع Webhook يمرر عمّال الويب التحديثات إلى هنا، فيبقى تطبيق البوت وحالة المحادثات في عملية واحدة
+        from app.utils.bot_webhook import start_update_server, stop_webhook_runner
+        update_server = start_update_server()
+        try:
+            import bot
+            if bot.main():
+                # run_polling يعود فقط عند وصول إشارة الإيقاف (يعالجها PTB بنفسه)
+                stop_event.set()
+
+            # في وضع Webhook أو عند تعطيل البوت يبقى عامل التسليم ومستقبل التحديثات يعملان حتى الإيقاف
+            stop_event.wait()
+        finally:
+            update_server.shutdown()
+            stop_webhook_runner()
+    finally:
+        # إذا فشل البوت يجب أن تنتهي العملية حتى يراها المشرف ويعيد تشغيلها،
+        # وخيط عامل التسليم (غير daemon) كان سيبقيها حية
+        stop_event.set()
+        worker_thread.join()
+
+
+def run_scheduler_process():
+    """عملية المهام المجدولة الوحيدة"""
+    from app.utils.worker_context import get_worker_app
+    from app.utils.scheduler import shutdown_scheduler
+
+    get_worker_app()
+    stop_event = wait_for_stop_signal()
+    stop_event.wait()
+    shutdown_scheduler()
+
+
+if __name__ == '__main__':
+    role = sys.argv[1] if len(sys.argv) > 1 else 'supervisor'
+    if role == 'bot':
+        run_bot_process()
+    elif role == 'scheduler':
+        run_scheduler_process()
+    else:
+        supervise()
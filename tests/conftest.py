@@ -0,0 +1,128 @@
+"""
+إعدادات الاختبارات المشتركة: تطبيق على قاعدة SQLite مؤقتة لكل اختبار ومصنع لبيانات تجريبية
+"""
+import pytest
+from werkzeug.security import generate_password_hash
+from config import Config
+from app import create_app, db
+from app.models import (User, Student, Teacher, Course, Enrollment, Grade, Lesson, BotSession,
+                        Notification, NotificationRecipient)
+
+
+# حساب التجزئة بطيء عمداً، فتُحسب مرة واحدة لكل المستخدمين التجريبيين
+PASSWORD = 'secret'
+PASSWORD_HASH = generate_password_hash(PASSWORD)
+
+
+def make_config(database_uri):
+    class TestConfig(Config):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        SCHEDULER_ENABLED = False
+        TELEGRAM_BACKUP_ENABLED = False
+        AUTO_BACKUP_DEBOUNCE_SECONDS = 3600
+        AUTO_BACKUP_MAX_DELAY_SECONDS = 3600
+        SQLALCHEMY_DATABASE_URI = database_uri
+    return TestConfig
+
+
+def _reset_process_singletons():
+    """الذواكر والوسطاء المشتركون في العملية لا يجب أن ينقلوا حالة من اختبار إلى آخر"""
+    from app.utils import bot_sessions, notification_stream, cache, worker_context
+    worker_context._worker_app = None
+    bot_sessions._cache = None
+    notification_stream._broker = None
+    for registered in cache._caches:
+        registered.invalidate_local()
+
+
+@pytest.fixture
+def app(tmp_path):
+    _reset_process_singletons()
+    app = create_app(make_config(f"sqlite:///{tmp_path / 'test.db'}"))
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, user):
+    with client.session_transaction() as session:
+        session['_user_id'] = user.get_id()
+        session['_fresh'] = True
+
+
+class Factory:
+    """إنشاء سجلات تجريبية مترابطة بأقل قدر من الحقول"""
+
+    def __init__(self):
+        self._counter = 0
+
+    def _next(self):
+        self._counter += 1
+        return self._counter
+
+    def user(self, role='student', **fields):
+        n = self._next()
+        user = User(phone_number=fields.pop('phone_number', f'09{n:08d}'),
+                    full_name=fields.pop('full_name', f'{role} {n}'), role=role,
+                    password_hash=PASSWORD_HASH, **fields)
+        db.session.add(user)
+        db.session.flush()
+        return user
+
+    def student(self, **fields):
+        student = Student(user=self.user('student'), student_number=f'S{self._next()}', **fields)
+        db.session.add(student)
+        db.session.flush()
+        return student
+
+    def teacher(self, **fields):
+        teacher = Teacher(user=self.user('teacher'), **fields)
+        db.session.add(teacher)
+        db.session.flush()
+        return teacher
+
+    def course(self, **fields):
+        course = Course(title=fields.pop('title', f'Course {self._next()}'), **fields)
+        db.session.add(course)
+        db.session.flush()
+        return course
+
+    def enrollment(self, student, course, teacher=None):
+        enrollment = Enrollment(student_id=student.id, course_id=course.id,
+                                teacher_id=teacher.id if teacher else None)
+        db.session.add(enrollment)
+        db.session.flush()
+        return enrollment
+
+    def grade(self, student, course, teacher, grade=80):
+        record = Grade(student_id=student.id, course_id=course.id, teacher_id=teacher.id,
+                       exam_name=f'Exam {self._next()}', grade=grade, max_grade=100)
+        db.session.add(record)
+        db.session.flush()
+        return record
+
+    def lesson(self, course, teacher, **fields):
+        lesson = Lesson(course_id=course.id, teacher_id=teacher.id,
+                        title=fields.pop('title', f'Lesson {self._next()}'), **fields)
+        db.session.add(lesson)
+        db.session.flush()
+        return lesson
+
+    def bot_session(self, user, telegram_id=None):
+        session = BotSession(telegram_id=telegram_id or 100000 + self._next())
+        db.session.add(session)
+        session.authenticate(user)
+        db.session.flush()
+        return session
+
+
+@pytest.fixture
+def factory(app):
+    return Factory()
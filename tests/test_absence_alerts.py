@@ -0,0 +1,67 @@
+"""
+تنبيهات الغياب تُنشأ من صندوق الصادر دفعة واحدة، ويجب أن تظهر في عدادات غير المقروء فور إنشائها
+دون انتظار إصلاح العدادات الدوري، وأن تُدفع للمتصفحات المتصلة عبر SSE
+"""
+from datetime import date
+from app import db
+from app.models import OutboxMessage, NotificationRecipient
+from app.utils import notification_stream
+from app.utils.attendance import record_attendance_bulk, enqueue_absence_alerts, create_absence_notifications
+from app.utils.notifications import get_unread_count
+from app.utils.outbox import process_message
+from app.utils.unread_counters import repair_unread_counters
+
+
+def _record_absences(users):
+    record_attendance_bulk([user.id for user in users], 'student', date.today(), 'absent')
+    message = OutboxMessage.query.filter_by(kind='absence_alerts').one()
+    assert process_message(message)
+    return message
+
+
+def _alerts_per_user():
+    return dict(db.session.query(NotificationRecipient.user_id, db.func.count()).group_by(
+        NotificationRecipient.user_id
+    ).all())
+
+
+def test_absence_alert_updates_unread_counters(factory):
+    students = [factory.student().user for _ in range(3)]
+    db.session.commit()
+
+    _record_absences(students)
+
+    assert [get_unread_count(user.id) for user in students] == [1, 1, 1]
+    # لا انحراف يحتاج الإصلاح الدوري إلى تصحيحه
+    assert repair_unread_counters() == 0
+
+
+def test_absence_alert_is_pushed_to_streams(factory):
+    # خيط المراقبة لا يستطلع خلال الاختبار، فأي تحديث يصل هو من النشر المباشر بعد الحفظ
+    notification_stream._broker = notification_stream.NotificationBroker(poll_seconds=3600)
+    broker = notification_stream.get_notification_broker()
+    students = [factory.student().user for _ in range(2)]
+    db.session.commit()
+    subscriptions = [broker.subscribe(user.id, 0) for user in students]
+
+    _record_absences(students)
+
+    assert [subscription.wait(0) for subscription in subscriptions] == [1, 1]
+
+
+def test_rerun_and_duplicate_jobs_alert_once(factory):
+    students = [factory.student().user for _ in range(2)]
+    db.session.commit()
+    message = _record_absences(students)
+
+    # إعادة تشغيل المهمة بعد حفظ نتيجتها (عامل توقف قبل تعليمها كمرسلة)
+    assert create_absence_notifications(message.payload) == 0
+    # مهمة مكررة لنفس التاريخ، مع مستخدم جديد لم يُنبَّه بعد
+    late = factory.student().user
+    enqueue_absence_alerts({user.id: 1 for user in students + [late]}, date.today())
+    db.session.commit()
+    duplicate = OutboxMessage.query.filter_by(kind='absence_alerts', status='pending').one()
+    assert process_message(duplicate)
+
+    assert _alerts_per_user() == {students[0].id: 1, students[1].id: 1, late.id: 1}
+    assert [get_unread_count(user.id) for user in students + [late]] == [1, 1, 1]
@@ -0,0 +1,47 @@
+"""
+استعادة نسخة بيانات فوق قاعدة حية في وضع WAL: القراء يرون البيانات المستعادة فوراً
+ولا يعيد checkpoint لاحق صفحات قديمة من ملف WAL
+"""
+import sqlite3
+from sqlalchemy import func, select
+from app import db
+from app.models import User
+from app.utils.backup import BackupManager, database_path
+
+
+def _users_seen_by_another_connection():
+    # اتصال مستقل يحاكي عملية أخرى تقرأ القاعدة نفسها
+    connection = sqlite3.connect(database_path())
+    try:
+        return connection.execute('SELECT count(*) FROM users').fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_restore_replaces_live_wal_database(app, factory, tmp_path):
+    for _ in range(5):
+        factory.user()
+    db.session.commit()
+    backup_file = str(tmp_path / 'backup.db')
+    BackupManager.snapshot_database(backup_file)
+
+    # قارئ يبقي معاملة مفتوحة فيمنع checkpoint التلقائي، فتبقى الصفوف الجديدة في ملف WAL
+    reader = sqlite3.connect(database_path())
+    reader.execute('BEGIN')
+    reader.execute('SELECT count(*) FROM users').fetchone()
+    for _ in range(200):
+        factory.user()
+    db.session.commit()
+    reader.rollback()
+    reader.close()
+    assert _users_seen_by_another_connection() == 205
+
+    BackupManager.restore_data_backup(backup_file)
+
+    assert _users_seen_by_another_connection() == 5
+    assert db.session.execute(select(func.count()).select_from(User)).scalar() == 5
+
+    connection = sqlite3.connect(database_path())
+    connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    connection.close()
+    assert _users_seen_by_another_connection() == 5
@@ -0,0 +1,39 @@
+"""
+تسجيل الخروج أو تعطيل الحساب من عملية أخرى يجب أن يسري فوراً رغم ذاكرة الجلسات المحلية
+العملية الأخرى محاكاة بتعديل قاعدة البيانات مباشرة دون المرور بذاكرة هذه العملية
+"""
+from sqlalchemy import update
+from app import db
+from app.models import BotSession, User
+from app.utils import bot_data
+from app.utils.bot_sessions import get_session_cache
+
+
+def _logged_in(factory):
+    student = factory.student()
+    telegram_id = factory.bot_session(student.user).telegram_id
+    bot_data.get_or_create_session(telegram_id)
+    assert get_session_cache().get(telegram_id)['is_authenticated']
+    assert bot_data.get_session_user(telegram_id)
+    return student.user, telegram_id
+
+
+def test_logout_in_another_process(factory):
+    user, telegram_id = _logged_in(factory)
+    db.session.execute(
+        update(BotSession).where(BotSession.telegram_id == telegram_id).values(is_authenticated=False, user_id=None)
+    )
+    db.session.commit()
+
+    assert bot_data.get_session_user(telegram_id) is None
+    assert bot_data.get_student_grades(telegram_id) is None
+    assert bot_data.get_notifications(telegram_id) is None
+
+
+def test_deactivation_in_another_process(factory):
+    user, telegram_id = _logged_in(factory)
+    db.session.execute(update(User).where(User.id == user.id).values(is_active=False))
+    db.session.commit()
+
+    assert bot_data.get_session_user(telegram_id) is None
+    assert bot_data.get_student_grades(telegram_id) is None
@@ -0,0 +1,70 @@
+"""
+تحديثات المحادثة الواحدة تُعالج بالتتابع وبترتيب وصولها حتى لا تتسابق على حالة محادثة تسجيل الدخول،
+بينما تبقى المحادثات المختلفة متوازية
+"""
+import asyncio
+from datetime import datetime
+from telegram import Update, Message, Chat, User
+from app.utils.bot_updates import PerChatUpdateProcessor
+
+
+def _update(update_id, chat_id):
+    user = User(id=chat_id, is_bot=False, first_name='user')
+    message = Message(message_id=update_id, date=datetime.now(), chat=Chat(id=chat_id, type='private'),
+                      from_user=user, text=str(update_id))
+    return Update(update_id=update_id, message=message)
+
+
+def _run(updates):
+    """معالجة التحديثات كما يفعل Application (مهمة لكل تحديث)؛ تُرجع أحداث البدء والانتهاء بالترتيب"""
+    events = []
+
+    async def handle(update):
+        events.append(('start', update.update_id))
+        await asyncio.sleep(0.01)
+        events.append(('end', update.update_id))
+
+    async def main():
+        processor = PerChatUpdateProcessor(16)
+        async with processor:
+            await asyncio.gather(*[processor.process_update(update, handle(update)) for update in updates])
+        return processor
+
+    processor = asyncio.run(main())
+    return events, processor
+
+
+def test_same_chat_is_serialized_in_order():
+    events, processor = _run([_update(1, 7), _update(2, 7), _update(3, 7)])
+    assert events == [('start', 1), ('end', 1), ('start', 2), ('end', 2), ('start', 3), ('end', 3)]
+    assert processor._chats == {}
+
+
+def test_different_chats_run_concurrently():
+    events, _ = _run([_update(1, 7), _update(2, 8)])
+    assert events[:2] == [('start', 1), ('start', 2)]
+
+
+def test_cancelled_waiter_releases_its_slot():
+    async def main():
+        processor = PerChatUpdateProcessor(4)
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+
+        async def quick():
+            return None
+
+        first = asyncio.create_task(processor.process_update(_update(1, 7), slow()))
+        queued = asyncio.create_task(processor.process_update(_update(2, 7), quick()))
+        await asyncio.sleep(0)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        release.set()
+        await first
+        return processor
+
+    processor = asyncio.run(main())
+    assert processor._chats == {}
+    assert processor.current_concurrent_updates == 0
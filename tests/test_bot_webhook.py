@@ -0,0 +1,97 @@
+"""
+عمّال الويب (PROCESS_ROLE=web) يمررون تحديثات Webhook إلى تطبيق البوت الوحيد في عملية البوت
+تطبيق البوت نفسه مستبدل بمسجّل حتى لا يحتاج الاختبار إلى الاتصال بتيليجرام
+"""
+import hashlib
+import socket
+import pytest
+from app import db
+from app.models import SiteSettings
+from app.utils import bot_webhook
+
+TOKEN = '123:test'
+
+
+class RecordingRunner:
+    def __init__(self):
+        self.updates = []
+
+    def dispatch(self, data):
+        self.updates.append(data)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def bot_process(app, monkeypatch):
+    db.session.add(SiteSettings(telegram_bot_token=TOKEN, telegram_bot_enabled=True,
+                                telegram_bot_webhook_enabled=True))
+    db.session.commit()
+
+    runner = RecordingRunner()
+    tokens = []
+
+    def get_runner(token):
+        tokens.append(token)
+        return runner
+
+    port = _free_port()
+    monkeypatch.setattr(bot_webhook, 'get_webhook_runner', get_runner)
+    monkeypatch.setattr(bot_webhook, 'PROCESS_ROLE', 'web')
+    monkeypatch.setattr(bot_webhook, 'BOT_UPDATE_PORT', port)
+    server = bot_webhook.start_update_server(port)
+    yield runner, tokens
+    server.shutdown()
+    server.server_close()
+
+
+def _post(client, data, secret=None):
+    return client.post('/telegram/webhook', json=data, headers={
+        bot_webhook.SECRET_HEADER: secret or bot_webhook.webhook_secret()
+    })
+
+
+def test_web_worker_forwards_to_bot_process(client, bot_process):
+    runner, tokens = bot_process
+    for update_id in (1, 2, 3):
+        assert _post(client, {'update_id': update_id}).status_code == 200
+
+    assert [update['update_id'] for update in runner.updates] == [1, 2, 3]
+    # التطبيق المستخدم هو تطبيق عملية البوت، لا تطبيق يُبنى في عامل الويب
+    assert tokens == [TOKEN] * 3
+
+
+def test_rejects_wrong_secret(client, bot_process):
+    runner, _ = bot_process
+    assert _post(client, {'update_id': 1}, secret='wrong').status_code == 403
+    assert not runner.updates
+
+
+def test_unreachable_bot_process_asks_telegram_to_retry(client, bot_process, monkeypatch):
+    monkeypatch.setattr(bot_webhook, 'BOT_UPDATE_PORT', _free_port())
+    assert _post(client, {'update_id': 1}).status_code == 503
+
+
+def test_generated_secret_is_random_and_stored(app, monkeypatch):
+    monkeypatch.delenv('TELEGRAM_WEBHOOK_SECRET', raising=False)
+    db.session.add(SiteSettings(telegram_bot_token=TOKEN))
+    db.session.commit()
+
+    secret = bot_webhook.webhook_secret()
+    assert secret != hashlib.sha256(TOKEN.encode()).hexdigest()
+    assert len(secret) == 64
+    # القيمة نفسها في كل استدعاء وفي كل عملية تقرأ القاعدة
+    assert bot_webhook.webhook_secret() == secret
+    assert SiteSettings.query.first().telegram_bot_webhook_secret == secret
+
+
+def test_environment_secret_takes_precedence(app, monkeypatch):
+    monkeypatch.setenv('TELEGRAM_WEBHOOK_SECRET', 'from-env')
+    assert bot_webhook.webhook_secret() == 'from-env'
+    assert bot_webhook.verify_webhook_secret('from-env')
+    assert not bot_webhook.verify_webhook_secret('from-envx')
+    assert not bot_webhook.verify_webhook_secret(None)
@@ -0,0 +1,43 @@
+"""
+قفل مخزن النسخ التزايدية يجب أن يمنع عمليات أخرى من الإنشاء أو التنظيف في الوقت نفسه
+"""
+import subprocess
+import sys
+import threading
+from app.utils import incremental_backup
+
+TRY_LOCK = """
+import fcntl, sys
+with open(sys.argv[1], 'a') as f:
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        sys.exit(1)
+"""
+
+
+def _other_process_can_lock(path):
+    return subprocess.run([sys.executable, '-c', TRY_LOCK, str(path)]).returncode == 0
+
+
+def test_store_lock_excludes_other_processes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with incremental_backup.store_lock():
+        assert not _other_process_can_lock(tmp_path / incremental_backup.LOCK_FILE)
+    assert _other_process_can_lock(tmp_path / incremental_backup.LOCK_FILE)
+
+
+def test_prune_waits_for_running_backup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pruned = threading.Event()
+
+    def prune():
+        incremental_backup.prune_incremental_backups()
+        pruned.set()
+
+    with incremental_backup.store_lock():
+        thread = threading.Thread(target=prune)
+        thread.start()
+        assert not pruned.wait(0.3)
+    thread.join(5)
+    assert pruned.is_set()
@@ -0,0 +1,27 @@
+"""
+خيط مراقبة عدادات الإشعارات يعمل فقط ما دام في العملية مشترك واحد على الأقل
+"""
+from app.utils.notification_stream import NotificationBroker
+
+
+def test_watcher_stops_with_last_subscriber_and_restarts(app):
+    broker = NotificationBroker(poll_seconds=0.05)
+
+    first = broker.subscribe(1, 0)
+    second = broker.subscribe(2, 0)
+    watcher = broker._watcher
+    assert watcher.is_alive()
+
+    broker.unsubscribe(first)
+    assert broker._watcher is watcher and watcher.is_alive()
+
+    broker.unsubscribe(second)
+    watcher.join(2)
+    assert not watcher.is_alive()
+
+    third = broker.subscribe(3, 0)
+    assert broker._watcher is not watcher and broker._watcher.is_alive()
+    restarted = broker._watcher
+    broker.unsubscribe(third)
+    restarted.join(2)
+    assert not restarted.is_alive()
@@ -0,0 +1,72 @@
+"""
+تسليم الإشعارات على تيليجرام عبر صندوق الصادر: الفشل الجزئي يعيد المحاولة مع التأخير التصاعدي
+للمستلمين الذين لم يُسلَّم لهم فقط، والرفض النهائي (حظر البوت) لا يُعاد
+الإرسال نفسه مستبدل بدالة تحاكي نتائج تيليجرام
+"""
+import pytest
+from app import db
+from app.models import OutboxMessage, SiteSettings, NotificationRecipient
+from app.utils import telegram_fanout
+from app.utils.notifications import create_notification
+from app.utils.outbox import process_message
+
+
+class FakeTelegram:
+    """يسجل المحادثات المطلوبة في كل دفعة، ويفشل مؤقتاً أو يرفض نهائياً حسب الطلب"""
+
+    def __init__(self):
+        self.batches = []
+        self.failing = set()
+        self.rejecting = set()
+
+    async def fan_out(self, bot_token, messages, rejected=None, **kwargs):
+        self.batches.append(sorted(chat_id for _, chat_id, _ in messages))
+        delivered = {}
+        for key, chat_id, _ in messages:
+            if chat_id in self.rejecting:
+                rejected.add(key)
+            elif chat_id not in self.failing:
+                delivered[key] = 1000 + chat_id
+        return delivered
+
+
+@pytest.fixture
+def telegram(app, factory, monkeypatch):
+    fake = FakeTelegram()
+    monkeypatch.setattr(telegram_fanout, 'fan_out', fake.fan_out)
+    db.session.add(SiteSettings(telegram_bot_token='123:test', telegram_bot_enabled=True))
+    admin = factory.user('admin')
+    chats = [factory.bot_session(factory.student().user).telegram_id for _ in range(3)]
+    db.session.commit()
+    create_notification('تنبيه', 'رسالة', 'general', admin.id, target_type='all_students')
+    return fake, chats
+
+
+def _delivery():
+    return OutboxMessage.query.filter_by(kind='telegram_delivery').one()
+
+
+def test_partial_failure_retries_only_undelivered(telegram):
+    fake, chats = telegram
+    fake.failing = {chats[1]}
+
+    assert not process_message(_delivery())
+    message = _delivery()
+    assert message.status == 'pending'
+    assert message.attempts == 1
+    assert NotificationRecipient.query.filter_by(telegram_delivered=True).count() == 2
+
+    fake.failing = set()
+    assert process_message(message)
+    assert fake.batches == [sorted(chats), [chats[1]]]
+    assert _delivery().status == 'sent'
+    assert NotificationRecipient.query.filter_by(telegram_delivered=True).count() == 3
+
+
+def test_permanent_rejection_is_not_retried(telegram):
+    fake, chats = telegram
+    fake.rejecting = {chats[0]}
+
+    assert process_message(_delivery())
+    assert _delivery().status == 'sent'
+    assert len(fake.batches) == 1
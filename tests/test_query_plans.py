@@ -0,0 +1,17 @@
+"""
+الاستعلامات الساخنة (app.utils.queries) يجب أن تصل إلى جداولها عبر فهارس على مخطط النماذج
+الخطط تُبنى من البناة نفسها التي تستدعيها المسارات والبوت، فلا تنحرف عن الاستعلامات الحقيقية
+"""
+from app import db
+from app.models import Grade
+from app.utils.query_plans import HOT_QUERIES, check_hot_queries
+
+
+def test_hot_queries_use_indexes(app):
+    assert check_hot_queries(db.engine) == {}
+
+
+def test_full_scan_is_reported(app):
+    # exam_name بلا فهرس، فيجب أن يظهر المسح الكامل كتراجع
+    queries = dict(HOT_QUERIES, unindexed=lambda: Grade.query.filter_by(exam_name='final'))
+    assert check_hot_queries(db.engine, queries) == {'unindexed': ['grades']}
@@ -0,0 +1,101 @@
+"""
+عدد عبارات SQL لكل معالج (صفحة ويب أو رد بوت) يجب ألا يتغير مع حجم البيانات
+كل اختبار يشغّل المعالج على بيانات قليلة ثم على بيانات أكبر ويقارن عدد العبارات
+"""
+import pytest
+from flask import current_app
+from app import db
+from app.utils import bot_data
+from app.utils.query_profiles import count_statements
+from conftest import login
+
+
+def _count(run):
+    # كل تشغيل في سياق تطبيق جديد، أي جلسة جديدة، حتى لا تخفي الكائنات المحمّلة سابقاً التحميل الكسول
+    db.session.commit()
+    with count_statements() as statements, current_app.app_context():
+        run()
+    return len(statements)
+
+
+def assert_fixed_query_count(run, grow):
+    _count(run)  # تسخين الذواكر (جلسة البوت، ذواكر القوائم) حتى لا تُحتسب أول مرة فقط
+    small = _count(run)
+    grow()
+    large = _count(run)
+    assert small == large, f'{small} statements with few rows, {large} with more'
+
+
+@pytest.fixture
+def school(factory):
+    teacher = factory.teacher()
+    student = factory.student()
+    courses = []
+
+    def grow(count=2):
+        for _ in range(count):
+            course = factory.course()
+            courses.append(course)
+            factory.enrollment(student, course, teacher)
+            factory.grade(student, course, teacher)
+            factory.lesson(course, teacher)
+            other = factory.student()
+            factory.enrollment(other, course, teacher)
+            factory.grade(other, course, teacher)
+
+    grow()
+    return {'teacher': teacher, 'student': student, 'courses': courses, 'grow': lambda: grow(6)}
+
+
+def _web(client, path):
+    def run():
+        assert client.get(path).status_code == 200
+    return run
+
+
+def test_student_grades_page(client, school):
+    login(client, school['student'].user)
+    assert_fixed_query_count(_web(client, '/student/grades'), school['grow'])
+
+
+def test_student_courses_page(client, school):
+    login(client, school['student'].user)
+    assert_fixed_query_count(_web(client, '/student/courses'), school['grow'])
+
+
+def test_teacher_students_page(client, school):
+    login(client, school['teacher'].user)
+    assert_fixed_query_count(_web(client, '/teacher/students'), school['grow'])
+
+
+def test_teacher_lessons_page(client, school):
+    login(client, school['teacher'].user)
+    assert_fixed_query_count(_web(client, '/teacher/lessons'), school['grow'])
+
+
+def test_teacher_student_grades_page(client, school):
+    login(client, school['teacher'].user)
+    path = f"/teacher/students/{school['student'].id}/grades"
+    assert_fixed_query_count(_web(client, path), school['grow'])
+
+
+@pytest.mark.parametrize('handler', [
+    bot_data.get_student_courses,
+    bot_data.get_student_grades,
+    bot_data.get_dashboard,
+    bot_data.get_notifications,
+])
+def test_student_bot_handlers(factory, school, handler):
+    telegram_id = factory.bot_session(school['student'].user).telegram_id
+    assert_fixed_query_count(lambda: handler(telegram_id), school['grow'])
+
+
+@pytest.mark.parametrize('handler', [
+    bot_data.get_teacher_courses,
+    bot_data.get_teacher_lessons,
+    bot_data.get_teacher_students,
+    bot_data.get_dashboard,
+])
+def test_teacher_bot_handlers(factory, school, handler):
+    telegram_id = factory.bot_session(school['teacher'].user).telegram_id
+    assert_fixed_query_count(lambda: handler(telegram_id), school['grow'])
@@ -0,0 +1,102 @@
+"""
+منسق الإرسال: ترتيب الأولويات، تجاوز المحادثات المقيّدة، الإلغاء دون فقد رموز،
+والحد العام المشترك بين عدة عمليات (هنا عدة منسقات على ملف الحالة نفسه)
+"""
+import asyncio
+import threading
+import time
+from app.utils.telegram_scheduler import OutboundScheduler, INTERACTIVE, BULK
+
+FAST = 1000.0
+
+
+def _grant_order(scheduler, requests):
+    """تسجيل كل الطلبات قبل أن يبدأ المنسق المنح، ثم إرجاع ترتيب منحها"""
+    order = []
+    done = threading.Event()
+
+    def callback(name):
+        def grant():
+            order.append(name)
+            if len(order) == len(requests):
+                done.set()
+        return grant
+
+    with scheduler._condition:
+        for name, chat_id, priority in requests:
+            scheduler.submit(chat_id, priority, callback(name))
+    assert done.wait(5)
+    return order
+
+
+def test_interactive_first_then_arrival_order():
+    scheduler = OutboundScheduler(FAST, 1, FAST, 100, global_state_file=None)
+    requests = [(f'bulk{index}', index, BULK) for index in range(50)]
+    requests += [(f'reply{index}', 100 + index, INTERACTIVE) for index in range(5)]
+
+    order = _grant_order(scheduler, requests)
+    assert order == [f'reply{index}' for index in range(5)] + [f'bulk{index}' for index in range(50)]
+
+
+def test_throttled_chat_does_not_block_others():
+    scheduler = OutboundScheduler(FAST, 100, chat_rate=5, chat_burst=1, global_state_file=None)
+    order = _grant_order(scheduler, [('a1', 1, INTERACTIVE), ('a2', 1, INTERACTIVE), ('b1', 2, BULK)])
+    assert order == ['a1', 'b1', 'a2']
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = OutboundScheduler(FAST, 100, chat_rate=5, chat_burst=1, global_state_file=None)
+
+    async def main():
+        await scheduler.acquire(1)
+        # الطلب الثاني ينتظر 0.2 ثانية حتى يتوفر رمز المحادثة، ثم يُلغى
+        pending = asyncio.create_task(scheduler.acquire(1))
+        await asyncio.sleep(0.02)
+        pending.cancel()
+        await asyncio.gather(pending, return_exceptions=True)
+        assert scheduler.metrics()['queue_depth'] == {'interactive': 0, 'bulk': 0}
+
+        started = time.monotonic()
+        await scheduler.acquire(1)
+        return time.monotonic() - started
+
+    # الطلب التالي يأخذ رمز الطلب الملغى بعد 0.2 ثانية، لا بعد 0.4
+    assert asyncio.run(main()) < 0.3
+    assert scheduler.metrics()['granted']['interactive'] == 2
+
+
+def test_cancel_after_grant_returns_the_token():
+    scheduler = OutboundScheduler(global_rate=0.5, global_burst=1, global_state_file=None)
+
+    async def main():
+        task = asyncio.create_task(scheduler.acquire(1))
+        await asyncio.sleep(0)
+        # حجب الحلقة حتى يمنح المنسق الرمز، ثم الإلغاء قبل أن تستأنف المهمة
+        time.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert task.cancelled()
+
+        started = time.monotonic()
+        await asyncio.wait_for(scheduler.acquire(2), 1)
+        return time.monotonic() - started
+
+    assert asyncio.run(main()) < 0.5
+
+
+def test_global_cap_is_shared_between_processes(tmp_path):
+    state = str(tmp_path / 'rate.state')
+    rate = 50
+    schedulers = [OutboundScheduler(rate, 1, FAST, FAST, global_state_file=state) for _ in range(3)]
+
+    async def send(scheduler, count):
+        for index in range(count):
+            await scheduler.acquire(index)
+
+    async def main():
+        started = time.monotonic()
+        await asyncio.gather(*[send(scheduler, 20) for scheduler in schedulers])
+        return time.monotonic() - started
+
+    # 60 رسالة بمعدل 50 في الثانية للجميع تحتاج حوالي 1.2 ثانية؛ بدلو لكل عملية كانت 0.4
+    assert asyncio.run(main()) >= 59 / rate * 0.95
@@ -0,0 +1,28 @@
+import logging
+import signal
+import threading
+from app.utils.worker_context import get_worker_app
+from app.utils.outbox import run_worker
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+def main() -> None:
+    """تشغيل عامل تسليم الإشعارات كعملية مستقلة"""
+    get_worker_app()
+    stop_event = threading.Event()
+    
+    def handle_signal(signum, frame):
+        logger.info("Stopping outbox worker...")
+        stop_event.set()
+    
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    
+    run_worker(stop_event=stop_event)
+
+if __name__ == '__main__':
+    main()